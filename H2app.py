@@ -1,13 +1,29 @@
 # H2app.py — Updated Design A (MWh units, default Solar=80 MWh)
+import datetime
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
+import h2_engine
+import h2_finance
+import h2_montecarlo
+import h2_optimize
+import h2_portfolio
+import h2_render
+import h2_sweep
+import h2_trace
+import h2_ui
+
 st.set_page_config(layout="wide", page_title="H2 Dashboard (MWh)")
 
 # Sidebar settings
 st.sidebar.title("Model settings (units: MWh, Tk -> USD conversion)")
+show_timing = st.sidebar.checkbox("Timing panel (per-stage wall time of this rerun)", value=False)
+# opt-in: with no active trace every h2_trace call is a no-op
+trace = h2_trace.activate(h2_trace.Trace() if show_timing else None)
 # Energy unit note: all energy inputs/outputs use MWh in UI; internal conversions if needed use MWh.
 default_solar_mwh = st.sidebar.number_input("Default Solar (MWh/month)", value=80.0, step=1.0)
 exchange_rate = st.sidebar.number_input("BDT per USD (exchange rate)", value=114.0)
@@ -23,87 +39,67 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("Operational sliders")
 electrolyzer_eff = st.sidebar.slider("Electrolyzer efficiency (%)", 50, 90, 80) / 100.0
 h2_lhv_kwh_per_kg = st.sidebar.number_input("H₂ LHV (kWh/kg)", value=33.33)
-h2_lhv_mwh_per_kg = h2_lhv_kwh_per_kg / 1000.0  # convert to MWh/kg
 fuelcell_eff = st.sidebar.slider("Fuel cell efficiency (%)", 30, 70, 50) / 100.0
 fraction_h2_to_fuelcell = st.sidebar.slider("Fraction H₂ -> Fuel cell (%)", 0, 100, 30) / 100.0
 fraction_h2_to_refuel = st.sidebar.slider("Fraction H₂ -> Refuel (%)", 0, 100, 70) / 100.0
 initial_h2_storage_kg = st.sidebar.number_input("Initial H₂ stored (kg)", value=700.0)
+tank_min_kg = st.sidebar.number_input("Tank minimum inventory (kg)", value=0.0, min_value=0.0)
+tank_max_kg = st.sidebar.number_input("Tank capacity (kg, 0 = unlimited)", value=0.0, min_value=0.0)
+tank_max_kg = tank_max_kg if tank_max_kg > 0 else float("inf")
+electrolyzer_mw = st.sidebar.number_input("Electrolyzer rating (MW, 0 = unlimited)", value=0.0, min_value=0.0)
+electrolyzer_mw = electrolyzer_mw if electrolyzer_mw > 0 else float("inf")
+fuelcell_mw = st.sidebar.number_input("Fuel-cell rating (MW, 0 = unlimited)", value=0.0, min_value=0.0)
+fuelcell_mw = fuelcell_mw if fuelcell_mw > 0 else float("inf")
 
 st.sidebar.markdown("---")
-st.sidebar.markdown("Upload CSV (optional): columns 'month','solar_mwh','demand_mwh' (12 rows)")
-uploaded = st.sidebar.file_uploader("Monthly profile CSV", type=["csv"])
-
-# Load data (demo if not uploaded)
-def demo_df():
-    months = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-    # Example demand in MWh (demo values)
-    demand_mwh = np.array([31.5,39.0,64.5,72.0,117.0,78.0,94.5,46.5,114.0,102.0,87.0,46.5])  # was kWh/1000 -> MWh
-    solar_mwh = np.full(12, default_solar_mwh)
-    return pd.DataFrame({"month": months, "solar_mwh": solar_mwh, "demand_mwh": demand_mwh})
-
-if uploaded:
-    df = pd.read_csv(uploaded)
-    if not set(["month","solar_mwh","demand_mwh"]).issubset(df.columns):
-        st.error("CSV must contain 'month','solar_mwh','demand_mwh'")
-        st.stop()
-    df = df[["month","solar_mwh","demand_mwh"]].copy()
-else:
-    df = demo_df()
-
-# Calculations (MWh units)
-df["grid_import_mwh"] = np.maximum(0, df["demand_mwh"] - df["solar_mwh"])
-df["grid_export_mwh"] = np.maximum(0, df["solar_mwh"] - df["demand_mwh"])
+source, resample_freq = h2_ui.profile_source("h2app")
+profile = h2_ui.load_profile(source, "h2app", resample_freq) if source else h2_engine.demo_profile(default_solar_mwh)
 
 # Electrolyzer energy allocated: assume fraction of solar used for electrolysis, and grid can supplement
 solar_frac_for_electrolysis = st.sidebar.slider("Solar fraction for electrolysis (%)", 0, 100, 80) / 100.0
-df["solar_alloc_electrolysis_mwh"] = df["solar_mwh"] * solar_frac_for_electrolysis
-# If solar insufficient, grid supplement for electrolysis (operator decision) - simple model: electrolyzer uses solar_alloc + grid_import up to demand
-df["electrolyzer_energy_mwh"] = df["solar_alloc_electrolysis_mwh"].copy()
 # Optionally allow extra from grid (user can toggle)
 use_grid_for_electrolysis = st.sidebar.checkbox("Allow grid supplement for electrolysis when solar insufficient", value=True)
-if use_grid_for_electrolysis:
-    need_mwh = (df["demand_mwh"] - df["solar_alloc_electrolysis_mwh"]).clip(lower=0)
-    # use grid import to cover need (not exceeding actual grid_import)
-    df["electrolyzer_energy_mwh"] = df["solar_alloc_electrolysis_mwh"] + np.minimum(need_mwh, df["grid_import_mwh"])
-
-# Hydrogen production (kg) from electrolyzer energy:
-# mH2 (kg) = Energy (MWh) / (LHV (MWh/kg) / electrolyzer_eff) = Energy / (LHV_mwh_per_kg / eta)
-df["h2_kg"] = df["electrolyzer_energy_mwh"] / (h2_lhv_mwh_per_kg / electrolyzer_eff)
-
-# Oxygen production (kg)
-df["o2_kg"] = df["h2_kg"] * 8.0
-
-# Water required (L) (approx kg to L)
-df["water_l"] = df["h2_kg"] * 9.0
-
-# Fuel cell electricity generation (MWh)
-df["h2_for_fuelcell_kg"] = df["h2_kg"] * fraction_h2_to_fuelcell
-df["fuelcell_elec_mwh"] = df["h2_for_fuelcell_kg"] * h2_lhv_mwh_per_kg * fuelcell_eff
-
-# H2 to refuelling station
-df["h2_to_refuel_kg"] = df["h2_kg"] * fraction_h2_to_refuel
-
-# Storage tracking (monthly)
-df["monthly_h2_input_kg"] = df["h2_kg"]
-df["monthly_h2_output_kg"] = df["h2_for_fuelcell_kg"] + df["h2_to_refuel_kg"]
-storage = []
-s = initial_h2_storage_kg
-for i,row in df.iterrows():
-    s = s + row["monthly_h2_input_kg"] - row["monthly_h2_output_kg"]
-    storage.append(max(0.0,s))
-df["stored_h2_kg"] = storage
-
-# CO2 calculations (kg)
-df["co2_from_grid_import_kg"] = df["grid_import_mwh"] * grid_emission_kgCO2_per_mwh
-df["co2_avoided_from_export_kg"] = df["grid_export_mwh"] * grid_emission_kgCO2_per_mwh
-df["co2_avoided_from_diesel_kg"] = diesel_l_per_month * diesel_co2_kg_per_l / 12.0
-
-# Financials: Tk to USD
-df["o2_revenue_tk"] = df["o2_kg"] * oxygen_price_tk_per_kg
-df["h2_revenue_tk"] = df["h2_to_refuel_kg"] * h2_sale_price_tk_per_kg
-df["electricity_avoided_tk"] = df["fuelcell_elec_mwh"] * grid_price_tk_per_mwh
-df["monthly_revenue_tk"] = df["o2_revenue_tk"] + df["h2_revenue_tk"] + df["electricity_avoided_tk"]
-df["monthly_revenue_usd"] = df["monthly_revenue_tk"] / exchange_rate
+
+st.sidebar.markdown("---")
+st.sidebar.markdown("Project finance (lifetime)")
+capex_usd = st.sidebar.number_input("CAPEX (USD)", value=16000000.0, step=1000.0)
+opex_usd_per_month = st.sidebar.number_input("System OPEX (USD/month)", value=598.29)
+finance = h2_ui.finance_sidebar()
+
+h2_trace.split("sidebar + profile load")
+# Calculations (MWh units) — memoized in h2_engine on (profile, params)
+params = {
+    "exchange_rate": exchange_rate,
+    "oxygen_price_tk_per_kg": oxygen_price_tk_per_kg,
+    "h2_sale_price_tk_per_kg": h2_sale_price_tk_per_kg,
+    "grid_price_tk_per_mwh": grid_price_tk_per_mwh,
+    "grid_emission_kgCO2_per_mwh": grid_emission_kgCO2_per_mwh,
+    "diesel_l_per_month": diesel_l_per_month,
+    "diesel_co2_kg_per_l": diesel_co2_kg_per_l,
+    "diesel_price_tk_per_l": diesel_price_tk_per_l,
+    "electrolyzer_eff": electrolyzer_eff,
+    "h2_lhv_kwh_per_kg": h2_lhv_kwh_per_kg,
+    "fuelcell_eff": fuelcell_eff,
+    "fraction_h2_to_fuelcell": fraction_h2_to_fuelcell,
+    "fraction_h2_to_refuel": fraction_h2_to_refuel,
+    "initial_h2_storage_kg": initial_h2_storage_kg,
+    "tank_min_kg": tank_min_kg,
+    "tank_max_kg": tank_max_kg,
+    "electrolyzer_mw": electrolyzer_mw,
+    "fuelcell_mw": fuelcell_mw,
+    "solar_frac_for_electrolysis": solar_frac_for_electrolysis,
+    "use_grid_for_electrolysis": use_grid_for_electrolysis,
+}
+df_native = h2_engine.simulate(profile, params)
+h2_trace.split("simulate")
+# Monthly rollup for KPIs, charts and table (identity for 12-row monthly profiles)
+df = h2_engine.rollup(df_native)
+# Inputs for the lifetime / sweep / Monte Carlo / optimizer views (simulation params stay cache-stable)
+project_params = {**params, **finance, "capex_usd": capex_usd, "opex_usd_per_month": opex_usd_per_month}
+per_year = h2_finance.annual_factor(df_native)
+life = h2_finance.lifetime(df["h2_kg"].sum() * per_year, df["monthly_revenue_tk"].sum() * per_year, capex_usd,
+                           opex_usd_per_month * 12.0, exchange_rate, diesel_l_per_month * 12.0 * diesel_price_tk_per_l, finance)
+h2_trace.split("rollup + lifetime finance")
 
 # UI layout
 st.title("H₂ System Live Model — Design A (MWh units)")
@@ -138,6 +134,8 @@ with colB:
     st.write(f"O₂ produced: {df_month['o2_kg']:.0f} kg")
     st.write(f"Water required: {df_month['water_l']:.0f} L")
     st.write(f"Stored H₂ (end month): {df_month['stored_h2_kg']:.0f} kg")
+    st.write(f"Curtailed H₂ (tank full): {df_month['curtailed_h2_kg']:.0f} kg")
+    st.write(f"Unmet H₂ (fuel cell / refuel): {df_month['unmet_fuelcell_h2_kg']:.0f} / {df_month['unmet_refuel_h2_kg']:.0f} kg")
 with colC:
     st.markdown("**CO₂ & Financials**")
     st.write(f"CO₂ from grid import: {df_month['co2_from_grid_import_kg']:.0f} kg")
@@ -145,6 +143,26 @@ with colC:
     st.write(f"O₂ revenue: {df_month['o2_revenue_tk']:.0f} Tk ({df_month['o2_revenue_tk']/exchange_rate:.2f} USD)")
     st.write(f"H₂ sale revenue: {df_month['h2_revenue_tk']:.0f} Tk ({df_month['h2_revenue_tk']/exchange_rate:.2f} USD)")
     st.write(f"Electricity avoided revenue: {df_month['electricity_avoided_tk']:.0f} Tk ({df_month['electricity_avoided_tk']/exchange_rate:.2f} USD)")
+h2_trace.split("KPIs + month details")
+
+if h2_engine.is_timeseries(df_native):
+    st.markdown("**Native resolution (MWh / kg per step)**")
+    # the window is re-fetched at full resolution and downsampled to screen size (LTTB, WebGL)
+    t_first, t_last = df_native["timestamp"].iloc[0].to_pydatetime(), df_native["timestamp"].iloc[-1].to_pydatetime()
+    m_start = max(df_month["timestamp"].to_pydatetime(), t_first)
+    m_end = min((df_month["timestamp"] + pd.offsets.MonthBegin(1) - pd.Timedelta(seconds=1)).to_pydatetime(), t_last)
+    window = st.slider("Time window (narrow it to see every step)", min_value=t_first, max_value=t_last, value=(m_start, m_end),
+                       step=datetime.timedelta(hours=1), format="YYYY-MM-DD HH:mm", key=f"window_{selected_month}")
+    detail = h2_render.time_window(df_native, *window)
+    fig_d = go.Figure()
+    fig_d.add_trace(h2_render.line_trace("Solar (MWh)", detail["timestamp"], detail["solar_mwh"], line=dict(color="orange")))
+    fig_d.add_trace(h2_render.line_trace("Demand (MWh)", detail["timestamp"], detail["demand_mwh"], line=dict(color="grey")))
+    fig_d.add_trace(h2_render.line_trace("Electrolyzer (MWh)", detail["timestamp"], detail["electrolyzer_energy_mwh"], line=dict(color="blue")))
+    fig_d.add_trace(h2_render.line_trace("Stored H₂ (kg)", detail["timestamp"], detail["stored_h2_kg"], line=dict(color="green"), yaxis="y2"))
+    fig_d.update_layout(height=360, yaxis2=dict(overlaying="y", side="right", title="kg"))
+    st.plotly_chart(fig_d, use_container_width=True)
+    st.caption(f"{len(detail):,} steps in the window, drawn with at most {h2_render.MAX_POINTS:,} points per trace.")
+    h2_trace.split("native-resolution window", fig_d)
 
 st.markdown("---")
 
@@ -182,14 +200,283 @@ with right:
     st.write(f"Total H₂ sale revenue (USD/yr): {total_h2_rev_usd:,.2f}")
     st.write(f"Total electricity avoided (USD/yr): {total_elec_avoided_usd:,.2f}")
     st.markdown("---")
+    st.subheader(f"Project lifetime ({finance['lifetime_years']} years)")
+    st.write(f"NPV (USD): {life['npv_usd']:,.0f}")
+    st.write("IRR: " + ("n/a" if np.isnan(life["irr"]) else f"{life['irr'] * 100:,.1f}%"))
+    st.write(f"LCOH (USD/kg): {life['lcoh_usd_per_kg']:,.2f}")
+    st.write("Payback (years): " + ("not reached" if np.isnan(life["payback_years"]) else f"{life['payback_years']:,.1f}"))
+    st.caption("Cashflow = revenue + diesel savings − OPEX − stack replacements, after CAPEX.")
+    st.markdown("---")
     st.subheader("CO₂ (annual)")
     st.write(f"Total CO₂ from grid imports (tonnes/yr): {df['co2_from_grid_import_kg'].sum()/1000:,.2f}")
     st.write(f"Total CO₂ avoided from exports (tonnes/yr): {df['co2_avoided_from_export_kg'].sum()/1000:,.2f}")
+    st.markdown("---")
+    st.subheader("H₂ tank (annual)")
+    st.write(f"Curtailed H₂ (kg/yr): {df['curtailed_h2_kg'].sum():,.0f}")
+    st.write(f"Unmet fuel-cell H₂ (kg/yr): {df['unmet_fuelcell_h2_kg'].sum():,.0f}")
+    st.write(f"Unmet refuel H₂ (kg/yr): {df['unmet_refuel_h2_kg'].sum():,.0f}")
+
+h2_trace.split("charts + annual summary", fig, fig2, fig3)
 
 st.markdown("---")
 st.subheader("Monthly data table (MWh / kg / Tk)")
-st.dataframe(df.style.format({
+table_formats = {
     "solar_mwh":"{:.1f}","demand_mwh":"{:.1f}","grid_import_mwh":"{:.1f}","grid_export_mwh":"{:.1f}",
     "electrolyzer_energy_mwh":"{:.1f}","h2_kg":"{:.0f}","o2_kg":"{:.0f}","water_l":"{:.0f}",
     "fuelcell_elec_mwh":"{:.2f}","stored_h2_kg":"{:.0f}","o2_revenue_tk":"{:.0f}","monthly_revenue_tk":"{:.0f}"
-}))
+}
+h2_ui.paged_table(df, table_formats, "monthly")
+if h2_engine.is_timeseries(df_native):
+    with st.expander(f"Native-resolution data ({len(df_native):,} steps)"):
+        h2_ui.paged_table(df_native, table_formats, "native")
+
+h2_trace.split("tables")
+
+h2_ui.saved_scenarios("h2app", profile, params, df_native, finance, source,
+                      {"capex_usd": capex_usd, "opex_usd_per_month": opex_usd_per_month})
+
+h2_trace.split("saved scenarios")
+
+st.markdown("---")
+st.subheader("Parameter sweep (sensitivity)")
+# label, slider min, slider max, default range, slider units per model unit
+SWEEP_SPECS = {
+    "electrolyzer_eff": ("Electrolyzer efficiency (%)", 50, 90, (60, 90), 100.0),
+    "fuelcell_eff": ("Fuel cell efficiency (%)", 30, 70, (30, 70), 100.0),
+    "fraction_h2_to_fuelcell": ("Fraction H₂ -> Fuel cell (%)", 0, 100, (0, 100), 100.0),
+    "fraction_h2_to_refuel": ("Fraction H₂ -> Refuel (%)", 0, 100, (0, 100), 100.0),
+    "solar_frac_for_electrolysis": ("Solar fraction for electrolysis (%)", 0, 100, (50, 100), 100.0),
+    "oxygen_price_tk_per_kg": ("O₂ price (Tk/kg)", 0, 50, (5, 20), 1.0),
+    "h2_sale_price_tk_per_kg": ("H₂ sale price (Tk/kg)", 0, 1000, (0, 500), 1.0),
+    "grid_price_tk_per_mwh": ("Grid price (Tk/MWh)", 5000, 20000, (8000, 14000), 1.0),
+    "exchange_rate": ("BDT per USD", 80, 160, (100, 130), 1.0),
+    "capex_usd": ("CAPEX (M USD)", 1, 40, (8, 24), 1e-6),
+    "diesel_price_tk_per_l": ("Diesel price (Tk/L)", 50, 250, (90, 160), 1.0),
+    "discount_rate": ("Discount rate (%)", 0, 20, (4, 12), 100.0),
+    "price_escalation_per_yr": ("Tk price escalation (%/yr)", 0, 15, (2, 8), 100.0),
+}
+if st.checkbox("Enable sweep mode (evaluates the whole grid at once)", value=False):
+    sweep_params = st.multiselect("Parameters to sweep", list(SWEEP_SPECS),
+                                  default=["electrolyzer_eff", "fraction_h2_to_fuelcell", "oxygen_price_tk_per_kg"],
+                                  format_func=lambda k: SWEEP_SPECS[k][0])
+    sweep_steps = st.number_input("Grid points per parameter", min_value=2, max_value=200, value=21)
+    ranges = {}
+    range_cols = st.columns(max(len(sweep_params), 1))
+    for col, name in zip(range_cols, sweep_params):
+        label, lo, hi, default, unit = SWEEP_SPECS[name]
+        with col:
+            r_lo, r_hi = st.slider(label, lo, hi, default, key=f"sweep_{name}")
+        ranges[name] = np.linspace(r_lo, r_hi, int(sweep_steps)) / unit
+    kpi_labels = {"h2_kg": "H₂ (kg/yr)", "o2_kg": "O₂ (kg/yr)", "fuelcell_elec_mwh": "Fuel-cell electricity (MWh/yr)",
+                  "h2_to_refuel_kg": "H₂ to refuel (kg/yr)", "revenue_usd": "Revenue (USD/yr)", "co2_avoided_kg": "CO₂ avoided, net (kg/yr)",
+                  "npv_usd": "Lifetime NPV (USD)"}
+    sweep_kpi = st.selectbox("KPI", h2_sweep.KPIS, index=h2_sweep.KPIS.index("revenue_usd"), format_func=kpi_labels.get)
+    if ranges:
+        result = h2_sweep.sweep(profile, project_params, ranges)
+        st.caption(f"{int(np.prod([len(v) for v in ranges.values()])):,} combinations evaluated")
+        t_col, h_col = st.columns(2)
+        with t_col:
+            st.markdown("**Tornado (one parameter at a time)**")
+            tor = h2_sweep.tornado(profile, project_params, ranges, sweep_kpi).iloc[::-1]
+            fig_t = go.Figure()
+            fig_t.add_trace(go.Bar(name="Low", y=[SWEEP_SPECS[n][0] for n in tor["param"]], x=tor["kpi_low"] - tor["base"],
+                                   orientation="h", marker_color="indianred"))
+            fig_t.add_trace(go.Bar(name="High", y=[SWEEP_SPECS[n][0] for n in tor["param"]], x=tor["kpi_high"] - tor["base"],
+                                   orientation="h", marker_color="seagreen"))
+            fig_t.update_layout(barmode="overlay", height=380, xaxis_title=f"Δ {kpi_labels[sweep_kpi]} vs base")
+            st.plotly_chart(fig_t, use_container_width=True)
+        with h_col:
+            st.markdown("**Heatmap**")
+            if len(sweep_params) >= 2:
+                hx = st.selectbox("x", sweep_params, index=0, format_func=lambda k: SWEEP_SPECS[k][0])
+                hy = st.selectbox("y", [n for n in sweep_params if n != hx], index=0, format_func=lambda k: SWEEP_SPECS[k][0])
+                z = h2_sweep.slice_2d(result, sweep_kpi, hx, hy, at=project_params)
+                fig_h = go.Figure(go.Heatmap(x=result["axes"][hx] * SWEEP_SPECS[hx][4], y=result["axes"][hy] * SWEEP_SPECS[hy][4],
+                                             z=z, colorbar=dict(title=kpi_labels[sweep_kpi])))
+                fig_h.update_layout(height=380, xaxis_title=SWEEP_SPECS[hx][0], yaxis_title=SWEEP_SPECS[hy][0])
+                st.plotly_chart(fig_h, use_container_width=True)
+            else:
+                st.info("Select at least two parameters for a heatmap.")
+        st.markdown("**Pareto front**")
+        pareto_kpi = st.selectbox("Trade off against", [k for k in h2_sweep.KPIS if k != sweep_kpi], format_func=kpi_labels.get)
+        ka, kb = np.ravel(result["kpis"][sweep_kpi]), np.ravel(result["kpis"][pareto_kpi])
+        front = h2_sweep.pareto_front(ka, kb)
+        # plot a sample of the cloud plus every front point
+        sample = np.random.default_rng(0).choice(ka.size, size=min(ka.size, 5000), replace=False)
+        fig_p = go.Figure()
+        fig_p.add_trace(go.Scattergl(name="Scenarios", x=ka[sample], y=kb[sample], mode="markers", marker=dict(size=4, color="lightgrey")))
+        fig_p.add_trace(go.Scattergl(name="Pareto front", x=ka[front], y=kb[front], mode="markers", marker=dict(size=7, color="crimson")))
+        fig_p.update_layout(height=420, xaxis_title=kpi_labels[sweep_kpi], yaxis_title=kpi_labels[pareto_kpi])
+        st.plotly_chart(fig_p, use_container_width=True)
+        front_df = h2_sweep.to_frame(result, front)
+        st.dataframe(front_df.head(200))
+
+h2_trace.split("sweep")
+
+st.markdown("---")
+st.subheader("Monte Carlo uncertainty")
+if st.checkbox("Enable Monte Carlo mode", value=False):
+    mc1, mc2, mc3, mc4 = st.columns(4)
+    with mc1:
+        mc_n = st.number_input("Trajectories", min_value=100, max_value=500000, value=20000, step=1000)
+        mc_seed = st.number_input("Random seed", min_value=0, value=42, step=1)
+        mc_workers = st.number_input("Worker processes", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1)
+    with mc2:
+        sd_solar = st.slider("Solar yield σ (%)", 0, 40, 10)
+        sd_demand = st.slider("Demand σ (%)", 0, 40, 10)
+    with mc3:
+        ef_spread = st.slider("Grid emission factor ± (%)", 0, 50, 15)
+        diesel_rng = st.slider("Diesel price range (% of base)", 50, 200, (80, 130))
+    with mc4:
+        capex_rng = st.slider("CAPEX range (% of base)", 50, 200, (90, 130))
+        opex_rng = st.slider("OPEX range (% of base)", 50, 300, (90, 150))
+    uncertainty = {
+        "solar": ("normal", 1.0, sd_solar / 100.0),
+        "demand": ("normal", 1.0, sd_demand / 100.0),
+        "diesel_price_tk_per_l": ("triangular", diesel_rng[0] / 100.0, 1.0, diesel_rng[1] / 100.0),
+        "grid_emission_kgCO2_per_mwh": ("uniform", 1 - ef_spread / 100.0, 1 + ef_spread / 100.0),
+        "capex_usd": ("triangular", capex_rng[0] / 100.0, 1.0, capex_rng[1] / 100.0),
+        "opex_usd_per_month": ("triangular", opex_rng[0] / 100.0, 1.0, opex_rng[1] / 100.0),
+    }
+    if st.button("Run Monte Carlo"):
+        bar = st.progress(0.0, text="Sampling trajectories…")
+        st.session_state["mc_result"] = h2_montecarlo.run_monte_carlo(
+            profile, project_params, n=int(mc_n), seed=int(mc_seed), uncertainty=uncertainty, workers=int(mc_workers),
+            progress=lambda done, total: bar.progress(done / total, text=f"{done:,} / {total:,} trajectories"))
+        bar.empty()
+    mc_res = st.session_state.get("mc_result")
+    if mc_res is not None:
+        bands = mc_res["bands"]
+        st.dataframe(pd.DataFrame({
+            "KPI": ["H₂ output (kg/yr)", "Revenue (USD/yr)", "CO₂ avoided, net (t/yr)", "Cumulative cashflow, end (USD)",
+                    "Lifetime NPV (USD)", "IRR (%)", "Payback (years)"],
+            **{f"P{q}": [bands["h2_kg"][i], bands["revenue_usd"][i], bands["co2_avoided_kg"][i] / 1000,
+                         bands["cumulative_cashflow_usd"][i, -1], bands["npv_usd"][i], bands["irr"][i] * 100, bands["payback_years"][i]]
+               for i, q in enumerate(h2_montecarlo.PERCENTILES)},
+        }).style.format({"P10": "{:,.1f}", "P50": "{:,.1f}", "P90": "{:,.1f}"}))
+        cf = bands["cumulative_cashflow_usd"]
+        x = df["month"] if len(df) == cf.shape[1] else list(range(1, cf.shape[1] + 1))
+        fig_mc = go.Figure()
+        fig_mc.add_trace(go.Scatter(name="P90", x=x, y=cf[2], mode="lines", line=dict(width=0), showlegend=False))
+        fig_mc.add_trace(go.Scatter(name="P10–P90", x=x, y=cf[0], mode="lines", line=dict(width=0), fill="tonexty", fillcolor="rgba(0,128,0,0.2)"))
+        fig_mc.add_trace(go.Scatter(name="P50", x=x, y=cf[1], mode="lines+markers", line=dict(color="green")))
+        fig_mc.update_layout(height=380, title="Cumulative cashflow incl. diesel savings (USD)")
+        st.plotly_chart(fig_mc, use_container_width=True)
+        lc = bands["lifetime_cumulative_usd"]
+        fig_lc = go.Figure()
+        fig_lc.add_trace(go.Scatter(name="P90", x=list(range(lc.shape[1])), y=lc[2], mode="lines", line=dict(width=0), showlegend=False))
+        fig_lc.add_trace(go.Scatter(name="P10–P90", x=list(range(lc.shape[1])), y=lc[0], mode="lines", line=dict(width=0), fill="tonexty", fillcolor="rgba(0,0,128,0.2)"))
+        fig_lc.add_trace(go.Scatter(name="P50", x=list(range(lc.shape[1])), y=lc[1], mode="lines+markers", line=dict(color="navy")))
+        fig_lc.add_hline(y=0, line_dash="dash", annotation_text="Break-even", annotation_position="bottom right")
+        fig_lc.update_layout(height=380, title="Lifetime cumulative cashflow (USD, nominal)", xaxis_title="Year")
+        st.plotly_chart(fig_lc, use_container_width=True)
+        st.caption(f"{len(mc_res['h2_kg']):,} trajectories. Cashflow = revenue + diesel savings − OPEX, after CAPEX; "
+                   "the lifetime view adds degradation, stack replacements, escalation and the BDT path. "
+                   "IRR / payback percentiles count trajectories that never pay back as worst.")
+
+h2_trace.split("Monte Carlo")
+
+st.markdown("---")
+st.subheader("System sizing optimizer")
+if st.checkbox("Enable sizing optimizer", value=False):
+    op1, op2, op3 = st.columns(3)
+    with op1:
+        opt_objective = st.radio("Objective", ["Maximize NPV", "Minimize LCOH"], horizontal=True)
+        opt_min_co2 = st.number_input("Minimum CO₂ avoided (t/yr)", value=0.0, step=100.0)
+        opt_seed = st.number_input("Screening seed", min_value=0, value=0, step=1)
+    with op2:
+        opt_el_cost = st.number_input("Electrolyzer CAPEX (USD/MW)", value=h2_optimize.COST_DEFAULTS["electrolyzer_usd_per_mw"], step=10000.0)
+        opt_tank_cost = st.number_input("Tank CAPEX (USD/kg)", value=h2_optimize.COST_DEFAULTS["tank_usd_per_kg"], step=10.0)
+        opt_fc_cost = st.number_input("Fuel-cell CAPEX (USD/MW)", value=h2_optimize.COST_DEFAULTS["fuelcell_usd_per_mw"], step=10000.0)
+    with op3:
+        opt_fixed = st.number_input("Fixed CAPEX (USD)", value=h2_optimize.COST_DEFAULTS["fixed_capex_usd"], step=1000.0)
+        opt_stack = st.number_input("Stack replacement (% of electrolyzer CAPEX)", value=h2_optimize.COST_DEFAULTS["stack_replacement_frac"] * 100, step=5.0)
+    opt_costs = {"electrolyzer_usd_per_mw": opt_el_cost, "tank_usd_per_kg": opt_tank_cost, "fuelcell_usd_per_mw": opt_fc_cost,
+                 "fixed_capex_usd": opt_fixed, "stack_replacement_frac": opt_stack / 100.0}
+    if st.button("Run optimizer"):
+        with st.spinner("Screening candidates and refining…"):
+            st.session_state["opt_result"] = h2_optimize.optimize(
+                profile, project_params, opt_costs, objective="npv" if opt_objective == "Maximize NPV" else "lcoh",
+                min_co2_avoided_t=opt_min_co2, seed=int(opt_seed))
+    opt_res = st.session_state.get("opt_result")
+    if opt_res is not None:
+        design, kp = opt_res["design"], opt_res["kpis"]
+        d1, d2, d3, d4 = st.columns(4)
+        d1.metric("Electrolyzer (MW)", f"{design['electrolyzer_mw']:,.3f}")
+        d2.metric("H₂ tank (kg)", f"{design['tank_kg']:,.0f}")
+        d3.metric("Fuel cell (MW)", f"{design['fuelcell_mw']:,.3f}")
+        d4.metric("Solar to electrolysis (%)", f"{design['solar_frac_for_electrolysis'] * 100:,.1f}")
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("NPV (USD)", f"{kp['npv_usd']:,.0f}")
+        k2.metric("LCOH (USD/kg)", f"{kp['lcoh_usd_per_kg']:,.2f}")
+        k3.metric("CAPEX (USD)", f"{kp['capex_usd']:,.0f}")
+        k4.metric("CO₂ avoided (t/yr)", f"{kp['co2_avoided_t_per_yr']:,.0f}")
+        if not opt_res["feasible"]:
+            st.warning("No design inside the bounds meets the CO₂ requirement; showing the closest one.")
+        st.markdown("**Binding constraints:** " + ("; ".join(opt_res["binding"]) or "none (interior optimum)"))
+        scr = opt_res["screened"]
+        fig_opt = go.Figure(go.Scatter(x=scr["capex_usd"], y=scr["npv_usd"], mode="markers", name="screened",
+                                       marker=dict(color=scr["co2_avoided_t_per_yr"], colorscale="Viridis", showscale=True,
+                                                   colorbar=dict(title="CO₂ t/yr"))))
+        fig_opt.add_trace(go.Scatter(x=[kp["capex_usd"]], y=[kp["npv_usd"]], mode="markers", name="optimum",
+                                     marker=dict(symbol="star", size=16, color="red")))
+        fig_opt.update_layout(height=380, xaxis_title="CAPEX (USD)", yaxis_title="NPV (USD)")
+        st.plotly_chart(fig_opt, use_container_width=True)
+        st.caption(f"{opt_res['evaluations']:,} design evaluations in {opt_res['seconds']:.1f} s. "
+                   "Enter the design in the sidebar ratings to inspect it in the charts above.")
+
+h2_trace.split("optimizer")
+
+st.markdown("---")
+st.subheader("Portfolio (multi-site)")
+if st.checkbox("Enable portfolio mode", value=False):
+    site_files = st.file_uploader("Site profile CSVs (one per site, same formats as the sidebar upload)", type=["csv"],
+                                  accept_multiple_files=True, key="portfolio_files")
+    try:
+        if site_files:
+            site_profiles = [(f.name.rsplit(".", 1)[0], h2_ui.read_profile(f, "h2app", resample_freq)) for f in site_files]
+        else:
+            n_demo = st.number_input("Demo sites (used when no files are uploaded)", min_value=1, max_value=1000, value=5)
+            scales = np.random.default_rng(0).uniform(0.6, 1.4, int(n_demo))
+            site_profiles = [(f"Demo site {i + 1}", h2_engine.demo_profile(default_solar_mwh * k)) for i, k in enumerate(scales)]
+    except (OSError, ValueError) as exc:
+        st.error(str(exc))
+        st.stop()
+    # per-site overrides, starting from the sidebar values
+    site_table = pd.DataFrame({
+        "site": [name for name, _ in site_profiles],
+        "solar_frac_for_electrolysis_pct": solar_frac_for_electrolysis * 100,
+        "electrolyzer_eff_pct": electrolyzer_eff * 100,
+        "tank_max_kg (0 = unlimited)": 0.0 if np.isinf(tank_max_kg) else tank_max_kg,
+        "oxygen_price_tk_per_kg": oxygen_price_tk_per_kg,
+        "capex_usd": capex_usd,
+    })
+    site_table = st.data_editor(site_table, disabled=["site"], hide_index=True, key="portfolio_sites")
+    pf_workers = st.number_input("Worker processes (large portfolios)", min_value=1, max_value=os.cpu_count() or 1, value=1, key="portfolio_workers")
+    sites = []
+    for (name, prof), row in zip(site_profiles, site_table.itertuples(index=False)):
+        tank = row[3] if row[3] > 0 else float("inf")
+        sites.append({"name": name, "profile": prof, "params": {
+            **project_params, "solar_frac_for_electrolysis": row[1] / 100.0, "electrolyzer_eff": row[2] / 100.0,
+            "tank_max_kg": tank, "oxygen_price_tk_per_kg": row[4], "capex_usd": row[5]}})
+    site_kpis = h2_portfolio.run_portfolio(sites, workers=int(pf_workers))
+    total = h2_portfolio.totals(site_kpis)
+    p1, p2, p3, p4 = st.columns(4)
+    p1.metric("Portfolio H₂ (kg/yr)", f"{total['h2_kg']:,.0f}")
+    p2.metric("O₂ revenue (USD/yr)", f"{total['o2_revenue_usd']:,.0f}")
+    p3.metric("CO₂ avoided, net (t/yr)", f"{total['co2_avoided_kg'] / 1000:,.0f}")
+    p4.metric("Lifetime NPV (USD)", f"{total['npv_usd']:,.0f}")
+    fig_pf = go.Figure()
+    fig_pf.add_trace(go.Bar(name="H₂ (kg/yr)", x=site_kpis["site"], y=site_kpis["h2_kg"], marker_color="green"))
+    fig_pf.add_trace(go.Bar(name="CO₂ avoided (t/yr)", x=site_kpis["site"], y=site_kpis["co2_avoided_kg"] / 1000,
+                            marker_color="seagreen", yaxis="y2"))
+    fig_pf.update_layout(barmode="group", height=380, yaxis=dict(title="H₂ (kg/yr)"),
+                         yaxis2=dict(title="CO₂ avoided (t/yr)", overlaying="y", side="right"))
+    st.plotly_chart(fig_pf, use_container_width=True)
+    h2_ui.paged_table(site_kpis, {k: "{:,.0f}" for k in h2_portfolio.KPIS}, "portfolio")
+    st.caption(f"{len(sites):,} sites, annual values. Sites of equal length are simulated together as one stacked array. "
+               "CO₂ avoided = export + diesel + fuel cell − grid electricity for electrolysis.")
+h2_trace.split("portfolio")
+
+if show_timing:
+    h2_ui.timing_panel(trace, "h2app_trace.json")
@@ -7,13 +7,20 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
+import h2_engine
+import h2_finance
+import h2_trace
+import h2_ui
+
 st.set_page_config(layout="wide", page_title="Design A — Hydrogen Dashboard (IIUC)")
 
 st.sidebar.title("Model settings & paper defaults")
+show_timing = st.sidebar.checkbox("Timing panel (per-stage wall time of this rerun)", value=False)
+# opt-in: with no active trace every h2_trace call is a no-op
+trace = h2_trace.activate(h2_trace.Trace() if show_timing else None)
 
 h2_LHV_kwh_per_kg = st.sidebar.number_input("H₂ LHV (kWh/kg)", value=33.33, format="%.3f")
 electrolyzer_eta = st.sidebar.slider("Electrolyzer efficiency (η)", 50, 90, 80) / 100.0
-electrolyzer_kwh_per_kg = h2_LHV_kwh_per_kg / electrolyzer_eta
 fuelcell_eff = st.sidebar.slider("Fuel cell efficiency (η_fc %)", 30, 70, 50) / 100.0
 h2_hot_monthly = st.sidebar.number_input("H₂ (hot season kg/month)", value=18000.0)
 h2_cold_monthly = st.sidebar.number_input("H₂ (cold season kg/month)", value=15000.0)
@@ -32,62 +39,56 @@ st.sidebar.markdown('Operational sliders')
 fraction_h2_to_fuelcell = st.sidebar.slider("Fraction of H₂ for fuel cell (%)", 0, 100, 30) / 100.0
 fraction_h2_to_refuel = st.sidebar.slider("Fraction of H₂ to refuelling (%)", 0, 100, 70) / 100.0
 initial_h2_storage_kg = st.sidebar.number_input("Initial stored H₂ (kg)", value=700.0)
+tank_min_kg = st.sidebar.number_input("Tank minimum inventory (kg)", value=0.0, min_value=0.0)
+tank_max_kg = st.sidebar.number_input("Tank capacity (kg, 0 = unlimited)", value=0.0, min_value=0.0)
+tank_max_kg = tank_max_kg if tank_max_kg > 0 else float("inf")
 st.sidebar.markdown('---')
-st.sidebar.markdown("Upload monthly CSV (optional): columns 'month','solar_kwh','demand_kwh' (12 rows)")
-uploaded = st.sidebar.file_uploader("Monthly profile CSV", type=["csv"])
-
-def demo_monthly_df():
-    months = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-    demand = np.array([31500,39000,64500,72000,117000,78000,94500,46500,114000,102000,87000,46500])
-    solar_monthly = np.full(12, solar_net_monthly_default)
-    df = pd.DataFrame({"month": months, "solar_kwh": solar_monthly, "demand_kwh": demand})
-    return df
-
-if uploaded:
-    df = pd.read_csv(uploaded)
-    if not set(["month","solar_kwh","demand_kwh"]).issubset(df.columns):
-        st.error("CSV must contain 'month','solar_kwh','demand_kwh' columns.")
-        st.stop()
-    df = df[["month","solar_kwh","demand_kwh"]].copy()
-else:
-    df = demo_monthly_df()
+source, resample_freq = h2_ui.profile_source("design_a")
+profile = (h2_ui.load_profile(source, "design_a", resample_freq) if source
+           else h2_engine.demo_profile_design_a(solar_net_monthly_default))
 
-df["grid_import_kwh"] = np.maximum(0, df["demand_kwh"] - df["solar_kwh"])
-df["grid_export_kwh"] = np.maximum(0, df["solar_kwh"] - df["demand_kwh"])
-hot_months = ["Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov"]
-df["season"] = df["month"].apply(lambda x: "Hot" if x in hot_months else "Cold")
-df["mH2_paper_kg"] = df["season"].apply(lambda s: h2_hot_monthly if s=="Hot" else h2_cold_monthly)
 solar_fraction_for_electrolysis = st.sidebar.slider("Fraction of solar used for electrolysis (%)", 0, 100, 80) / 100.0
-df["solar_alloc_for_electrolysis_kwh"] = df["solar_kwh"] * solar_fraction_for_electrolysis
-df["mH2_from_energy_kg"] = df["solar_alloc_for_electrolysis_kwh"] / electrolyzer_kwh_per_kg
-df["mH2_kg"] = df["mH2_paper_kg"]
-df["mO2_kg"] = df["mH2_kg"] * 8.0
-df["water_kg"] = df["mH2_kg"] * 9.0
-df["water_l"] = df["water_kg"]
-df["co2_from_grid_import_kg"] = df["grid_import_kwh"] * grid_emission_kgCO2_per_kwh
-df["co2_avoided_from_export_kg"] = df["grid_export_kwh"] * grid_emission_kgCO2_per_kwh
-df["co2_avoided_from_diesel_kg"] = diesel_l_per_month * diesel_co2_kg_per_l / 12.0
-df["h2_for_fuelcell_kg"] = df["mH2_kg"] * fraction_h2_to_fuelcell
-df["fuelcell_elec_kwh"] = df["h2_for_fuelcell_kg"] * h2_LHV_kwh_per_kg * fuelcell_eff
-df["h2_to_refuel_kg"] = df["mH2_kg"] * fraction_h2_to_refuel
-df["monthly_h2_input_kg"] = df["mH2_kg"]
-df["monthly_h2_output_kg"] = df["h2_for_fuelcell_kg"] + df["h2_to_refuel_kg"]
-storage = []
-s = initial_h2_storage_kg
-for i, row in df.iterrows():
-    s = s + row["monthly_h2_input_kg"] - row["monthly_h2_output_kg"]
-    storage.append(max(0.0, s))
-df["stored_h2_kg"] = storage
-df["o2_revenue_tk"] = df["mO2_kg"] * oxygen_price_tk_per_kg
 diesel_price_tk_per_l = st.sidebar.number_input("Diesel price (Tk/L)", value=114.0)
-diesel_savings_tk_per_month = diesel_l_per_month * diesel_price_tk_per_l
-df["electricity_avoided_tk"] = df["fuelcell_elec_kwh"] * grid_price_tk_per_kwh
 h2_sale_price_tk_per_kg = st.sidebar.number_input("Potential H₂ sale price (Tk/kg)", value=0.0)
-df["h2_revenue_tk"] = df["h2_to_refuel_kg"] * h2_sale_price_tk_per_kg
-df["monthly_revenue_tk"] = df["o2_revenue_tk"] + df["h2_revenue_tk"] + df["electricity_avoided_tk"]
-df["monthly_revenue_usd"] = df["monthly_revenue_tk"] / exchange_rate
-df["monthly_net_usd"] = df["monthly_revenue_usd"] - opex_usd_per_month
-df["cumulative_cashflow_usd"] = df["monthly_net_usd"].cumsum() - capex_usd
+st.sidebar.markdown('---')
+st.sidebar.markdown('Project finance (lifetime)')
+finance = h2_ui.finance_sidebar()
+
+h2_trace.split("sidebar + profile load")
+# Model run — memoized in h2_engine on (profile, params)
+params = {
+    "h2_LHV_kwh_per_kg": h2_LHV_kwh_per_kg,
+    "electrolyzer_eta": electrolyzer_eta,
+    "fuelcell_eff": fuelcell_eff,
+    "h2_hot_monthly": h2_hot_monthly,
+    "h2_cold_monthly": h2_cold_monthly,
+    "h2_annual_avg_monthly": h2_annual_avg_monthly,
+    "capex_usd": capex_usd,
+    "exchange_rate": exchange_rate,
+    "oxygen_price_tk_per_kg": oxygen_price_tk_per_kg,
+    "grid_emission_kgCO2_per_kwh": grid_emission_kgCO2_per_kwh,
+    "diesel_l_per_month": diesel_l_per_month,
+    "diesel_co2_kg_per_l": diesel_co2_kg_per_l,
+    "grid_price_tk_per_kwh": grid_price_tk_per_kwh,
+    "opex_usd_per_month": opex_usd_per_month,
+    "fraction_h2_to_fuelcell": fraction_h2_to_fuelcell,
+    "fraction_h2_to_refuel": fraction_h2_to_refuel,
+    "initial_h2_storage_kg": initial_h2_storage_kg,
+    "tank_min_kg": tank_min_kg,
+    "tank_max_kg": tank_max_kg,
+    "solar_fraction_for_electrolysis": solar_fraction_for_electrolysis,
+    "diesel_price_tk_per_l": diesel_price_tk_per_l,
+    "h2_sale_price_tk_per_kg": h2_sale_price_tk_per_kg,
+}
+df_native = h2_engine.simulate_design_a(profile, params)
+h2_trace.split("simulate")
+# Monthly rollup for KPIs, charts and table (identity for 12-row monthly profiles)
+df = h2_engine.rollup(df_native)
+# Project lifetime: first-year totals extended with degradation, replacements, escalation and the BDT path
+per_year = h2_finance.annual_factor(df_native)
+life = h2_finance.lifetime(df["mH2_kg"].sum() * per_year, df["monthly_revenue_tk"].sum() * per_year, capex_usd,
+                           opex_usd_per_month * 12.0, exchange_rate, diesel_l_per_month * 12.0 * diesel_price_tk_per_l, finance)
+h2_trace.split("rollup + lifetime finance")
 
 st.title("Design A — KPI Grid Dashboard for Solar-Hydrogen System (IIUC)")
 k1, k2, k3, k4 = st.columns(4)
@@ -130,27 +131,45 @@ with right_col:
     st.subheader("Financials & Payback")
     st.metric("CAPEX (USD)", f"{capex_usd:,.0f}")
     st.metric("Avg monthly revenue (USD)", f"{df['monthly_revenue_usd'].mean():,.0f}")
-    st.metric("Cumulative cashflow (USD, last month)", f"{df['cumulative_cashflow_usd'].iloc[-1]:,.0f}")
+    st.metric(f"NPV (USD, {finance['lifetime_years']} yr)", f"{life['npv_usd']:,.0f}")
+    st.metric("IRR", "n/a" if np.isnan(life["irr"]) else f"{life['irr'] * 100:,.1f}%")
+    st.metric("LCOH (USD/kg)", f"{life['lcoh_usd_per_kg']:,.2f}")
+    st.metric("Payback (years)", "not reached" if np.isnan(life["payback_years"]) else f"{life['payback_years']:,.1f}")
     fig_cf = go.Figure()
-    fig_cf.add_trace(go.Scatter(name="Cumulative cashflow (USD)", x=df["month"], y=df["cumulative_cashflow_usd"], mode="lines+markers"))
+    fig_cf.add_trace(go.Scatter(name="Cumulative cashflow (USD)", x=life["years"], y=life["cumulative_usd"], mode="lines+markers"))
+    fig_cf.add_trace(go.Scatter(name="Discounted (USD)", x=life["years"], y=life["discounted_cumulative_usd"], mode="lines", line=dict(dash="dot")))
     fig_cf.add_hline(y=0, line_dash="dash", annotation_text="Break-even", annotation_position="bottom right")
+    fig_cf.update_layout(xaxis_title="Year")
     st.plotly_chart(fig_cf, use_container_width=True, height=300)
+    st.caption("Lifetime cashflow = revenue + diesel savings − OPEX − stack replacements, after CAPEX.")
     st.subheader("CO₂ breakdown (monthly)")
     fig_co2 = go.Figure()
     fig_co2.add_trace(go.Bar(name="CO₂ from grid import (kg)", x=df["month"], y=df["co2_from_grid_import_kg"], marker_color="red"))
     fig_co2.add_trace(go.Bar(name="CO₂ avoided from export (kg)", x=df["month"], y=df["co2_avoided_from_export_kg"], marker_color="green"))
     fig_co2.update_layout(barmode='group', height=300)
     st.plotly_chart(fig_co2, use_container_width=True)
+h2_trace.split("KPIs + charts", fig, fig2, fig3, fig_cf, fig_co2)
 st.markdown('---')
 st.subheader("Detailed monthly table")
-st.dataframe(df[["month","season","solar_kwh","demand_kwh","grid_import_kwh","grid_export_kwh",
-                 "mH2_kg","mO2_kg","water_l","h2_for_fuelcell_kg","fuelcell_elec_kwh",
-                 "h2_to_refuel_kg","stored_h2_kg","o2_revenue_tk","monthly_revenue_tk","monthly_net_usd","cumulative_cashflow_usd"]]
-            .style.format({
-                "solar_kwh":"{:.0f}","demand_kwh":"{:.0f}","grid_import_kwh":"{:.0f}",
-                "mH2_kg":"{:.0f}","mO2_kg":"{:.0f}","water_l":"{:.0f}",
-                "fuelcell_elec_kwh":"{:.0f}","stored_h2_kg":"{:.0f}",
-                "o2_revenue_tk":"{:.0f}","monthly_revenue_tk":"{:.0f}","monthly_net_usd":"{:.0f}","cumulative_cashflow_usd":"{:.0f}"
-            }))
+table_cols = ["month","season","solar_kwh","demand_kwh","grid_import_kwh","grid_export_kwh",
+              "mH2_kg","mO2_kg","water_l","h2_for_fuelcell_kg","fuelcell_elec_kwh",
+              "h2_to_refuel_kg","stored_h2_kg","curtailed_h2_kg","unmet_fuelcell_h2_kg","unmet_refuel_h2_kg","o2_revenue_tk","monthly_revenue_tk","monthly_net_usd","cumulative_cashflow_usd"]
+table_formats = {
+    "solar_kwh":"{:.0f}","demand_kwh":"{:.0f}","grid_import_kwh":"{:.0f}",
+    "mH2_kg":"{:.0f}","mO2_kg":"{:.0f}","water_l":"{:.0f}",
+    "fuelcell_elec_kwh":"{:.0f}","stored_h2_kg":"{:.0f}","curtailed_h2_kg":"{:.0f}",
+    "unmet_fuelcell_h2_kg":"{:.0f}","unmet_refuel_h2_kg":"{:.0f}",
+    "o2_revenue_tk":"{:.0f}","monthly_revenue_tk":"{:.0f}","monthly_net_usd":"{:.0f}","cumulative_cashflow_usd":"{:.0f}"
+}
+h2_ui.paged_table(df[table_cols], table_formats, "monthly")
+if h2_engine.is_timeseries(df_native):
+    with st.expander(f"Native-resolution data ({len(df_native):,} steps)"):
+        h2_ui.paged_table(df_native[["timestamp"] + table_cols], table_formats, "native")
+h2_trace.split("tables")
 st.markdown('---')
-st.caption("Notes: default values and formulas are taken from the uploaded paper. Change sidebar inputs to match alternative scenarios or paste your exact equations in the code where indicated.")
\ No newline at end of file
+st.caption("Notes: default values and formulas are taken from the uploaded paper. Change sidebar inputs to match alternative scenarios or paste your exact equations in the code where indicated.")
+h2_ui.saved_scenarios("design_a", profile, params, df_native, finance, source)
+h2_trace.split("saved scenarios")
+
+if show_timing:
+    h2_ui.timing_panel(trace, "designA_trace.json")
@@ -0,0 +1,264 @@
+# h2_api.py — local HTTP service for the H2 model (asyncio, no Streamlit)
+#
+# Same scenarios and KPIs as h2_batch, over JSON:
+#     POST /run      body: a scenario mapping or a list of them (see h2_batch); add
+#                    "timeseries": "monthly" | "native" to a scenario to get its columns back.
+#                    CSV profiles are paths inside H2_DATA_DIR (none allowed when it is unset)
+#     GET  /models   default params of each model and the finance defaults
+#     GET  /health   model version and batching counters
+# Requests arriving within BATCH_WINDOW of each other are batched: identical scenarios are
+# computed once, and scenarios on the same profile run together in one worker, where the engine's
+# incremental graph session recomputes only what their params change. Batches are spread over a
+# process pool; every worker shares the persistent h2_store result store.
+#     python h2_api.py --port 8765 --workers 4
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+import h2_batch
+import h2_engine
+import h2_finance
+import h2_ingest
+
+# seconds the batcher waits for more requests after the first one, and the batch size cap
+BATCH_WINDOW = 0.02
+BATCH_MAX = 256
+MAX_BODY_BYTES = 64 << 20
+
+
+def _jsonable(x):
+    # NaN / inf are not JSON: send null
+    if isinstance(x, dict):
+        return {str(k): _jsonable(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [_jsonable(v) for v in x]
+    if isinstance(x, (float, np.floating)):
+        return float(x) if math.isfinite(x) else None
+    if isinstance(x, np.integer):
+        return int(x)
+    if isinstance(x, (np.bool_,)):
+        return bool(x)
+    if isinstance(x, pd.Timestamp):
+        return x.isoformat()
+    return x
+
+
+def _columns(frame):
+    out = {}
+    for c in frame.columns:
+        col = frame[c]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            out[c] = col.dt.strftime("%Y-%m-%dT%H:%M:%S").tolist()
+        else:
+            out[c] = col.tolist()
+    return out
+
+
+def _run_group(items):
+    # worker: scenarios sharing one profile, run back to back
+    results = []
+    for scenario in items:
+        row, frame = h2_batch.run_scenario(scenario, scenario.get("timeseries", "none"))
+        if frame is not None:
+            row["timeseries"] = _columns(frame)
+        results.append(_jsonable(row))
+    return results
+
+
+class Batcher:
+    """Collects scenarios from concurrent requests and runs them in deduplicated, profile-grouped batches."""
+
+    def __init__(self, executor, workers, window=BATCH_WINDOW, max_batch=BATCH_MAX):
+        self.executor = executor
+        self.workers = workers
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.stats = {"requests": 0, "scenarios": 0, "computed": 0, "batches": 0}
+        # the event loop keeps only weak references to tasks: hold the running dispatches here
+        self._tasks = set()
+
+    async def submit(self, scenarios):
+        loop = asyncio.get_running_loop()
+        futures = []
+        for s in scenarios:
+            fut = loop.create_future()
+            await self.queue.put((s, fut))
+            futures.append(fut)
+        self.stats["requests"] += 1
+        self.stats["scenarios"] += len(scenarios)
+        return await asyncio.gather(*futures)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        # identical scenarios are computed once; the rest are grouped by (model, profile)
+        unique, waiting, groups = {}, {}, {}
+        for s, fut in batch:
+            # the name is only echoed back, so it is not part of the identity
+            key = json.dumps({k: v for k, v in s.items() if k != "name"}, sort_keys=True, default=str)
+            waiting.setdefault(key, []).append((s.get("name"), fut))
+            if key not in unique:
+                unique[key] = s
+                group = json.dumps([s.get("model", "h2app"), s.get("profile"), s.get("freq", "h")], sort_keys=True, default=str)
+                groups.setdefault(group, []).append(key)
+        self.stats["batches"] += 1
+        self.stats["computed"] += len(unique)
+        # whole groups per chunk, about one chunk per worker
+        chunks = [[] for _ in range(min(self.workers, len(groups)))]
+        for keys in sorted(groups.values(), key=len, reverse=True):
+            min(chunks, key=len).extend(keys)
+        jobs = [loop.run_in_executor(self.executor, _run_group, [unique[k] for k in keys]) for keys in chunks]
+        for keys, job in zip(chunks, jobs):
+            try:
+                rows = await job
+            except Exception as exc:  # a crashed worker fails only its own scenarios
+                rows = [{"scenario": unique[k].get("name", "scenario"), "error": f"{type(exc).__name__}: {exc}"} for k in keys]
+            for key, row in zip(keys, rows):
+                for name, fut in waiting[key]:
+                    if not fut.done():
+                        fut.set_result({**row, "scenario": name})
+
+
+def _scenarios(body):
+    data = json.loads(body or b"null")
+    items = data if isinstance(data, list) else [data]
+    if not items or not all(isinstance(s, dict) for s in items):
+        raise ValueError("body must be a scenario object or a non-empty list of them")
+    out = []
+    for i, s in enumerate(items):
+        s = {k: v for k, v in s.items() if k != "_base_dir"}
+        s.setdefault("name", f"scenario_{i + 1}")
+        if s.get("timeseries", "none") not in h2_batch.TIMESERIES:
+            raise ValueError(f"timeseries must be one of {', '.join(h2_batch.TIMESERIES)}")
+        if isinstance(s.get("profile"), str) and s["profile"] != "demo":
+            # clients may only name CSVs inside the configured data directory
+            s["profile"] = h2_ingest.resolve_data_path(s["profile"])
+        out.append(s)
+    return out
+
+
+async def _respond(writer, status, payload):
+    body = json.dumps(_jsonable(payload), allow_nan=False).encode()
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+def make_handler(batcher):
+    async def handle(reader, writer):
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            request = lines[0].split(" ")
+            if len(request) != 3 or not request[2].startswith("HTTP/"):
+                await _respond(writer, HTTPStatus.BAD_REQUEST, {"error": "malformed request line"})
+                return
+            method, target, _ = request
+            headers = dict(line.split(":", 1) for line in lines[1:] if ":" in line)
+            headers = {k.strip().lower(): v.strip() for k, v in headers.items()}
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                await _respond(writer, HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"})
+                return
+            if length > MAX_BODY_BYTES:
+                await _respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "request body too large"})
+                return
+            body = await reader.readexactly(length) if length else b""
+            path = target.split("?", 1)[0]
+            if method == "GET" and path == "/health":
+                await _respond(writer, HTTPStatus.OK, {"status": "ok", "model_version": h2_engine.MODEL_VERSION, **batcher.stats})
+            elif method == "GET" and path == "/models":
+                await _respond(writer, HTTPStatus.OK, {
+                    "models": {name: m["defaults"] for name, m in h2_batch.MODELS.items()},
+                    "finance": h2_finance.FINANCE_DEFAULTS, "kpis": h2_batch.KPIS})
+            elif method == "POST" and path == "/run":
+                try:
+                    scenarios = _scenarios(body)
+                except ValueError as exc:
+                    await _respond(writer, HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+                    return
+                results = await batcher.submit(scenarios)
+                await _respond(writer, HTTPStatus.OK, {"results": results})
+            else:
+                await _respond(writer, HTTPStatus.NOT_FOUND, {"error": f"no route {method} {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(host="127.0.0.1", port=8765, workers=1, ready=None):
+    """Run the service until cancelled; workers > 1 computes batches on a process pool."""
+    workers = max(1, int(workers or 1))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+    batcher = Batcher(executor, workers)
+    batch_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(make_handler(batcher), host, port, limit=1 << 16)
+    try:
+        # SIGTERM stops the server like Ctrl+C, so the pool workers are shut down with it
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError, RuntimeError):
+        pass  # Windows: no loop signal handlers; RuntimeError: not the main thread
+    if ready:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local HTTP API for the H2 model (POST /run with scenario JSON).")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = ap.parse_args(argv)
+
+    def ready(server):
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"H2 model API on http://{host}:{port} ({args.workers} workers)", flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
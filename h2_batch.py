@@ -0,0 +1,268 @@
+# h2_batch.py — headless batch runner for scenario files (no Streamlit)
+#
+# A scenario is a mapping (YAML or JSON file; a file may also hold a list of them):
+#     name: dry_season_tank      # default: file name
+#     model: h2app               # h2app (H2app.py, MWh) or design_a (designA_hydrogen_dashboard.py, kWh)
+#     profile: site_2023.csv     # "demo" (default), a CSV path relative to the file, or inline columns
+#     freq: h                    # time step for timestamped CSVs (h / 15min)
+#     params: {tank_max_kg: 5000, discount_rate: 0.1}   # sidebar keys, finance keys, capex / opex
+# Scenarios run through h2_engine (and its persistent result store) in a process pool. The output
+# directory receives one KPI table (annual values + lifetime finance, one row per scenario) and
+# the time series of each scenario, as Parquet or CSV:
+#     python h2_batch.py scenarios/ --out results --format parquet --workers 8
+
+import argparse
+import json
+import math
+import numbers
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import h2_engine
+import h2_finance
+import h2_ingest
+
+# per model: simulate function, params defaults, profile columns, demo profile (from params)
+MODELS = {
+    "h2app": {
+        "simulate": h2_engine.simulate,
+        "defaults": h2_engine.DEFAULT_PARAMS,
+        "columns": ["solar_mwh", "demand_mwh"],
+        "demo": lambda p: h2_engine.demo_profile(p["default_solar_mwh"]),
+    },
+    "design_a": {
+        "simulate": h2_engine.simulate_design_a,
+        "defaults": h2_engine.DESIGN_A_DEFAULTS,
+        "columns": ["solar_kwh", "demand_kwh"],
+        "demo": lambda p: h2_engine.demo_profile_design_a(p["solar_net_monthly_default"]),
+    },
+}
+
+KPIS = ["h2_kg_per_yr", "o2_kg_per_yr", "curtailed_h2_kg_per_yr", "unmet_h2_kg_per_yr", "fuelcell_elec_mwh_per_yr",
+        "grid_import_mwh_per_yr", "o2_revenue_usd_per_yr", "revenue_usd_per_yr", "co2_avoided_t_per_yr",
+        "npv_usd", "irr", "lcoh_usd_per_kg", "payback_years", "discounted_payback_years"]
+
+TIMESERIES = ["native", "monthly", "none"]
+
+
+def _model(name):
+    if name not in MODELS:
+        raise ValueError(f"unknown model {name!r} (expected one of {', '.join(MODELS)})")
+    return MODELS[name]
+
+
+def _check_value(name, value, default):
+    # switches take true / false; everything else is a number (inf allowed for limits, NaN is not)
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"parameter {name} must be true or false, got {value!r}")
+        return value
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or math.isnan(value):
+        raise ValueError(f"parameter {name} must be a number, got {value!r}")
+    if name == "lifetime_years":
+        if value < 1 or value != int(value):
+            raise ValueError(f"parameter {name} must be a whole number of years, got {value!r}")
+        return int(value)
+    return value
+
+
+def split_params(model, params):
+    """(simulation params, full params): simulate() only sees its own keys, so its cache key stays stable."""
+    m = _model(model)
+    if params is not None and not isinstance(params, dict):
+        raise ValueError("params must be a mapping of parameter names to values")
+    params = dict(params or {})
+    unknown = sorted(set(params) - set(m["defaults"]) - set(h2_finance.FINANCE_DEFAULTS))
+    if unknown:
+        raise ValueError(f"unknown parameter(s) for model {model}: {', '.join(unknown)}")
+    defaults = {**h2_finance.FINANCE_DEFAULTS, **m["defaults"]}
+    params = {k: _check_value(k, v, defaults[k]) for k, v in params.items()}
+    return {k: v for k, v in params.items() if k in m["defaults"]}, {**m["defaults"], **params}
+
+
+def load_profile(spec, model, params=None, base_dir=".", freq="h"):
+    """Profile frame from "demo", a CSV path (monthly or timestamped) or a mapping of columns."""
+    m = _model(model)
+    if spec is None or spec == "demo":
+        return m["demo"]({**m["defaults"], **(params or {})})
+    if isinstance(spec, dict):
+        df = pd.DataFrame(spec)
+        if "timestamp" in df.columns:
+            df["timestamp"] = pd.to_datetime(df["timestamp"])
+    else:
+        path = os.path.join(base_dir, os.path.expanduser(spec))
+        if "timestamp" in h2_ingest.read_header(path):
+            # streamed into the shared float32 cache, like a server-side path in the apps
+            return h2_ingest.ingest_csv(path, {c: c for c in m["columns"]}, freq=freq)
+        df = pd.read_csv(path)
+    key = "timestamp" if "timestamp" in df.columns else "month"
+    missing = [c for c in [key] + m["columns"] if c not in df.columns]
+    if missing:
+        raise ValueError("profile must contain 'month' or 'timestamp', " + ",".join(f"'{c}'" for c in m["columns"]))
+    return df[[key] + m["columns"]]
+
+
+def summarize(model, frame, params=None):
+    """Annual KPIs and lifetime finance (KPIS keys) of a simulated frame; params may include finance keys."""
+    p = {**_model(model)["defaults"], **(params or {})}
+    a = h2_finance.annual_factor(frame)
+    if model == "h2app":
+        h2, o2 = frame["h2_kg"].sum(), frame["o2_kg"].sum()
+        fc_mwh, grid_mwh = frame["fuelcell_elec_mwh"].sum(), frame["grid_import_mwh"].sum()
+        co2 = h2_engine.co2_avoided_kg(frame["grid_export_mwh"].sum(), fc_mwh, frame["grid_to_electrolysis_mwh"].sum(),
+                                       p["grid_emission_kgCO2_per_mwh"], frame["co2_avoided_from_diesel_kg"].sum())
+    else:
+        h2, o2 = frame["mH2_kg"].sum(), frame["mO2_kg"].sum()
+        fc_mwh, grid_mwh = frame["fuelcell_elec_kwh"].sum() / 1000.0, frame["grid_import_kwh"].sum() / 1000.0
+        # paper H2: the electrolyzer draws no grid power
+        co2 = h2_engine.co2_avoided_kg(frame["grid_export_kwh"].sum(), frame["fuelcell_elec_kwh"].sum(), 0.0,
+                                       p["grid_emission_kgCO2_per_kwh"], frame["co2_avoided_from_diesel_kg"].sum())
+    life = h2_finance.lifetime(h2 * a, frame["monthly_revenue_tk"].sum() * a, p["capex_usd"], p["opex_usd_per_month"] * 12.0,
+                               p["exchange_rate"], p["diesel_l_per_month"] * 12.0 * p["diesel_price_tk_per_l"], p)
+    return {
+        "h2_kg_per_yr": h2 * a,
+        "o2_kg_per_yr": o2 * a,
+        "curtailed_h2_kg_per_yr": frame["curtailed_h2_kg"].sum() * a,
+        "unmet_h2_kg_per_yr": (frame["unmet_fuelcell_h2_kg"] + frame["unmet_refuel_h2_kg"]).sum() * a,
+        "fuelcell_elec_mwh_per_yr": fc_mwh * a,
+        "grid_import_mwh_per_yr": grid_mwh * a,
+        "o2_revenue_usd_per_yr": frame["o2_revenue_tk"].sum() * a / p["exchange_rate"],
+        "revenue_usd_per_yr": frame["monthly_revenue_usd"].sum() * a,
+        "co2_avoided_t_per_yr": co2 * a / 1000.0,
+        **{k: float(life[k]) for k in ["npv_usd", "irr", "lcoh_usd_per_kg", "payback_years", "discounted_payback_years"]},
+    }
+
+
+def run_scenario(scenario, timeseries="native"):
+    """(KPI row, time-series frame or None) for one scenario mapping; errors go into the row's 'error'."""
+    name = scenario.get("name", "scenario")
+    model = scenario.get("model", "h2app")
+    row = {"scenario": name, "model": model, "error": ""}
+    try:
+        sim_params, full = split_params(model, scenario.get("params"))
+        profile = load_profile(scenario.get("profile"), model, full, scenario.get("_base_dir", "."), scenario.get("freq", "h"))
+        frame = MODELS[model]["simulate"](profile, sim_params)
+        row.update(steps=len(frame), **summarize(model, frame, full))
+    except Exception as exc:  # one bad scenario must not take down the rest of its batch
+        row["error"] = f"{type(exc).__name__}: {exc}"
+        return row, None
+    if timeseries == "monthly":
+        frame = h2_engine.rollup(frame)
+    return row, (None if timeseries == "none" else frame)
+
+
+def _read(path):
+    with open(path) as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ValueError(f"{path}: reading YAML needs PyYAML (pip install pyyaml), or use JSON") from exc
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def load_scenarios(paths):
+    """Scenario mappings from files and directories (*.json, *.yaml, *.yml, sorted), with unique names."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith((".json", ".yaml", ".yml")))
+        else:
+            files.append(path)
+    scenarios, seen = [], {}
+    for path in files:
+        data = _read(path)
+        items = data if isinstance(data, list) else [data]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise ValueError(f"{path}: a scenario must be a mapping")
+            s = {**item, "_base_dir": os.path.dirname(os.path.abspath(path))}
+            name = str(s.get("name") or (stem if len(items) == 1 else f"{stem}_{i + 1}"))
+            # names become output file names: keep them unique
+            seen[name] = seen.get(name, 0) + 1
+            s["name"] = name if seen[name] == 1 else f"{name}_{seen[name]}"
+            scenarios.append(s)
+    return scenarios
+
+
+def _write_frame(df, path, fmt):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _run_and_write(scenario, timeseries, out_dir, fmt):
+    # worker: time series are written here so large frames never travel back to the parent
+    row, frame = run_scenario(scenario, timeseries)
+    if frame is not None:
+        safe = re.sub(r"[^\w.-]+", "_", row["scenario"])
+        path = os.path.join(out_dir, "timeseries", f"{safe}.{fmt}")
+        _write_frame(frame, path, fmt)
+        row["timeseries_file"] = os.path.relpath(path, out_dir)
+    return row
+
+
+def run_batch(scenarios, out_dir, fmt="parquet", timeseries="native", workers=None, progress=None):
+    """Run scenarios across processes and write kpis.<fmt> (+ timeseries/<name>.<fmt>); returns the KPI frame."""
+    if fmt not in ("parquet", "csv"):
+        raise ValueError("format must be 'parquet' or 'csv'")
+    if timeseries not in TIMESERIES:
+        raise ValueError(f"timeseries must be one of {', '.join(TIMESERIES)}")
+    os.makedirs(os.path.join(out_dir, "timeseries"), exist_ok=True)
+    workers = max(1, min(int(workers or os.cpu_count() or 1), len(scenarios) or 1))
+    rows = []
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_and_write, s, timeseries, out_dir, fmt) for s in scenarios]
+            for fut in futures:
+                rows.append(fut.result())
+                if progress:
+                    progress(len(rows), len(scenarios))
+    else:
+        for s in scenarios:
+            rows.append(_run_and_write(s, timeseries, out_dir, fmt))
+            if progress:
+                progress(len(rows), len(scenarios))
+    kpis = pd.DataFrame(rows)
+    kpis = kpis[[c for c in ["scenario", "model", "steps"] + KPIS + ["timeseries_file", "error"] if c in kpis.columns]]
+    _write_frame(kpis, os.path.join(out_dir, f"kpis.{fmt}"), fmt)
+    return kpis
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run H2 model scenario files (YAML / JSON) in bulk.")
+    ap.add_argument("paths", nargs="+", help="scenario files or directories of them")
+    ap.add_argument("--out", default="h2_results", help="output directory")
+    ap.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    ap.add_argument("--timeseries", choices=TIMESERIES, default="native",
+                    help="time series written per scenario: native resolution, monthly rollup or none")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = ap.parse_args(argv)
+    scenarios = load_scenarios(args.paths)
+    if not scenarios:
+        ap.error("no scenario files found")
+
+    def progress(done, total):
+        print(f"\r{done}/{total} scenarios", end="", file=sys.stderr, flush=True)
+
+    kpis = run_batch(scenarios, args.out, args.format, args.timeseries, args.workers, progress)
+    print(file=sys.stderr)
+    failed = kpis[kpis["error"] != ""]
+    for row in failed.itertuples():
+        print(f"{row.scenario}: {row.error}", file=sys.stderr)
+    print(f"{len(kpis) - len(failed)} of {len(kpis)} scenarios written to {os.path.join(args.out, 'kpis.' + args.format)}")
+    return 1 if len(failed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# h2_bench.py — benchmark suite for the model at 12-row, hourly-year and 25-year-hourly scale
+#
+# Every case runs on a synthetic profile of the given size: CSV ingest, simulate (cold, after a
+# price change, cache hit, result store hit), Design A, the storage scan, rollup, the result store,
+# LTTB, table styling and figure serialization. simulate runs with the engine's result store on, as
+# shipped, but pointed at the scale's temp dir; the caller's store and H2_STORE come back afterwards. Each case is timed over several repeats (median wall time,
+# steps per second) and run once more under tracemalloc for peak traced memory (NumPy and pandas
+# buffers are traced). Save a run as a JSON baseline and compare later runs against it; cases
+# slower than the baseline by more than --tolerance are listed as regressions (exit code 1):
+#     python h2_bench.py --save bench_baseline.json
+#     python h2_bench.py --compare bench_baseline.json --scales hourly-year
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import h2_engine
+import h2_ingest
+import h2_render
+import h2_storage
+import h2_store
+
+# profile steps per scale (0 = the 12-row monthly demo profile)
+SCALES = {"12-row": 0, "hourly-year": 8760, "25-year-hourly": 25 * 8760}
+REPEAT = 5
+TOLERANCE = 0.25
+# slowdowns smaller than this are timer / scheduler noise, whatever the ratio
+MIN_DELTA_S = 0.002
+
+
+def synthetic_profile(steps, seed=0):
+    """Monthly demo profile (steps=0) or an hourly solar / demand series in MWh per step."""
+    if steps == 0:
+        return h2_engine.demo_profile()
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range("2020-01-01", periods=steps, freq="h")
+    daylight = np.maximum(0.0, np.sin((ts.hour.to_numpy() - 6) / 12.0 * np.pi))
+    solar = 0.5 * daylight * rng.uniform(0.3, 1.0, steps)
+    demand = 0.12 + 0.05 * rng.random(steps)
+    return pd.DataFrame({"timestamp": ts, "solar_mwh": solar, "demand_mwh": demand})
+
+
+def _design_a(profile):
+    key = "timestamp" if "timestamp" in profile.columns else "month"
+    return pd.DataFrame({key: profile[key], "solar_kwh": profile["solar_mwh"] * 1000.0,
+                         "demand_kwh": profile["demand_mwh"] * 1000.0})
+
+
+def _clear_engine():
+    h2_engine._cache.clear()
+    h2_engine._sessions.clear()
+
+
+def _settle():
+    # background result writes from the previous run must not land inside the next timing
+    if h2_store._default is not None:
+        h2_store._default.flush()
+
+
+def _cold(ctx):
+    # empty in-process cache and an empty result store: nothing to reuse
+    _settle()
+    _clear_engine()
+    h2_store._default = h2_store.ResultStore(os.path.join(ctx["tmp"], f"engine{next(ctx['counter'])}"), max_bytes=1 << 40)
+
+
+def _store_hit(ctx):
+    # the result is on disk (another process ran it) but not in this process's memory
+    _settle()
+    h2_engine.simulate.persist(ctx["profile"], {})
+    _clear_engine()
+
+
+def _cases(ctx):
+    """(name, setup, run) triples; setup() runs untimed before every timed run()."""
+    profile, tmp = ctx["profile"], ctx["tmp"]
+    timed = h2_engine.is_timeseries(profile)
+    frame = h2_engine.simulate(profile, {})
+    p = h2_engine.DEFAULT_PARAMS
+    h2_in = frame["h2_kg"].to_numpy()
+    h2_out = h2_in * (p["fraction_h2_to_fuelcell"] + p["fraction_h2_to_refuel"]) * 1.1
+    tank_max = max(float(np.percentile(np.cumsum(h2_in - h2_out), 90)), 1.0)
+    store = h2_store.ResultStore(os.path.join(tmp, "store"), max_bytes=1 << 40)
+    store.put("bench", frame, "simulate", h2_engine.MODEL_VERSION, "bench", {})
+    counter = ctx["counter"]
+    cases = []
+
+    csv_path = os.path.join(tmp, "profile.csv")
+    profile.to_csv(csv_path, index=False)
+    if timed:
+        cases.append(("csv ingest", lambda: None, lambda: h2_ingest.ingest_csv(
+            csv_path, {"solar_mwh": "solar_mwh", "demand_mwh": "demand_mwh"},
+            cache_dir=os.path.join(tmp, f"ingest{next(counter)}"))))
+    else:
+        cases.append(("csv parse", lambda: None, lambda: pd.read_csv(csv_path)))
+    cases += [
+        ("simulate (cold)", lambda: _cold(ctx), lambda: h2_engine.simulate(profile, {})),
+        # warm graph session, new O2 price each run: only the revenue nodes recompute
+        ("simulate (price change)", _settle,
+         lambda: h2_engine.simulate(profile, {"oxygen_price_tk_per_kg": 10.0 + next(counter) * 1e-6})),
+        ("simulate (cache hit)", _settle, lambda: h2_engine.simulate(profile, {})),
+        ("simulate (result store hit)", lambda: _store_hit(ctx), lambda: h2_engine.simulate(profile, {})),
+        ("design A simulate (cold)", lambda: _cold(ctx), lambda: h2_engine.simulate_design_a(ctx["profile_a"], {})),
+        ("storage balance (finite tank)", lambda: None,
+         lambda: h2_storage.storage_balance(h2_in, h2_out, 0.0, 0.0, tank_max)),
+        ("rollup (monthly)", lambda: None, lambda: h2_engine.rollup(frame)),
+        ("result store write", lambda: None,
+         lambda: store.put(f"w{next(counter)}", frame, "simulate", h2_engine.MODEL_VERSION, "bench", {})),
+        ("result store read", lambda: None, lambda: store.get("bench")),
+        ("table page (50 rows, Styler HTML)", lambda: None,
+         lambda: h2_render.page(frame, 1, 50).style.format("{:.2f}", subset=frame.select_dtypes("number").columns).to_html()),
+        ("monthly figure (JSON)", lambda: None, lambda: _monthly_figure(h2_engine.rollup(frame)).to_json()),
+    ]
+    if timed:
+        cases.append(("LTTB (2,000 points)", lambda: None,
+                      lambda: h2_render.lttb(frame["timestamp"].to_numpy(), frame["solar_mwh"].to_numpy())))
+    return cases
+
+
+def _monthly_figure(df):
+    fig = go.Figure()
+    for col in ["solar_mwh", "demand_mwh", "grid_import_mwh"]:
+        fig.add_trace(go.Bar(name=col, x=df["month"], y=df[col]))
+    return fig
+
+
+def _measure(setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        setup()
+        t = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t)
+    # one more run under tracemalloc for the peak allocated on top of what setup left
+    setup()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    run()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return float(np.median(times)), float(np.min(times)), peak
+
+
+def run_suite(scales=None, repeat=REPEAT, match=None, progress=None):
+    """Benchmark results as a DataFrame: scale, case, steps, median_s, min_s, steps_per_s, peak_mb."""
+    saved_env, saved_store = os.environ.get("H2_STORE"), h2_store._default
+    os.environ["H2_STORE"] = "1"
+    rows = []
+    try:
+        for scale in scales or list(SCALES):
+            steps = SCALES[scale]
+            profile = synthetic_profile(steps)
+            tmp = tempfile.mkdtemp(prefix="h2_bench.")
+            try:
+                ctx = {"profile": profile, "profile_a": _design_a(profile), "tmp": tmp, "counter": iter(range(1, 1 << 30))}
+                _cold(ctx)
+                for name, setup, run in _cases(ctx):
+                    if match and match.lower() not in name.lower():
+                        continue
+                    median, best, peak = _measure(setup, run, repeat)
+                    n = len(profile)
+                    rows.append({"scale": scale, "case": name, "steps": n, "median_s": median, "min_s": best,
+                                 "steps_per_s": n / median if median > 0 else float("inf"), "peak_mb": peak / (1 << 20)})
+                    if progress:
+                        progress(rows[-1])
+            finally:
+                _settle()
+                shutil.rmtree(tmp, ignore_errors=True)
+                _clear_engine()
+    finally:
+        h2_store._default = saved_store
+        if saved_env is None:
+            os.environ.pop("H2_STORE", None)
+        else:
+            os.environ["H2_STORE"] = saved_env
+    return pd.DataFrame(rows)
+
+
+def environment():
+    return {"model_version": h2_engine.MODEL_VERSION, "python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__, "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Join with a baseline on (scale, case); time_ratio / memory_ratio > 1 + tolerance are regressions."""
+    base = pd.DataFrame(baseline)[["scale", "case", "median_s", "peak_mb"]]
+    out = results.merge(base, on=["scale", "case"], how="left", suffixes=("", "_baseline"))
+    out["time_ratio"] = out["median_s"] / out["median_s_baseline"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # sub-megabyte peaks are noise
+        out["memory_ratio"] = np.where(out["peak_mb_baseline"] > 1.0, out["peak_mb"] / out["peak_mb_baseline"], np.nan)
+    slower = (out["time_ratio"] > 1 + tolerance) & (out["median_s"] - out["median_s_baseline"] > MIN_DELTA_S)
+    out["regression"] = slower | (out["memory_ratio"] > 1 + tolerance)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the H2 model at several profile sizes.")
+    ap.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    ap.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per case (median reported)")
+    ap.add_argument("--case", default=None, help="only cases whose name contains this text")
+    ap.add_argument("--save", metavar="JSON", help="write results (with environment) as a baseline file")
+    ap.add_argument("--compare", metavar="JSON", help="baseline file to compare against")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown / memory growth (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+
+    def progress(row):
+        print(f"{row['scale']:>15}  {row['case']:<34} {row['median_s'] * 1000:10.2f} ms {row['peak_mb']:9.1f} MB",
+              file=sys.stderr, flush=True)
+
+    results = run_suite(args.scales, args.repeat, args.case, progress)
+    pd.set_option("display.width", 200)
+    table = results.assign(median_ms=results["median_s"] * 1000, min_ms=results["min_s"] * 1000)
+    print(table[["scale", "case", "steps", "median_ms", "min_ms", "steps_per_s", "peak_mb"]].to_string(
+        index=False, float_format=lambda v: f"{v:,.2f}"))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "results": results.to_dict("records")}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        cmp = compare(results, baseline["results"], args.tolerance)
+        cmp["median_ms"], cmp["baseline_ms"] = cmp["median_s"] * 1000, cmp["median_s_baseline"] * 1000
+        print()
+        print(cmp[["scale", "case", "median_ms", "baseline_ms", "time_ratio", "memory_ratio", "regression"]].to_string(
+            index=False, float_format=lambda v: f"{v:,.3f}"))
+        bad = cmp[cmp["regression"]]
+        if len(bad):
+            print(f"\n{len(bad)} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
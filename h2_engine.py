@@ -0,0 +1,478 @@
+# h2_engine.py — headless simulation engine shared by H2app.py and designA_hydrogen_dashboard.py
+# No Streamlit imports here: the dashboards collect sidebar inputs into a params dict and call
+# simulate(profile, params) / simulate_design_a(profile, params), which return a DataFrame.
+# Results are memoized on a hash of (profile, params) in an LRU bounded by bytes (H2_CACHE_MAX_MB,
+# default 512), backed by the on-disk h2_store shared across sessions and processes; on a miss,
+# simulate() recomputes only the columns downstream of the params that changed (h2_graph).
+#
+# Profiles are either the classic 12 monthly rows ('month' column) or a timestamped series
+# ('timestamp' column, e.g. hourly or 15-minute). Timestamped profiles are simulated at their
+# native resolution — per-row values are per step — and rollup() aggregates them back to
+# monthly rows for the KPIs, charts and tables.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+import h2_graph
+import h2_storage
+import h2_store
+import h2_trace
+
+MODEL_VERSION = "5"
+
+MONTHS = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
+HOT_MONTHS = ["Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov"]
+
+# Example demand in MWh (demo values)
+DEMO_DEMAND_MWH = np.array([31.5,39.0,64.5,72.0,117.0,78.0,94.5,46.5,114.0,102.0,87.0,46.5])
+
+# Defaults mirror the H2app.py sidebar (MWh units)
+DEFAULT_PARAMS = {
+    "default_solar_mwh": 80.0,
+    "exchange_rate": 114.0,
+    "oxygen_price_tk_per_kg": 10.0,
+    "h2_sale_price_tk_per_kg": 0.0,
+    "grid_price_tk_per_mwh": 10560.0,
+    "grid_emission_kgCO2_per_mwh": 710.0,
+    "diesel_l_per_month": 42000.0,
+    "diesel_co2_kg_per_l": 2.68,
+    "diesel_price_tk_per_l": 114.0,
+    "electrolyzer_eff": 0.80,
+    "h2_lhv_kwh_per_kg": 33.33,
+    "fuelcell_eff": 0.50,
+    "fraction_h2_to_fuelcell": 0.30,
+    "fraction_h2_to_refuel": 0.70,
+    "initial_h2_storage_kg": 700.0,
+    "tank_min_kg": 0.0,
+    "tank_max_kg": float("inf"),
+    "solar_frac_for_electrolysis": 0.80,
+    "use_grid_for_electrolysis": True,
+    # equipment ratings (inf = not limiting)
+    "electrolyzer_mw": float("inf"),
+    "fuelcell_mw": float("inf"),
+    # project costs (designA_hydrogen_dashboard.py defaults); used by the Monte Carlo / finance views
+    "capex_usd": 16000000.0,
+    "opex_usd_per_month": 598.29,
+}
+
+# Defaults mirror the designA_hydrogen_dashboard.py sidebar (kWh units, paper seasonal H2)
+DESIGN_A_DEFAULTS = {
+    "h2_LHV_kwh_per_kg": 33.33,
+    "electrolyzer_eta": 0.80,
+    "fuelcell_eff": 0.50,
+    "h2_hot_monthly": 18000.0,
+    "h2_cold_monthly": 15000.0,
+    "h2_annual_avg_monthly": 17400.0,
+    "solar_net_monthly_default": 750000.0,
+    "capex_usd": 16000000.0,
+    "exchange_rate": 114.0,
+    "oxygen_price_tk_per_kg": 10.0,
+    "grid_emission_kgCO2_per_kwh": 0.71,
+    "diesel_l_per_month": 42000.0,
+    "diesel_co2_kg_per_l": 2.68,
+    "grid_price_tk_per_kwh": 10.56,
+    "opex_usd_per_month": 598.29,
+    "fraction_h2_to_fuelcell": 0.30,
+    "fraction_h2_to_refuel": 0.70,
+    "initial_h2_storage_kg": 700.0,
+    "tank_min_kg": 0.0,
+    "tank_max_kg": float("inf"),
+    "solar_fraction_for_electrolysis": 0.80,
+    "diesel_price_tk_per_l": 114.0,
+    "h2_sale_price_tk_per_kg": 0.0,
+}
+
+CACHE_MAXSIZE = 64
+# bytes of result frames kept in memory (a 25-year hourly result is ~55 MB)
+CACHE_MAX_BYTES = int(float(os.environ.get("H2_CACHE_MAX_MB", "512")) * (1 << 20))
+# a computed result goes to the disk store only if it took this many times its estimated write
+PERSIST_RATIO = 2.0
+# incremental graph sessions kept (each holds every column of one profile)
+SESSION_MAXSIZE = 4
+HOURS_PER_MONTH = 8760.0 / 12
+
+
+def demo_profile(solar_mwh=DEFAULT_PARAMS["default_solar_mwh"]):
+    """12-month demo profile for H2app.py (MWh)."""
+    solar = np.full(12, float(solar_mwh))
+    return pd.DataFrame({"month": MONTHS, "solar_mwh": solar, "demand_mwh": DEMO_DEMAND_MWH.copy()})
+
+
+def demo_profile_design_a(solar_kwh=DESIGN_A_DEFAULTS["solar_net_monthly_default"]):
+    """12-month demo profile for designA_hydrogen_dashboard.py (kWh)."""
+    solar = np.full(12, float(solar_kwh))
+    demand = DEMO_DEMAND_MWH * 1000.0
+    return pd.DataFrame({"month": MONTHS, "solar_kwh": solar, "demand_kwh": demand})
+
+
+def _is_cache_column(col, meta, name):
+    # True while col is still the read-only memmap of the ingest cache, not a modified copy of it
+    arr = col.to_numpy()
+    base = arr
+    while isinstance(base, np.ndarray) and not isinstance(base, np.memmap):
+        base = base.base
+    return (isinstance(base, np.memmap) and base.filename is not None
+            and base.filename.endswith(os.path.join(meta["key"], name + ".f32"))
+            and arr.shape == base.shape and arr.strides == base.strides and arr.ctypes.data == base.ctypes.data)
+
+
+def profile_key(profile):
+    """Content hash of a profile frame (column names + values)."""
+    h = hashlib.sha256()
+    h.update("|".join(map(str, profile.columns)).encode())
+    meta = profile.attrs.get("ingest")
+    if not meta or len(profile) != meta["n_steps"]:
+        h.update(pd.util.hash_pandas_object(profile, index=False).values.tobytes())
+        return h.hexdigest()
+    # attrs survive .assign / .copy(), so the ingest key only stands in for columns that are
+    # still the untouched cache files; everything else is hashed
+    for name in profile.columns:
+        col = profile[name]
+        if name in meta["names"] and _is_cache_column(col, meta, name):
+            h.update(f"{meta['key']}/{name}".encode())
+        else:
+            h.update(pd.util.hash_pandas_object(col, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def params_key(params):
+    """Canonical hash of a params dict (order-independent)."""
+    blob = json.dumps(params, sort_keys=True, default=float)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe LRU map; Streamlit serves sessions from several threads.
+
+    Bounded by entry count and, when sizeof is given, by the total sizeof(value) in bytes;
+    the most recent entry is always kept.
+    """
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._data.move_to_end(key)
+            while len(self._data) > 1 and (len(self._data) > self.maxsize
+                                           or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                old, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.hits = self.misses = self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+_cache = LRUCache(CACHE_MAXSIZE, CACHE_MAX_BYTES, h2_store.frame_bytes)
+
+
+def memoized(fn):
+    """Memoize fn(profile, params) on (fn, profile hash, params hash, MODEL_VERSION).
+
+    In-process LRU first, then the persistent result store (h2_store.default_store()). A new result
+    is queued for the store only when computing it took PERSIST_RATIO times its estimated write, so
+    incremental recomputes never wait for (or fill) the disk. wrapper.persist(profile, params) writes
+    one result now and returns its store key, e.g. to save it by name.
+    """
+    def lookup(profile, params):
+        with h2_trace.stage("hash profile + params"):
+            key = (fn.__name__, MODEL_VERSION, profile_key(profile), params_key(params))
+        df = _cache.get(key)
+        if df is None:
+            store = h2_store.default_store()
+            if store:
+                with h2_trace.stage("result store read"):
+                    df = store.get(h2_store.result_key(*key))
+            if df is None:
+                t0 = time.perf_counter()
+                with h2_trace.stage(f"{fn.__name__} (compute)"):
+                    df = fn(profile, params)
+                if store and time.perf_counter() - t0 >= PERSIST_RATIO * store.estimate_write_s(df):
+                    with h2_trace.stage("result store write (queued)"):
+                        store.put_async(h2_store.result_key(*key), df, fn.__name__, MODEL_VERSION, key[2], params)
+            _cache.put(key, df)
+        return key, df
+
+    @wraps(fn)
+    def wrapper(profile, params=None):
+        _, df = lookup(profile, dict(params or {}))
+        # hand out a copy so callers cannot corrupt the cached frame
+        with h2_trace.stage("copy result"):
+            return df.copy()
+
+    def persist(profile, params=None):
+        params = dict(params or {})
+        key, df = lookup(profile, params)
+        skey = h2_store.result_key(*key)
+        store = h2_store.default_store()
+        if store and not store.has(skey):
+            store.put(skey, df, fn.__name__, MODEL_VERSION, key[2], params)
+        return skey
+
+    def store_key(profile, params=None):
+        return h2_store.result_key(fn.__name__, MODEL_VERSION, profile_key(profile), params_key(dict(params or {})))
+
+    wrapper.cache = _cache
+    wrapper.persist = persist
+    wrapper.store_key = store_key
+    return wrapper
+
+
+# Columns that describe a state at the end of a step; everything else numeric is a flow
+STATE_COLUMNS = ["stored_h2_kg", "cumulative_cashflow_usd"]
+
+
+def is_timeseries(df):
+    return "timestamp" in df.columns
+
+
+def _check_columns(profile, cols):
+    if not set(cols).issubset(profile.columns) or not ({"month", "timestamp"} & set(profile.columns)):
+        raise ValueError("profile must contain 'month' or 'timestamp' and " + ",".join(f"'{c}'" for c in cols))
+
+
+def base_frame(profile, cols):
+    # Returns the working frame and each row's share of its calendar month (1.0 for monthly rows),
+    # used to spread per-month quantities (diesel, OPEX, paper H2) over sub-monthly steps.
+    _check_columns(profile, cols)
+    if not is_timeseries(profile):
+        return profile[["month"] + cols].copy(), np.ones(len(profile))
+    ts = profile["timestamp"]
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts)
+    if not ts.is_monotonic_increasing:
+        raise ValueError("profile timestamps must be sorted ascending")
+    df = pd.DataFrame({"timestamp": ts.to_numpy(), "month": np.array(MONTHS)[ts.dt.month.to_numpy() - 1]})
+    for c in cols:
+        df[c] = profile[c].to_numpy(dtype=float)
+    month_h = ts.dt.days_in_month.to_numpy() * 24.0
+    return df, step_hours(df) / month_h
+
+
+def step_hours(df):
+    """Duration of each row in hours (monthly rows count as 8760 / 12)."""
+    if not is_timeseries(df):
+        return np.full(len(df), HOURS_PER_MONTH)
+    step_h = np.diff(df["timestamp"].to_numpy()).astype("timedelta64[s]").astype(float) / 3600.0
+    return np.append(step_h, np.median(step_h) if len(step_h) else 1.0)
+
+
+def month_index(df):
+    """Calendar-month number (0..M-1) of each row; monthly rows are their own month."""
+    if not is_timeseries(df):
+        return np.arange(len(df))
+    codes, _ = pd.factorize(df["timestamp"].dt.to_period("M"), sort=True)
+    return codes
+
+
+def rollup(df, freq="M"):
+    """Aggregate a native-resolution result to calendar periods ("M" monthly, "Y" annual).
+
+    Flows are summed, states (stored H2, cumulative cashflow) take the period's last value.
+    Monthly (non-timestamped) frames are returned unchanged.
+    """
+    if not is_timeseries(df):
+        return df
+    periods = df["timestamp"].dt.to_period(freq)
+    numeric = [c for c in df.columns if c not in ("timestamp", "month", "season") and pd.api.types.is_numeric_dtype(df[c])]
+    agg = {c: ("last" if c in STATE_COLUMNS else "sum") for c in numeric}
+    if "season" in df.columns:
+        agg["season"] = "first"
+    out = df.groupby(periods, sort=True).agg(agg)
+    start = out.index.to_timestamp()
+    if freq == "M":
+        labels = start.strftime("%b")
+        if labels.duplicated().any():
+            labels = start.strftime("%b %Y")
+    else:
+        labels = out.index.astype(str)
+    out.insert(0, "month", labels)
+    out.insert(0, "timestamp", start)
+    out = out.reset_index(drop=True)
+    if "season" in out.columns:
+        out.insert(2, "season", out.pop("season"))
+    return out
+
+
+def electrolyzer_energy(solar, demand, solar_frac, use_grid):
+    """Electrolyzer input energy per step; broadcasts over arrays of solar_frac / use_grid / profiles."""
+    solar_alloc = solar * solar_frac
+    if np.ndim(use_grid) == 0 and not use_grid:
+        return solar_alloc
+    # If solar insufficient, grid supplements electrolysis up to demand, not exceeding actual grid import
+    need = np.maximum(demand - solar_alloc, 0)
+    supplemented = solar_alloc + np.minimum(need, np.maximum(0, demand - solar))
+    return supplemented if np.ndim(use_grid) == 0 else np.where(use_grid, supplemented, solar_alloc)
+
+
+def co2_avoided_kg(export, fuelcell_elec, grid_to_electrolysis, emission_factor, diesel_co2_kg):
+    """Net CO2 avoided (kg): grid export, fuel-cell output and displaced diesel, less the grid power
+    drawn for electrolysis. Energies in one unit, emission_factor in kg per that unit; broadcasts."""
+    return (export + fuelcell_elec - grid_to_electrolysis) * emission_factor + diesel_co2_kg
+
+
+def _storage(h2_in, h2_out, h2_fc, h2_refuel, initial, tank_min, tank_max):
+    # Finite tank: surplus above tank_max_kg is curtailed, withdrawals below tank_min_kg are unmet.
+    # Returns stored, curtailed, unmet fuel-cell H2, unmet refuelling H2 (kg per step)
+    stored, curtailed, unmet = h2_storage.storage_balance(h2_in, h2_out, initial, tank_min, tank_max)
+    return (stored, curtailed) + h2_storage.split_unmet(unmet, h2_fc, h2_refuel)
+
+
+def _add_storage(df, p):
+    with h2_trace.stage("storage balance"):
+        cols = _storage(*(df[c].to_numpy() for c in ["monthly_h2_input_kg", "monthly_h2_output_kg",
+                                                     "h2_for_fuelcell_kg", "h2_to_refuel_kg"]),
+                        p["initial_h2_storage_kg"], p["tank_min_kg"], p["tank_max_kg"])
+    for name, values in zip(["stored_h2_kg", "curtailed_h2_kg", "unmet_fuelcell_h2_kg", "unmet_refuel_h2_kg"], cols):
+        df[name] = values
+
+
+# simulate() as a declared dependency graph: each node names its inputs (profile columns, params,
+# earlier nodes), so a params change recomputes only the nodes downstream of it. Names starting
+# with "_" are intermediates that do not appear in the result frame.
+SIMULATE_GRAPH = h2_graph.Graph()
+_g = SIMULATE_GRAPH.add
+
+_g("grid_import_mwh", ["demand_mwh", "solar_mwh"], lambda demand, solar: np.maximum(0, demand - solar))
+_g("grid_export_mwh", ["solar_mwh", "demand_mwh"], lambda solar, demand: np.maximum(0, solar - demand))
+# Electrolyzer energy: fraction of solar, optionally supplemented from grid import up to demand
+_g("solar_alloc_electrolysis_mwh", ["solar_mwh", "solar_frac_for_electrolysis"], lambda solar, frac: solar * frac)
+# Electrolyzer rating caps the energy it can take in one step
+_g("electrolyzer_energy_mwh", ["solar_mwh", "demand_mwh", "solar_frac_for_electrolysis", "use_grid_for_electrolysis",
+                               "electrolyzer_mw", "_step_h"],
+   lambda solar, demand, frac, use_grid, mw, step_h: np.minimum(electrolyzer_energy(solar, demand, frac, use_grid), mw * step_h))
+_g("grid_to_electrolysis_mwh", ["electrolyzer_energy_mwh", "solar_alloc_electrolysis_mwh"],
+   lambda energy, solar_alloc: np.maximum(energy - solar_alloc, 0))
+# mH2 (kg) = Energy (MWh) / (LHV (MWh/kg) / electrolyzer_eff)
+_g("_lhv_mwh_per_kg", ["h2_lhv_kwh_per_kg"], lambda lhv: lhv / 1000.0)  # convert to MWh/kg
+_g("h2_kg", ["electrolyzer_energy_mwh", "_lhv_mwh_per_kg", "electrolyzer_eff"], lambda energy, lhv, eff: energy / (lhv / eff))
+_g("o2_kg", ["h2_kg"], lambda h2: h2 * 8.0)
+_g("water_l", ["h2_kg"], lambda h2: h2 * 9.0)
+# Fuel-cell rating caps the H2 it can convert in one step
+_g("h2_for_fuelcell_kg", ["h2_kg", "fraction_h2_to_fuelcell", "fuelcell_mw", "_step_h", "_lhv_mwh_per_kg", "fuelcell_eff"],
+   lambda h2, frac, mw, step_h, lhv, eff: np.minimum(h2 * frac, mw * step_h / (lhv * eff)))
+_g("h2_to_refuel_kg", ["h2_kg", "fraction_h2_to_refuel"], lambda h2, frac: h2 * frac)
+# Storage tracking (per step; monthly for 12-row profiles)
+_g("monthly_h2_input_kg", ["h2_kg"], lambda h2: h2)
+_g("monthly_h2_output_kg", ["h2_for_fuelcell_kg", "h2_to_refuel_kg"], lambda fc, refuel: fc + refuel)
+
+
+_g(("stored_h2_kg", "curtailed_h2_kg", "unmet_fuelcell_h2_kg", "unmet_refuel_h2_kg"),
+   ["monthly_h2_input_kg", "monthly_h2_output_kg", "h2_for_fuelcell_kg", "h2_to_refuel_kg",
+    "initial_h2_storage_kg", "tank_min_kg", "tank_max_kg"], _storage)
+# Fuel cell and refuelling only use the H2 the tank could actually deliver
+_g("fuelcell_elec_mwh", ["h2_for_fuelcell_kg", "unmet_fuelcell_h2_kg", "_lhv_mwh_per_kg", "fuelcell_eff"],
+   lambda fc, unmet, lhv, eff: (fc - unmet) * lhv * eff)
+_g("_h2_delivered_refuel_kg", ["h2_to_refuel_kg", "unmet_refuel_h2_kg"], lambda refuel, unmet: refuel - unmet)
+# CO2 (kg)
+_g("co2_from_grid_import_kg", ["grid_import_mwh", "grid_emission_kgCO2_per_mwh"], lambda mwh, ef: mwh * ef)
+_g("co2_avoided_from_export_kg", ["grid_export_mwh", "grid_emission_kgCO2_per_mwh"], lambda mwh, ef: mwh * ef)
+_g("co2_avoided_from_diesel_kg", ["diesel_l_per_month", "diesel_co2_kg_per_l", "_month_share"],
+   lambda litres, co2, share: litres * co2 / 12.0 * share)
+_g("co2_from_grid_electrolysis_kg", ["grid_to_electrolysis_mwh", "grid_emission_kgCO2_per_mwh"], lambda mwh, ef: mwh * ef)
+_g("co2_avoided_from_fuelcell_kg", ["fuelcell_elec_mwh", "grid_emission_kgCO2_per_mwh"], lambda mwh, ef: mwh * ef)
+# Financials: Tk to USD
+_g("o2_revenue_tk", ["o2_kg", "oxygen_price_tk_per_kg"], lambda o2, price: o2 * price)
+_g("h2_revenue_tk", ["_h2_delivered_refuel_kg", "h2_sale_price_tk_per_kg"], lambda h2, price: h2 * price)
+_g("electricity_avoided_tk", ["fuelcell_elec_mwh", "grid_price_tk_per_mwh"], lambda mwh, price: mwh * price)
+_g("monthly_revenue_tk", ["o2_revenue_tk", "h2_revenue_tk", "electricity_avoided_tk"], lambda o2, h2, elec: o2 + h2 + elec)
+_g("monthly_revenue_usd", ["monthly_revenue_tk", "exchange_rate"], lambda tk, rate: tk / rate)
+
+# (MODEL_VERSION, profile hash) -> h2_graph.Session holding that profile's node values
+_sessions = LRUCache(SESSION_MAXSIZE)
+
+
+def simulate_session(profile):
+    """Incremental SIMULATE_GRAPH session for a profile (shared, thread-safe).
+
+    session.get({**DEFAULT_PARAMS, **params}, names) recomputes only nodes downstream of the params
+    that changed since the previous call and returns the requested arrays.
+    """
+    key = (MODEL_VERSION, profile_key(profile))
+    session = _sessions.get(key)
+    if session is None:
+        with h2_trace.stage("base frame"):
+            df, month_share = base_frame(profile, ["solar_mwh","demand_mwh"])
+        sources = {"solar_mwh": df["solar_mwh"].to_numpy(dtype=float), "demand_mwh": df["demand_mwh"].to_numpy(dtype=float),
+                   "_step_h": step_hours(df), "_month_share": month_share}
+        session = h2_graph.Session(SIMULATE_GRAPH, df, sources)
+        _sessions.put(key, session)
+    return session
+
+
+@memoized
+def simulate(profile, params):
+    """H2app.py model (MWh). profile: 'month' or 'timestamp', 'solar_mwh','demand_mwh'."""
+    return simulate_session(profile).frame({**DEFAULT_PARAMS, **params})
+
+
+@memoized
+def simulate_design_a(profile, params):
+    """designA_hydrogen_dashboard.py model (kWh, paper seasonal H2). profile: 'month' or 'timestamp', 'solar_kwh','demand_kwh'."""
+    p = {**DESIGN_A_DEFAULTS, **params}
+    df, month_share = base_frame(profile, ["solar_kwh","demand_kwh"])
+    electrolyzer_kwh_per_kg = p["h2_LHV_kwh_per_kg"] / p["electrolyzer_eta"]
+
+    df["grid_import_kwh"] = np.maximum(0, df["demand_kwh"] - df["solar_kwh"])
+    df["grid_export_kwh"] = np.maximum(0, df["solar_kwh"] - df["demand_kwh"])
+    df["season"] = np.where(df["month"].isin(HOT_MONTHS), "Hot", "Cold")
+    df["mH2_paper_kg"] = np.where(df["season"] == "Hot", p["h2_hot_monthly"], p["h2_cold_monthly"]) * month_share
+    df["solar_alloc_for_electrolysis_kwh"] = df["solar_kwh"] * p["solar_fraction_for_electrolysis"]
+    df["mH2_from_energy_kg"] = df["solar_alloc_for_electrolysis_kwh"] / electrolyzer_kwh_per_kg
+    df["mH2_kg"] = df["mH2_paper_kg"]
+    df["mO2_kg"] = df["mH2_kg"] * 8.0
+    df["water_kg"] = df["mH2_kg"] * 9.0
+    df["water_l"] = df["water_kg"]
+    df["co2_from_grid_import_kg"] = df["grid_import_kwh"] * p["grid_emission_kgCO2_per_kwh"]
+    df["co2_avoided_from_export_kg"] = df["grid_export_kwh"] * p["grid_emission_kgCO2_per_kwh"]
+    df["co2_avoided_from_diesel_kg"] = p["diesel_l_per_month"] * p["diesel_co2_kg_per_l"] / 12.0 * month_share
+    df["h2_for_fuelcell_kg"] = df["mH2_kg"] * p["fraction_h2_to_fuelcell"]
+    df["h2_to_refuel_kg"] = df["mH2_kg"] * p["fraction_h2_to_refuel"]
+    df["monthly_h2_input_kg"] = df["mH2_kg"]
+    df["monthly_h2_output_kg"] = df["h2_for_fuelcell_kg"] + df["h2_to_refuel_kg"]
+    _add_storage(df, p)
+    # Fuel cell and refuelling only use the H2 the tank could actually deliver
+    df["fuelcell_elec_kwh"] = (df["h2_for_fuelcell_kg"] - df["unmet_fuelcell_h2_kg"]) * p["h2_LHV_kwh_per_kg"] * p["fuelcell_eff"]
+    df["o2_revenue_tk"] = df["mO2_kg"] * p["oxygen_price_tk_per_kg"]
+    df["electricity_avoided_tk"] = df["fuelcell_elec_kwh"] * p["grid_price_tk_per_kwh"]
+    df["h2_revenue_tk"] = (df["h2_to_refuel_kg"] - df["unmet_refuel_h2_kg"]) * p["h2_sale_price_tk_per_kg"]
+    df["monthly_revenue_tk"] = df["o2_revenue_tk"] + df["h2_revenue_tk"] + df["electricity_avoided_tk"]
+    df["monthly_revenue_usd"] = df["monthly_revenue_tk"] / p["exchange_rate"]
+    df["monthly_net_usd"] = df["monthly_revenue_usd"] - p["opex_usd_per_month"] * month_share
+    df["cumulative_cashflow_usd"] = df["monthly_net_usd"].cumsum() - p["capex_usd"]
+    return df
@@ -0,0 +1,170 @@
+# h2_finance.py — project-lifetime cashflow: NPV, IRR, LCOH and payback
+#
+# Takes first-year quantities (H2 kg, revenue, OPEX) and extends them over the project life with
+# electrolyzer stack degradation and replacement, solar degradation, price / OPEX escalation and a
+# BDT-per-USD path. Every input may be a scalar or an array of scenarios (broadcast together);
+# years run along a new last axis, so thousands of scenarios cost one array expression.
+#
+# NPV and LCOH are linear in the first-year quantities, so present_value_factors() reduces the year
+# axis once and npv_lcoh() is O(scenarios) — cheap enough for sweep grids. lifetime() additionally
+# builds the per-year cashflow for IRR and payback.
+
+import numpy as np
+
+import h2_engine
+
+FINANCE_DEFAULTS = {
+    "lifetime_years": 25,
+    "discount_rate": 0.08,
+    "stack_degradation_per_yr": 0.01,      # H2 output lost per year of stack age
+    "stack_life_years": 10,                # stack swapped at the end of every N-th year (inf = never)
+    "stack_replacement_usd": 2400000.0,
+    "solar_degradation_per_yr": 0.005,
+    "price_escalation_per_yr": 0.05,       # Tk prices (O2, H2, grid, diesel)
+    "opex_escalation_per_yr": 0.02,        # USD OPEX
+    "fx_drift_per_yr": 0.03,               # change of BDT per USD per year
+}
+
+# IRR is searched by bisection in this bracket
+IRR_BRACKET = (-0.99, 10.0)
+IRR_ITERATIONS = 64
+
+
+def finance_params(params=None):
+    """FINANCE_DEFAULTS overridden by any finance keys found in params (other keys are ignored)."""
+    params = params or {}
+    return {k: params.get(k, v) for k, v in FINANCE_DEFAULTS.items()}
+
+
+def annual_factor(df):
+    """Multiplier that turns whole-profile sums of a simulated frame into per-year values."""
+    return 8760.0 / h2_engine.step_hours(df).sum()
+
+
+def _col(x):
+    # scenario-shaped value -> (..., 1) so years broadcast along the last axis
+    return np.asarray(x, dtype=float)[..., None]
+
+
+def _paths(exchange_rate, f):
+    n = int(f["lifetime_years"])
+    if n < 1:
+        raise ValueError("lifetime_years must be at least 1")
+    age = np.arange(n, dtype=float)  # years since start of operation, year 1 .. n
+    stack_life = _col(f["stack_life_years"])
+    output = (1 - _col(f["stack_degradation_per_yr"])) ** np.mod(age, stack_life) \
+        * (1 - _col(f["solar_degradation_per_yr"])) ** age
+    tk_to_usd = (1 + _col(f["price_escalation_per_yr"])) ** age \
+        / (_col(exchange_rate) * (1 + _col(f["fx_drift_per_yr"])) ** age)
+    opex = (1 + _col(f["opex_escalation_per_yr"])) ** age
+    # no swap in the final year: the plant retires
+    swaps = ((np.mod(age + 1, stack_life) == 0) & (age + 1 < n)).astype(float)
+    disc = (1 + _col(f["discount_rate"])) ** -(age + 1)
+    return output, tk_to_usd, opex, swaps, disc
+
+
+def present_value_factors(exchange_rate, params=None):
+    """Present-value multipliers of first-year quantities over the lifetime.
+
+    NPV = -capex + revenue_tk*f["revenue"] + other_revenue_tk*f["other"] - opex_usd*f["opex"]
+          - stack_replacement_usd*f["stack"]; discounted H2 = h2_kg*f["h2"].
+    """
+    f = finance_params(params)
+    output, tk_to_usd, opex, swaps, disc = _paths(exchange_rate, f)
+    return {
+        "revenue": (output * tk_to_usd * disc).sum(axis=-1),
+        "other": (tk_to_usd * disc).sum(axis=-1),
+        "opex": (opex * disc).sum(axis=-1),
+        "stack": (swaps * disc).sum(axis=-1),
+        "h2": (output * disc).sum(axis=-1),
+    }
+
+
+def npv_lcoh(h2_kg, revenue_tk, capex_usd, opex_usd, exchange_rate, other_revenue_tk=0.0, params=None):
+    """(NPV USD, LCOH USD/kg) from first-year values; all arguments broadcast as scenarios.
+
+    revenue_tk scales with plant output (degrades); other_revenue_tk (e.g. diesel savings) only
+    escalates. A finance key in params may itself be an array of scenarios.
+    """
+    f = finance_params(params)
+    pv = present_value_factors(exchange_rate, f)
+    stack = np.asarray(f["stack_replacement_usd"], dtype=float) * pv["stack"]
+    costs = np.asarray(capex_usd, dtype=float) + np.asarray(opex_usd, dtype=float) * pv["opex"] + stack
+    npv = np.asarray(revenue_tk, dtype=float) * pv["revenue"] + np.asarray(other_revenue_tk, dtype=float) * pv["other"] - costs
+    h2 = np.asarray(h2_kg, dtype=float) * pv["h2"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lcoh = np.where(h2 > 0, costs / np.where(h2 > 0, h2, 1.0), np.inf)
+    return npv, lcoh
+
+
+def lifetime(h2_kg, revenue_tk, capex_usd, opex_usd, exchange_rate, other_revenue_tk=0.0, params=None):
+    """Year-by-year lifetime cashflow plus NPV, IRR, LCOH and payback for each scenario.
+
+    Returns arrays with the scenario shape; per-year arrays have a trailing axis of
+    lifetime_years + 1 (year 0 holds the CAPEX).
+    """
+    f = finance_params(params)
+    output, tk_to_usd, opex_path, swaps, disc = _paths(exchange_rate, f)
+    h2 = _col(h2_kg) * output
+    revenue = (_col(revenue_tk) * output + _col(other_revenue_tk)) * tk_to_usd
+    opex = _col(opex_usd) * opex_path
+    stack = _col(f["stack_replacement_usd"]) * swaps
+    net = revenue - opex - stack
+    capex = np.asarray(capex_usd, dtype=float)
+    shape = np.broadcast_shapes(net.shape[:-1], capex.shape)
+    net = np.broadcast_to(net, shape + net.shape[-1:])
+    cash = np.concatenate([-np.broadcast_to(capex, shape)[..., None], net], axis=-1)
+    cumulative = np.cumsum(cash, axis=-1)
+    disc_all = np.concatenate([np.ones(disc.shape[:-1] + (1,)), disc], axis=-1)
+    discounted = np.cumsum(cash * disc_all, axis=-1)
+    costs = capex + ((opex + stack) * disc).sum(axis=-1)
+    h2_pv = (h2 * disc).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lcoh = np.where(h2_pv > 0, costs / np.where(h2_pv > 0, h2_pv, 1.0), np.inf)
+    return {
+        "years": np.arange(cash.shape[-1]),
+        "cashflow_usd": cash,
+        "cumulative_usd": cumulative,
+        "discounted_cumulative_usd": discounted,
+        "h2_kg": np.broadcast_to(h2, shape + h2.shape[-1:]),
+        "npv_usd": discounted[..., -1],
+        "irr": irr(cash),
+        "lcoh_usd_per_kg": lcoh,
+        "payback_years": payback(cumulative),
+        "discounted_payback_years": payback(discounted),
+    }
+
+
+def irr(cashflows):
+    """IRR of each cashflow row (last axis = years from 0) by vectorized bisection; NaN without a sign change."""
+    c = np.asarray(cashflows, dtype=float)
+    t = np.arange(c.shape[-1])
+
+    def npv(r):
+        return (c * (1 + r[..., None]) ** -t).sum(axis=-1)
+
+    lo = np.full(c.shape[:-1], IRR_BRACKET[0])
+    hi = np.full(c.shape[:-1], IRR_BRACKET[1])
+    f_lo, f_hi = npv(lo), npv(hi)
+    ok = np.sign(f_lo) != np.sign(f_hi)
+    for _ in range(IRR_ITERATIONS):
+        mid = (lo + hi) / 2
+        f_mid = npv(mid)
+        same = np.sign(f_mid) == np.sign(f_lo)
+        lo, f_lo = np.where(same, mid, lo), np.where(same, f_mid, f_lo)
+        hi = np.where(same, hi, mid)
+    return np.where(ok, (lo + hi) / 2, np.nan)
+
+
+def payback(cumulative):
+    """Years until the cumulative cashflow first reaches zero (interpolated within the year); NaN if never."""
+    cum = np.asarray(cumulative, dtype=float)
+    reached = cum >= 0
+    first = reached.argmax(axis=-1)
+    never = ~reached.any(axis=-1)
+    prev = np.take_along_axis(cum, np.maximum(first - 1, 0)[..., None], axis=-1)[..., 0]
+    at = np.take_along_axis(cum, first[..., None], axis=-1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(at > prev, -prev / (at - prev), 0.0)
+    years = np.where(first == 0, 0.0, first - 1 + frac)
+    return np.where(never, np.nan, years)
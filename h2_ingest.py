@@ -0,0 +1,277 @@
+# h2_ingest.py — streaming ingest of long timestamped metering/SCADA profiles
+#
+# The CSV is read in chunks, validated, summed across channels and resampled to a fixed step
+# (hourly / 15-min) on the fly, then appended to one float32 file per output column. Peak memory
+# is one chunk regardless of file size. Later runs (and other users) reopen the cache through
+# np.memmap without parsing any text. Run standalone to pre-build a cache:
+#     python h2_ingest.py site_2019_2024.csv --freq 15min --column solar_mwh=pv1,pv2 --column demand_mwh=load
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import h2_trace
+
+CACHE_DIR = os.environ.get("H2_CACHE_DIR", ".h2cache")
+# the only directory server-side profile paths may point into (unset = no server-side paths)
+DATA_DIR = os.environ.get("H2_DATA_DIR", "")
+# 2: data files and metadata in one directory per key, published with a single rename
+CACHE_FORMAT = 2
+CHUNK_ROWS = 250_000
+
+# (path, size, mtime) or (upload file_id, size) -> digest, so a process hashes an unchanged file
+# (or a Streamlit upload, on every rerun) only once
+_digests = {}
+
+
+def file_digest(src, block=1 << 20):
+    """sha256 of a path or binary file-like, read in blocks."""
+    h = hashlib.sha256()
+    if hasattr(src, "read"):
+        pos = src.tell()
+        for buf in iter(lambda: src.read(block), b""):
+            h.update(buf)
+        src.seek(pos)
+    else:
+        with open(src, "rb") as f:
+            for buf in iter(lambda: f.read(block), b""):
+                h.update(buf)
+    return h.hexdigest()
+
+
+def _source_digest(src):
+    if hasattr(src, "read"):
+        file_id = getattr(src, "file_id", None)
+        if file_id is None:
+            return file_digest(src)
+        stamp = ("upload", file_id, getattr(src, "size", None))
+        if stamp not in _digests:
+            _digests[stamp] = file_digest(src)
+        return _digests[stamp]
+    st = os.stat(src)
+    stamp = (os.path.abspath(src), st.st_size, st.st_mtime_ns)
+    if stamp not in _digests:
+        _digests[stamp] = file_digest(src)
+    return _digests[stamp]
+
+
+def resolve_data_path(path, data_dir=None):
+    """Real path of a server-side CSV, which must lie inside data_dir (default DATA_DIR)."""
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    if not data_dir:
+        raise ValueError("server-side profile paths are disabled (set H2_DATA_DIR to allow a data directory)")
+    root = os.path.realpath(data_dir)
+    full = os.path.realpath(os.path.join(root, os.path.expanduser(path)))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"profile path must be inside {data_dir}")
+    if not os.path.isfile(full):
+        raise ValueError(f"no such file in {data_dir}: {path}")
+    return full
+
+
+def read_header(src):
+    """Column names of a CSV (path or binary file-like) without reading the body."""
+    if hasattr(src, "seek"):
+        src.seek(0)
+        cols = pd.read_csv(src, nrows=0).columns.tolist()
+        src.seek(0)
+        return cols
+    return pd.read_csv(src, nrows=0).columns.tolist()
+
+
+def _normalize_columns(columns):
+    # {"solar_mwh": "pv"} or {"solar_mwh": ["pv1", "pv2"]} -> {"solar_mwh": ["pv1", "pv2"]}
+    return {out: ([src] if isinstance(src, str) else list(src)) for out, src in columns.items()}
+
+
+class _Resampler:
+    # Accumulates chunk sums into fixed buckets; the last bucket of a chunk stays open until the
+    # next chunk shows a later bucket, so buckets split across chunk boundaries are summed correctly.
+
+    def __init__(self, freq, names):
+        self.step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+        self.names = names
+        self.start = None
+        self.next_bucket = None
+        self.open_bucket = None
+        self.open_values = None
+        self.last_ts = None
+        self.missing_steps = 0
+
+    def feed(self, ts, values):
+        """ts: DatetimeIndex (sorted), values: (n, k) float64. Returns closed (n', k) rows."""
+        if self.last_ts is not None and ts[0] < self.last_ts:
+            raise ValueError(f"timestamps go backwards at {ts[0]}")
+        if len(ts) > 1 and not ts.is_monotonic_increasing:
+            raise ValueError("timestamps must be sorted ascending")
+        if self.last_ts is None and len(ts) > 2 and np.median(np.diff(ts.asi8)) > self.step.value:
+            raise ValueError(f"source resolution is coarser than the target step {self.step}")
+        self.last_ts = ts[-1]
+        buckets = ts.floor(self.step)
+        codes, uniq = pd.factorize(buckets, sort=True)
+        sums = np.column_stack([np.bincount(codes, weights=values[:, j], minlength=len(uniq))
+                                for j in range(values.shape[1])])
+        uniq = pd.DatetimeIndex(uniq)
+        if self.open_bucket is not None:
+            if uniq[0] == self.open_bucket:
+                sums[0] += self.open_values
+            else:
+                uniq = uniq.insert(0, self.open_bucket)
+                sums = np.vstack([self.open_values, sums])
+        # keep the newest bucket open, emit the rest on a gap-free grid
+        self.open_bucket, self.open_values = uniq[-1], sums[-1].copy()
+        return self._emit(uniq[:-1], sums[:-1])
+
+    def close(self):
+        if self.open_bucket is None:
+            return np.zeros((0, len(self.names)))
+        out = self._emit(pd.DatetimeIndex([self.open_bucket]), self.open_values[None, :])
+        self.open_bucket = None
+        return out
+
+    def _emit(self, buckets, sums):
+        if len(buckets) == 0:
+            return np.zeros((0, len(self.names)))
+        if self.start is None:
+            self.start = buckets[0]
+            self.next_bucket = buckets[0]
+        pos = ((buckets - self.next_bucket) // self.step).to_numpy().astype(np.int64)
+        n = int(pos[-1]) + 1
+        grid = np.zeros((n, sums.shape[1]))
+        grid[pos] = sums
+        # steps with no readings are written as zero energy and counted
+        self.missing_steps += n - len(buckets)
+        self.next_bucket = buckets[-1] + self.step
+        return grid
+
+
+def _cache_paths(cache_dir, key):
+    data_dir = os.path.join(cache_dir, key)
+    return os.path.join(data_dir, "meta.json"), data_dir
+
+
+def ingest_csv(src, columns, freq="h", time_col="timestamp", scale=1.0,
+               cache_dir=CACHE_DIR, chunksize=CHUNK_ROWS):
+    """Stream a CSV (path or binary file-like) into the float32 cache and return open_cache() of it.
+
+    columns maps each output column to one source column or a list of channels that are summed;
+    scale converts units (e.g. 0.001 for kWh -> MWh).
+    """
+    with h2_trace.stage("ingest csv"):
+        return _ingest_csv(src, columns, freq, time_col, scale, cache_dir, chunksize)
+
+
+def _ingest_csv(src, columns, freq, time_col, scale, cache_dir, chunksize):
+    columns = _normalize_columns(columns)
+    with h2_trace.stage("hash source"):
+        digest = _source_digest(src)
+    spec = {"format": CACHE_FORMAT, "digest": digest, "columns": columns,
+            "freq": freq, "time_col": time_col, "scale": scale}
+    key = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+    meta_path, data_dir = _cache_paths(cache_dir, key)
+    if os.path.exists(meta_path):
+        return open_cache(meta_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=key + ".", dir=cache_dir)
+    names = list(columns)
+    channels = sorted({c for chans in columns.values() for c in chans})
+    resampler = _Resampler(freq, names)
+    files = [open(os.path.join(tmp_dir, name + ".f32"), "wb") for name in names]
+    rows_read = rows_dropped = 0
+    try:
+        if hasattr(src, "seek"):
+            src.seek(0)
+        reader = pd.read_csv(src, usecols=[time_col] + channels, chunksize=chunksize, low_memory=False)
+        for chunk in reader:
+            rows_read += len(chunk)
+            ts = pd.to_datetime(chunk[time_col], errors="coerce")
+            raw = chunk[channels].apply(pd.to_numeric, errors="coerce")
+            ok = ts.notna().to_numpy() & raw.notna().all(axis=1).to_numpy()
+            rows_dropped += int((~ok).sum())
+            if not ok.any():
+                continue
+            raw = raw[ok]
+            values = np.column_stack([raw[chans].to_numpy(dtype=float).sum(axis=1) for chans in columns.values()]) * scale
+            _write(files, resampler.feed(pd.DatetimeIndex(ts[ok]), values))
+        _write(files, resampler.close())
+    except ValueError as exc:
+        for f in files:
+            f.close()
+        _remove_tree(tmp_dir)
+        if "Usecols" in str(exc) or "not in list" in str(exc):
+            raise ValueError(f"CSV must contain '{time_col}' and " + ",".join(f"'{c}'" for c in channels)) from exc
+        raise
+    for f in files:
+        f.close()
+    if resampler.start is None:
+        _remove_tree(tmp_dir)
+        raise ValueError("CSV contains no valid rows")
+
+    n_steps = os.path.getsize(os.path.join(tmp_dir, names[0] + ".f32")) // 4
+    meta = {**spec, "key": key, "start": resampler.start.isoformat(), "n_steps": int(n_steps),
+            "names": names, "rows_read": rows_read, "rows_dropped": rows_dropped,
+            "missing_steps": resampler.missing_steps}
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    # publish atomically: data and metadata appear together with one rename, so a cache directory
+    # is always complete. A concurrent ingest of the same file that got there first keeps its copy.
+    try:
+        os.replace(tmp_dir, data_dir)
+    except OSError:
+        _remove_tree(tmp_dir)
+        if not os.path.exists(meta_path):
+            raise
+    return open_cache(meta_path)
+
+
+def _write(files, rows):
+    for i, f in enumerate(files):
+        rows[:, i].astype(np.float32).tofile(f)
+
+
+def _remove_tree(path):
+    for name in os.listdir(path):
+        os.remove(os.path.join(path, name))
+    os.rmdir(path)
+
+
+def open_cache(meta_path):
+    """Reopen an ingested profile zero-copy: each column is a read-only float32 memmap."""
+    with open(meta_path) as f:
+        meta = json.load(f)
+    data_dir = os.path.dirname(meta_path)
+    n = meta["n_steps"]
+    data = {"timestamp": pd.date_range(meta["start"], periods=n, freq=meta["freq"])}
+    for name in meta["names"]:
+        data[name] = np.memmap(os.path.join(data_dir, name + ".f32"), dtype=np.float32, mode="r", shape=(n,))
+    df = pd.DataFrame(data, copy=False)
+    df.attrs["ingest"] = meta
+    return df
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stream a timestamped CSV into the H2 profile cache.")
+    ap.add_argument("csv")
+    ap.add_argument("--freq", default="h", help="target step, e.g. h or 15min")
+    ap.add_argument("--time-col", default="timestamp")
+    ap.add_argument("--column", action="append", default=[],
+                    help="output=src1[,src2...] (channels are summed); default solar_mwh, demand_mwh")
+    ap.add_argument("--scale", type=float, default=1.0, help="unit factor, e.g. 0.001 for kWh -> MWh")
+    ap.add_argument("--cache-dir", default=CACHE_DIR)
+    args = ap.parse_args(argv)
+    columns = dict(c.split("=", 1) for c in args.column) or {"solar_mwh": "solar_mwh", "demand_mwh": "demand_mwh"}
+    columns = {k: v.split(",") for k, v in columns.items()}
+    df = ingest_csv(args.csv, columns, freq=args.freq, time_col=args.time_col, scale=args.scale, cache_dir=args.cache_dir)
+    meta = df.attrs["ingest"]
+    print(f"{meta['key']}: {meta['n_steps']} steps from {meta['start']} ({meta['rows_read']} rows read, "
+          f"{meta['rows_dropped']} dropped, {meta['missing_steps']} missing steps)")
+
+
+if __name__ == "__main__":
+    main()
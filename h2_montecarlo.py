@@ -0,0 +1,190 @@
+# h2_montecarlo.py — Monte Carlo uncertainty analysis of the H2app.py model on a process pool
+#
+# Uncertain inputs are sampled as multipliers on their base values. Trajectories are evaluated in
+# fixed-size batches, each batch as one (batch, steps) array computation with the per-step model of
+# h2_engine.simulate (equipment ratings, finite tank through h2_storage), and batches are spread
+# over a ProcessPoolExecutor. Every batch draws from its own child of one SeedSequence, so results
+# depend only on the seed and the batch size — not on the number of workers or completion order.
+# Each trajectory also gets a project-lifetime NPV / IRR / payback from h2_finance (finance keys
+# are read from params).
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import h2_engine
+import h2_finance
+import h2_storage
+
+# name -> (distribution, *args) for a multiplier on the base value
+DEFAULT_UNCERTAINTY = {
+    "solar": ("normal", 1.0, 0.10),
+    "demand": ("normal", 1.0, 0.10),
+    "diesel_price_tk_per_l": ("triangular", 0.8, 1.0, 1.3),
+    "grid_emission_kgCO2_per_mwh": ("uniform", 0.85, 1.15),
+    "capex_usd": ("triangular", 0.9, 1.0, 1.3),
+    "opex_usd_per_month": ("triangular", 0.9, 1.0, 1.5),
+}
+
+PERCENTILES = (10, 50, 90)
+
+# per-step values held in memory per batch (batch size = this / number of steps)
+_BATCH_CELLS = 1 << 21
+_MAX_BATCH = 4096
+
+_ctx = None
+
+
+def _sample(rng, spec, n):
+    kind, *args = spec
+    if kind == "normal":
+        # multipliers cannot go negative
+        return np.maximum(rng.normal(args[0], args[1], n), 0.0)
+    if kind == "uniform":
+        return rng.uniform(args[0], args[1], n)
+    if kind == "triangular":
+        return rng.triangular(args[0], args[1], args[2], n)
+    if kind == "lognormal":
+        return rng.lognormal(np.log(args[0]), args[1], n)
+    raise ValueError(f"unknown distribution {kind!r}")
+
+
+def _context(profile, params):
+    p = {**h2_engine.DEFAULT_PARAMS, **(params or {})}
+    df, month_share = h2_engine.base_frame(profile, ["solar_mwh", "demand_mwh"])
+    month = h2_engine.month_index(df)
+    starts = np.flatnonzero(np.r_[True, np.diff(month) != 0])
+    return {
+        "p": p,
+        "solar": df["solar_mwh"].to_numpy(dtype=float),
+        "demand": df["demand_mwh"].to_numpy(dtype=float),
+        "step_h": h2_engine.step_hours(df),
+        "month_starts": starts,
+        "month_share": np.add.reduceat(month_share, starts),
+    }
+
+
+def _init_worker(ctx):
+    global _ctx
+    _ctx = ctx
+
+
+def _run_batch(seed_seq, n, uncertainty):
+    ctx = _ctx
+    p = ctx["p"]
+    rng = np.random.default_rng(seed_seq)
+    draws = {name: _sample(rng, spec, n) for name, spec in uncertainty.items()}
+    one = np.ones(n)
+    m_solar = draws.get("solar", one)[:, None]
+    m_demand = draws.get("demand", one)[:, None]
+    diesel_price = p["diesel_price_tk_per_l"] * draws.get("diesel_price_tk_per_l", one)
+    emission = p["grid_emission_kgCO2_per_mwh"] * draws.get("grid_emission_kgCO2_per_mwh", one)
+    capex = p["capex_usd"] * draws.get("capex_usd", one)
+    opex = p["opex_usd_per_month"] * draws.get("opex_usd_per_month", one)
+
+    solar = ctx["solar"] * m_solar
+    demand = ctx["demand"] * m_demand
+    step_h = ctx["step_h"]
+    energy = h2_engine.electrolyzer_energy(solar, demand, p["solar_frac_for_electrolysis"], p["use_grid_for_electrolysis"])
+    energy = np.minimum(energy, p["electrolyzer_mw"] * step_h)
+    export = np.maximum(0, solar - demand)
+    grid_to_el = np.maximum(energy - solar * p["solar_frac_for_electrolysis"], 0).sum(axis=-1)
+    del solar, demand
+
+    # same per-step formulas as h2_engine.simulate: ratings cap the electrolyzer and fuel cell, and
+    # fuel cell / refuelling only get the H2 the tank can deliver
+    lhv_mwh = p["h2_lhv_kwh_per_kg"] / 1000.0
+    h2_per_mwh = p["electrolyzer_eff"] / lhv_mwh
+    starts = ctx["month_starts"]
+    lo, hi = p["tank_min_kg"], p["tank_max_kg"]
+    s0 = min(max(p["initial_h2_storage_kg"], lo), hi)
+    slope = h2_per_mwh * (1.0 - p["fraction_h2_to_fuelcell"] - p["fraction_h2_to_refuel"])
+    # the free tank path s0 + slope * cumsum(energy) is monotone, so its ends tell whether it stays in bounds
+    ends = s0 + slope * np.stack([energy[:, 0], energy.sum(axis=-1)])
+    if np.isinf(p["fuelcell_mw"]) and np.all((ends >= lo) & (ends <= hi)):
+        # nothing caps the withdrawals: everything downstream is linear in energy, so reduce to months first
+        h2 = np.add.reduceat(energy, starts, axis=-1) * h2_per_mwh
+        export = np.add.reduceat(export, starts, axis=-1)
+        fc_elec = h2 * (p["fraction_h2_to_fuelcell"] * lhv_mwh * p["fuelcell_eff"])
+        refuel = h2 * p["fraction_h2_to_refuel"]
+    else:
+        h2 = energy * h2_per_mwh
+        del energy
+        h2_fc = np.minimum(h2 * p["fraction_h2_to_fuelcell"], p["fuelcell_mw"] * step_h / (lhv_mwh * p["fuelcell_eff"]))
+        h2_ref = h2 * p["fraction_h2_to_refuel"]
+        _, _, unmet = h2_storage.storage_balance(h2, h2_fc + h2_ref, p["initial_h2_storage_kg"], lo, hi)
+        unmet_fc, unmet_ref = h2_storage.split_unmet(unmet, h2_fc, h2_ref)
+        fc_elec = (h2_fc - unmet_fc) * (lhv_mwh * p["fuelcell_eff"])
+        refuel = h2_ref - unmet_ref
+        del h2_fc, h2_ref, unmet, unmet_fc, unmet_ref
+        # the cashflow only needs months (rows of a month are contiguous)
+        h2, fc_elec, refuel, export = (np.add.reduceat(x, starts, axis=-1) for x in (h2, fc_elec, refuel, export))
+    share = ctx["month_share"]
+
+    revenue_tk = (h2 * (8.0 * p["oxygen_price_tk_per_kg"]) + refuel * p["h2_sale_price_tk_per_kg"]
+                  + fc_elec * p["grid_price_tk_per_mwh"])
+    diesel_tk = (p["diesel_l_per_month"] * share) * diesel_price[:, None]
+    net_usd = (revenue_tk + diesel_tk) / p["exchange_rate"] - opex[:, None] * share
+    cashflow = np.cumsum(net_usd, axis=-1) - capex[:, None]
+    diesel_co2 = p["diesel_l_per_month"] * p["diesel_co2_kg_per_l"] / 12.0 * share.sum()
+    # lifetime view from the per-year totals of every trajectory
+    per_year = 12.0 / share.sum()
+    life = h2_finance.lifetime(h2.sum(axis=-1) * per_year, revenue_tk.sum(axis=-1) * per_year, capex, opex * 12.0,
+                               p["exchange_rate"], diesel_tk.sum(axis=-1) * per_year, p)
+    return {
+        "h2_kg": h2.sum(axis=-1),
+        "revenue_usd": revenue_tk.sum(axis=-1) / p["exchange_rate"],
+        "co2_avoided_kg": h2_engine.co2_avoided_kg(export.sum(axis=-1), fc_elec.sum(axis=-1), grid_to_el, emission, diesel_co2),
+        "cumulative_cashflow_usd": cashflow,
+        "npv_usd": life["npv_usd"],
+        "irr": life["irr"],
+        "payback_years": life["payback_years"],
+        "lifetime_cumulative_usd": life["cumulative_usd"],
+        "inputs": np.column_stack([draws[k] for k in uncertainty]) if uncertainty else np.zeros((n, 0)),
+    }
+
+
+def run_monte_carlo(profile, params=None, n=10000, seed=0, uncertainty=None, workers=None, progress=None):
+    """Run n trajectories; returns per-trajectory arrays plus P10/P50/P90 bands.
+
+    progress(done, total) is called in the caller's thread as batches finish.
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    uncertainty = dict(DEFAULT_UNCERTAINTY if uncertainty is None else uncertainty)
+    ctx = _context(profile, params)
+    steps = max(len(ctx["solar"]), 1)
+    batch = int(min(_MAX_BATCH, max(1, _BATCH_CELLS // steps)))
+    sizes = [batch] * (n // batch) + ([n % batch] if n % batch else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+
+    parts = [None] * len(sizes)
+    done = 0
+    if workers <= 1:
+        _init_worker(ctx)
+        for i, (ss, size) in enumerate(zip(seeds, sizes)):
+            parts[i] = _run_batch(ss, size, uncertainty)
+            done += size
+            if progress:
+                progress(done, n)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ctx,)) as pool:
+            futures = {pool.submit(_run_batch, ss, size, uncertainty): i for i, (ss, size) in enumerate(zip(seeds, sizes))}
+            for fut in as_completed(futures):
+                parts[futures[fut]] = fut.result()
+                done += sizes[futures[fut]]
+                if progress:
+                    progress(done, n)
+
+    out = {k: np.concatenate([part[k] for part in parts]) for k in parts[0]}
+    out["input_names"] = list(uncertainty)
+    out["bands"] = {k: np.percentile(out[k], PERCENTILES, axis=0)
+                    for k in ("h2_kg", "revenue_usd", "co2_avoided_kg", "cumulative_cashflow_usd",
+                              "npv_usd", "lifetime_cumulative_usd")}
+    # IRR / payback are NaN for trajectories that never pay back; percentiles treat those as worst
+    for k in ("irr", "payback_years"):
+        worst = -np.inf if k == "irr" else np.inf
+        out["bands"][k] = np.percentile(np.where(np.isnan(out[k]), worst, out[k]), PERCENTILES, method="nearest")
+    return out
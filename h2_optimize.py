@@ -0,0 +1,192 @@
+# h2_optimize.py — system sizing: electrolyzer MW, H2 tank kg, fuel-cell MW, solar split
+#
+# Candidates are evaluated in vectorized (candidates, steps) blocks with the same formulas as
+# h2_engine.simulate (ratings cap per-step electrolyzer energy and fuel-cell H2, the tank runs
+# through h2_storage). A Latin-hypercube screen picks the most promising starts, then a bounded
+# Powell search refines each of them. The CO2 requirement enters as a penalty. NPV and LCOH are
+# project-lifetime values from h2_finance (finance keys are read from params).
+
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.stats import qmc
+
+import h2_engine
+import h2_finance
+import h2_storage
+
+VARIABLES = ["electrolyzer_mw", "tank_kg", "fuelcell_mw", "solar_frac_for_electrolysis"]
+
+COST_DEFAULTS = {
+    "electrolyzer_usd_per_mw": 1200000.0,
+    "tank_usd_per_kg": 600.0,
+    "fuelcell_usd_per_mw": 1500000.0,
+    "fixed_capex_usd": 0.0,
+    "fixed_om_frac_of_capex": 0.02,
+    "stack_replacement_frac": 0.35,        # of electrolyzer CAPEX, per stack swap
+}
+
+# per-step cells evaluated at once
+_BLOCK_CELLS = 1 << 20
+_PENALTY = 1e3
+
+
+def _context(profile, params, costs):
+    p = {**h2_engine.DEFAULT_PARAMS, **(params or {})}
+    c = {**COST_DEFAULTS, **(costs or {})}
+    df, month_share = h2_engine.base_frame(profile, ["solar_mwh", "demand_mwh"])
+    solar = df["solar_mwh"].to_numpy(dtype=float)
+    demand = df["demand_mwh"].to_numpy(dtype=float)
+    step_h = h2_engine.step_hours(df)
+    return {
+        "p": p, "c": c, "solar": solar, "demand": demand, "step_h": step_h,
+        "annual": 8760.0 / step_h.sum(),
+        "diesel_tk_per_yr": p["diesel_l_per_month"] * 12.0 * p["diesel_price_tk_per_l"],
+        # design-independent CO2 inputs per profile: grid export (MWh) and displaced diesel (kg)
+        "export_mwh": np.maximum(0, solar - demand).sum(),
+        "diesel_co2_kg": p["diesel_l_per_month"] * p["diesel_co2_kg_per_l"] / 12.0 * month_share.sum(),
+    }
+
+
+def default_bounds(profile, params=None):
+    """Search box derived from the profile: up to peak solar+grid power, 30 days of H2 storage."""
+    ctx = _context(profile, params, None)
+    p = ctx["p"]
+    full = h2_engine.electrolyzer_energy(ctx["solar"], ctx["demand"], 1.0, p["use_grid_for_electrolysis"])
+    peak_mw = max(float((full / ctx["step_h"]).max()), 1e-3)
+    h2_per_day = full.sum() * p["electrolyzer_eff"] / (p["h2_lhv_kwh_per_kg"] / 1000.0) / (ctx["step_h"].sum() / 24.0)
+    fc_peak_mw = max(float((ctx["demand"] / ctx["step_h"]).max()), 1e-3)
+    return {
+        "electrolyzer_mw": (0.01 * peak_mw, peak_mw),
+        "tank_kg": (0.0, max(30.0 * h2_per_day, 1.0)),
+        "fuelcell_mw": (0.0, fc_peak_mw),
+        "solar_frac_for_electrolysis": (0.0, 1.0),
+    }
+
+
+def evaluate(ctx, X):
+    """KPIs for candidate designs X (N, 4) in VARIABLES order; returns a dict of (N,) arrays."""
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    rows = max(1, _BLOCK_CELLS // max(len(ctx["solar"]), 1))
+    parts = [_evaluate_block(ctx, X[i:i + rows]) for i in range(0, len(X), rows)]
+    return {k: np.concatenate([part[k] for part in parts]) for k in parts[0]}
+
+
+def _evaluate_block(ctx, X):
+    p, c = ctx["p"], ctx["c"]
+    el_mw, tank_kg, fc_mw, sf = (X[:, i] for i in range(4))
+    solar, demand, step_h = ctx["solar"], ctx["demand"], ctx["step_h"]
+    lhv_mwh = p["h2_lhv_kwh_per_kg"] / 1000.0
+
+    energy = h2_engine.electrolyzer_energy(solar, demand, sf[:, None], p["use_grid_for_electrolysis"])
+    energy = np.minimum(energy, el_mw[:, None] * step_h)
+    grid_to_el = np.maximum(energy - solar * sf[:, None], 0).sum(axis=-1)
+    h2 = energy * (p["electrolyzer_eff"] / lhv_mwh)
+    fc_cap = fc_mw[:, None] * step_h / (lhv_mwh * p["fuelcell_eff"])
+    h2_fc = np.minimum(h2 * p["fraction_h2_to_fuelcell"], fc_cap)
+    h2_ref = h2 * p["fraction_h2_to_refuel"]
+    _, curtailed, unmet = h2_storage.storage_balance(
+        h2, h2_fc + h2_ref, p["initial_h2_storage_kg"], p["tank_min_kg"], np.maximum(tank_kg, p["tank_min_kg"]))
+    unmet_fc, unmet_ref = h2_storage.split_unmet(unmet, h2_fc, h2_ref)
+    fc_elec = ((h2_fc - unmet_fc) * (lhv_mwh * p["fuelcell_eff"])).sum(axis=-1)
+    h2_total = h2.sum(axis=-1)
+    h2_useful = h2_total - curtailed.sum(axis=-1)
+    revenue_tk = (h2_total * 8.0 * p["oxygen_price_tk_per_kg"]
+                  + (h2_ref - unmet_ref).sum(axis=-1) * p["h2_sale_price_tk_per_kg"]
+                  + fc_elec * p["grid_price_tk_per_mwh"])
+
+    a = ctx["annual"]
+    capex = (el_mw * c["electrolyzer_usd_per_mw"] + tank_kg * c["tank_usd_per_kg"]
+             + fc_mw * c["fuelcell_usd_per_mw"] + c["fixed_capex_usd"])
+    opex = p["opex_usd_per_month"] * 12.0 + c["fixed_om_frac_of_capex"] * capex
+    revenue = revenue_tk / p["exchange_rate"] * a
+    finance = {**p, "stack_replacement_usd": c["stack_replacement_frac"] * el_mw * c["electrolyzer_usd_per_mw"]}
+    npv, lcoh = h2_finance.npv_lcoh(h2_useful * a, revenue_tk * a, capex, opex, p["exchange_rate"],
+                                    ctx["diesel_tk_per_yr"], finance)
+    co2 = h2_engine.co2_avoided_kg(ctx["export_mwh"], fc_elec, grid_to_el, p["grid_emission_kgCO2_per_mwh"],
+                                   ctx["diesel_co2_kg"]) * a
+    return {"capex_usd": capex, "revenue_usd_per_yr": revenue, "opex_usd_per_yr": opex, "npv_usd": npv,
+            "lcoh_usd_per_kg": lcoh, "h2_kg_per_yr": h2_total * a, "h2_curtailed_kg_per_yr": curtailed.sum(axis=-1) * a,
+            "h2_unmet_kg_per_yr": unmet.sum(axis=-1) * a, "co2_avoided_t_per_yr": co2 / 1000.0}
+
+
+def _score(kpis, objective, min_co2_avoided_t):
+    # lower is better; infeasible designs pay in proportion to the CO2 shortfall
+    if objective == "npv":
+        base = -kpis["npv_usd"]
+    else:
+        base = kpis["lcoh_usd_per_kg"]
+    shortfall = np.maximum(min_co2_avoided_t - kpis["co2_avoided_t_per_yr"], 0.0)
+    return base + _PENALTY * shortfall * (1.0 + np.abs(base))
+
+
+def optimize(profile, params=None, costs=None, objective="npv", min_co2_avoided_t=0.0,
+             bounds=None, n_screen=256, n_starts=3, seed=0):
+    """Size the system to maximize NPV (objective="npv") or minimize LCOH ("lcoh") under a CO2 floor."""
+    if objective not in ("npv", "lcoh"):
+        raise ValueError("objective must be 'npv' or 'lcoh'")
+    t0 = time.perf_counter()
+    ctx = _context(profile, params, costs)
+    box = {**default_bounds(profile, params), **(bounds or {})}
+    lo = np.array([box[v][0] for v in VARIABLES], dtype=float)
+    hi = np.array([box[v][1] for v in VARIABLES], dtype=float)
+    span = np.where(hi > lo, hi - lo, 1.0)
+
+    # screen: Latin hypercube over the box, all candidates in one vectorized pass
+    X = qmc.scale(qmc.LatinHypercube(d=len(VARIABLES), seed=seed).random(n_screen), lo, np.maximum(hi, lo + 1e-12))
+    screened = evaluate(ctx, X)
+    scores = _score(screened, objective, min_co2_avoided_t)
+    starts = X[np.argsort(scores)[:n_starts]]
+
+    # refine: bounded Powell on the unit box from each start
+    n_eval = n_screen
+
+    def f(u):
+        nonlocal n_eval
+        n_eval += 1
+        x = lo + np.clip(u, 0, 1) * span
+        return float(_score(evaluate(ctx, x[None, :]), objective, min_co2_avoided_t)[0])
+
+    # the best screened design stands unless a refinement beats it (bounded Powell can end up worse
+    # than its start across the CO2 penalty cliff)
+    best_u, best_f = (starts[0] - lo) / span, float(scores.min())
+    for x0 in starts:
+        res = minimize(f, (x0 - lo) / span, method="Powell", bounds=[(0.0, 1.0)] * len(VARIABLES),
+                       options={"xtol": 1e-3, "ftol": 1e-6, "maxfev": 400})
+        if res.fun < best_f:
+            best_u, best_f = res.x, res.fun
+    x = lo + np.clip(best_u, 0, 1) * span
+    kpis = {k: float(v[0]) for k, v in evaluate(ctx, x[None, :]).items()}
+    design = dict(zip(VARIABLES, map(float, x)))
+    return {
+        "design": design,
+        "kpis": kpis,
+        "binding": binding_constraints(design, box, kpis, min_co2_avoided_t),
+        "feasible": kpis["co2_avoided_t_per_yr"] >= min_co2_avoided_t - 1e-6,
+        "screened": pd.DataFrame({**{v: X[:, i] for i, v in enumerate(VARIABLES)}, **screened}),
+        "evaluations": n_eval,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def binding_constraints(design, box, kpis, min_co2_avoided_t, tol=0.01):
+    """Human-readable list of bounds / constraints the design sits on."""
+    out = []
+    for v in VARIABLES:
+        lo, hi = box[v]
+        width = max(hi - lo, 1e-12)
+        if design[v] <= lo + tol * width:
+            out.append(f"{v} at lower bound ({lo:,.3g})")
+        elif design[v] >= hi - tol * width:
+            out.append(f"{v} at upper bound ({hi:,.3g})")
+    if kpis["co2_avoided_t_per_yr"] < min_co2_avoided_t - 1e-6:
+        out.append(f"CO₂ avoided ≥ {min_co2_avoided_t:,.0f} t/yr not reachable inside the bounds")
+    elif min_co2_avoided_t > 0 and kpis["co2_avoided_t_per_yr"] <= min_co2_avoided_t + tol * abs(min_co2_avoided_t):
+        out.append(f"CO₂ avoided ≥ {min_co2_avoided_t:,.0f} t/yr")
+    if kpis["h2_curtailed_kg_per_yr"] > 0:
+        out.append("tank full: H₂ curtailed")
+    if kpis["h2_unmet_kg_per_yr"] > 0:
+        out.append("tank empty: withdrawals unmet")
+    return out
@@ -0,0 +1,116 @@
+# h2_portfolio.py — multi-site portfolio of the H2app.py model
+#
+# Each site has its own profile and params. Sites with the same number of steps are stacked into
+# (sites, steps) arrays and run through h2_engine.SIMULATE_GRAPH in one pass, every param becoming
+# a (sites, 1) column, so cost grows linearly with the number of sites and no per-site frames are
+# concatenated. Large portfolios are cut into chunks of bounded size, which can run on a process pool.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import h2_engine
+import h2_finance
+import h2_graph
+
+# annual KPIs reported per site; the portfolio total is their sum
+KPIS = ["h2_kg", "o2_kg", "o2_revenue_usd", "revenue_usd", "fuelcell_elec_mwh", "curtailed_h2_kg", "unmet_h2_kg",
+        "co2_from_grid_import_kg", "co2_avoided_kg", "npv_usd"]
+
+# per-step values held per chunk (chunk size = this / number of steps)
+_CHUNK_CELLS = 1 << 22
+
+_NODES = ["h2_kg", "o2_kg", "o2_revenue_tk", "monthly_revenue_tk", "fuelcell_elec_mwh", "curtailed_h2_kg",
+          "unmet_fuelcell_h2_kg", "unmet_refuel_h2_kg", "co2_from_grid_import_kg", "co2_avoided_from_export_kg",
+          "grid_export_mwh", "grid_to_electrolysis_mwh", "co2_avoided_from_diesel_kg"]
+
+
+def _run_chunk(profiles, params):
+    # one stacked graph evaluation for sites of equal length
+    bases = [h2_engine.base_frame(prof, ["solar_mwh", "demand_mwh"]) for prof in profiles]
+    sources = {
+        "solar_mwh": np.stack([df["solar_mwh"].to_numpy(dtype=float) for df, _ in bases]),
+        "demand_mwh": np.stack([df["demand_mwh"].to_numpy(dtype=float) for df, _ in bases]),
+        "_step_h": np.stack([h2_engine.step_hours(df) for df, _ in bases]),
+        "_month_share": np.stack([share for _, share in bases]),
+    }
+    p = [{**h2_engine.DEFAULT_PARAMS, **h2_finance.FINANCE_DEFAULTS, **q} for q in params]
+    stacked = {k: np.array([q[k] for q in p])[:, None] for k in h2_engine.DEFAULT_PARAMS}
+    v = h2_graph.Session(h2_engine.SIMULATE_GRAPH, None, sources).get(stacked, _NODES)
+    total = {k: a.sum(axis=-1) for k, a in v.items()}
+
+    per_year = 8760.0 / sources["_step_h"].sum(axis=-1)
+    rate = stacked["exchange_rate"][:, 0]
+    out = {
+        "h2_kg": total["h2_kg"],
+        "o2_kg": total["o2_kg"],
+        "o2_revenue_usd": total["o2_revenue_tk"] / rate,
+        "revenue_usd": total["monthly_revenue_tk"] / rate,
+        "fuelcell_elec_mwh": total["fuelcell_elec_mwh"],
+        "curtailed_h2_kg": total["curtailed_h2_kg"],
+        "unmet_h2_kg": total["unmet_fuelcell_h2_kg"] + total["unmet_refuel_h2_kg"],
+        "co2_from_grid_import_kg": total["co2_from_grid_import_kg"],
+        "co2_avoided_kg": h2_engine.co2_avoided_kg(total["grid_export_mwh"], total["fuelcell_elec_mwh"],
+                                                   total["grid_to_electrolysis_mwh"],
+                                                   stacked["grid_emission_kgCO2_per_mwh"][:, 0],
+                                                   total["co2_avoided_from_diesel_kg"]),
+    }
+    out = {k: a * per_year for k, a in out.items()}
+
+    # lifetime NPV across sites; lifetime_years is the length of the year axis, so group by it
+    finance = {k: np.array([q[k] for q in p]) for k in h2_finance.FINANCE_DEFAULTS}
+    diesel_tk = np.array([q["diesel_l_per_month"] * 12.0 * q["diesel_price_tk_per_l"] for q in p])
+    npv = np.empty(len(p))
+    for years in np.unique(finance["lifetime_years"]):
+        rows = finance["lifetime_years"] == years
+        f = {k: a[rows] for k, a in finance.items()}
+        f["lifetime_years"] = int(years)
+        npv[rows], _ = h2_finance.npv_lcoh(
+            out["h2_kg"][rows], total["monthly_revenue_tk"][rows] * per_year[rows],
+            np.array([q["capex_usd"] for q in p])[rows], np.array([q["opex_usd_per_month"] * 12.0 for q in p])[rows],
+            rate[rows], diesel_tk[rows], f)
+    out["npv_usd"] = npv
+    return out
+
+
+def run_portfolio(sites, workers=1, chunk_sites=None):
+    """Annual KPIs for every site; returns a DataFrame with one row per site (input order).
+
+    sites: list of {"name", "profile", "params"}. workers > 1 spreads chunks over processes.
+    """
+    if not sites:
+        return pd.DataFrame(columns=["site", "steps"] + KPIS)
+    # group equal-length sites, then cut each group into bounded chunks
+    groups = {}
+    for i, site in enumerate(sites):
+        groups.setdefault(len(site["profile"]), []).append(i)
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    chunks = []
+    for steps, idx in groups.items():
+        size = max(1, _CHUNK_CELLS // max(steps, 1))
+        if chunk_sites:
+            size = min(size, chunk_sites)
+        elif workers > 1:
+            size = min(size, -(-len(idx) // workers))
+        chunks += [idx[j:j + size] for j in range(0, len(idx), size)]
+
+    args = [([sites[i]["profile"] for i in c], [dict(sites[i].get("params") or {}) for i in c]) for c in chunks]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_run_chunk, *zip(*args)))
+    else:
+        results = [_run_chunk(*a) for a in args]
+
+    order = np.concatenate([np.asarray(c) for c in chunks])
+    data = {k: np.empty(len(sites)) for k in KPIS}
+    for k in KPIS:
+        data[k][order] = np.concatenate([r[k] for r in results])
+    names = [site.get("name", f"Site {i + 1}") for i, site in enumerate(sites)]
+    return pd.DataFrame({"site": names, "steps": [len(s["profile"]) for s in sites], **data})
+
+
+def totals(kpis):
+    """Portfolio aggregate of a run_portfolio() result."""
+    return kpis[KPIS].sum()
@@ -0,0 +1,71 @@
+# h2_render.py — chart / table helpers that keep the browser payload at screen size
+#
+# Long native-resolution series are cut to the visible time window (binary search on the sorted
+# timestamps) and downsampled to about one point per screen pixel with Largest-Triangle-Three-
+# Buckets, which keeps peaks and troughs that plain striding would drop. Line traces use WebGL
+# (Scattergl). Tables are paged so the pandas Styler only formats the rows on screen.
+
+import numpy as np
+import plotly.graph_objects as go
+
+# points per trace sent to the browser
+MAX_POINTS = 2000
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def _numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb(x, y, n_out=MAX_POINTS):
+    """Indices of the Largest-Triangle-Three-Buckets selection of n_out points (first and last kept)."""
+    x = _numeric(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets over the interior points; each bucket's mean is the third triangle vertex
+    # when choosing the point of the bucket before it
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - mean_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[i + 1] - ay))
+        a = lo + int(np.nan_to_num(area, nan=-1.0).argmax())
+        out[i + 1] = a
+    return out
+
+
+def line_trace(name, x, y, max_points=MAX_POINTS, **kwargs):
+    """go.Scattergl line of (x, y) downsampled with LTTB; kwargs go to the trace (line=, yaxis=, ...)."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    idx = lttb(x, y, max_points)
+    return go.Scattergl(name=name, x=x[idx], y=y[idx], mode="lines", **kwargs)
+
+
+def time_window(df, start, end, time_col="timestamp"):
+    """Rows of a time-sorted frame with start <= timestamp <= end (no scan of the whole column)."""
+    ts = df[time_col].to_numpy()
+    i0 = np.searchsorted(ts, np.datetime64(start, "ns"), side="left")
+    i1 = np.searchsorted(ts, np.datetime64(end, "ns"), side="right")
+    return df.iloc[i0:i1]
+
+
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
+
+
+def page(df, number, page_size):
+    """Rows of 1-based page `number`; format this slice, not the whole frame."""
+    start = (min(max(int(number), 1), page_count(len(df), page_size)) - 1) * page_size
+    return df.iloc[start:start + page_size]
@@ -0,0 +1,101 @@
+# h2_storage.py — vectorized H2 tank balance (replaces the df.iterrows() storage loop)
+#
+# Each step maps the inventory through f_t(s) = clip(s + in_t - out_t, tank_min, tank_max).
+# A composition of such clip-shift maps is again a clip-shift map
+#     clip(clip(x + a1, l1, h1) + a2, l2, h2) = clip(x + a1 + a2, clip(l1 + a2, l2, h2), clip(h1 + a2, l2, h2))
+# so the whole trajectory is a prefix scan over (a, l, h) that NumPy can evaluate in
+# log2(n) whole-array passes. The shift part is just cumsum(in - out). One-sided tanks
+# (no max, or no min) have a closed form via a running min/max and skip the scan.
+#
+# Arrays may carry leading axes (scenarios, sites, ...); time is always the last axis.
+
+import numpy as np
+
+SCAN_BLOCK = 64
+
+
+def _scan_bounds(a, lo, hi):
+    # Inclusive Hillis-Steele scan of the (l, h) part; a is the cumsum of the shifts, so the
+    # shift of the later segment when composing step t with step t-k is a_t - a_{t-k}.
+    n = a.shape[-1]
+    l = np.broadcast_to(lo, a.shape).copy()
+    h = np.broadcast_to(hi, a.shape).copy()
+    shift = 1
+    while shift < n:
+        gap = a[..., shift:] - a[..., :-shift]
+        l_new = np.add(l[..., :-shift], gap)
+        h_new = np.add(h[..., :-shift], gap, out=gap)
+        l_cur, h_cur = l[..., shift:], h[..., shift:]
+        np.minimum(np.maximum(l_new, l_cur, out=l_new), h_cur, out=l_new)
+        np.minimum(np.maximum(h_new, l_cur, out=h_new), h_cur, out=h_new)
+        l_cur[...] = l_new
+        h_cur[...] = h_new
+        shift *= 2
+    return l, h
+
+
+def _clamped_path(net, s0, lo, hi, block=SCAN_BLOCK):
+    # Two-level scan: scan inside fixed-size blocks, then scan the per-block maps, then
+    # push each block's starting inventory through its local prefix maps.
+    lead, n = net.shape[:-1], net.shape[-1]
+    if n <= block:
+        a = np.cumsum(net, axis=-1)
+        l, h = _scan_bounds(a, lo, hi)
+        return np.clip(s0 + a, l, h)
+    nb = -(-n // block)
+    padded = np.concatenate([net, np.zeros(lead + (nb * block - n,))], axis=-1)
+    a = np.cumsum(padded.reshape(lead + (nb, block)), axis=-1)
+    l, h = _scan_bounds(a, lo[..., None], hi[..., None])
+    block_a = np.cumsum(a[..., -1], axis=-1)
+    block_l, block_h = _scan_bounds(block_a, l[..., -1], h[..., -1])
+    block_end = np.clip(s0 + block_a, block_l, block_h)
+    block_start = np.concatenate([np.broadcast_to(s0, lead + (1,)), block_end[..., :-1]], axis=-1)
+    stored = np.clip(block_start[..., None] + a, l, h)
+    return stored.reshape(lead + (nb * block,))[..., :n]
+
+
+def storage_balance(h2_in_kg, h2_out_kg, initial_kg, tank_min_kg=0.0, tank_max_kg=np.inf):
+    """Tank trajectory for per-step inflow/withdrawal; returns (stored, curtailed, unmet) in kg."""
+    h2_in_kg = np.asarray(h2_in_kg, dtype=float)
+    h2_out_kg = np.asarray(h2_out_kg, dtype=float)
+    net = h2_in_kg - h2_out_kg
+    lead = net.shape[:-1]
+    s0 = np.asarray(initial_kg, dtype=float).reshape(np.shape(initial_kg) + (1,) * (net.ndim - np.ndim(initial_kg)))
+    lo = np.asarray(tank_min_kg, dtype=float)
+    hi = np.asarray(tank_max_kg, dtype=float)
+    lo = lo.reshape(lo.shape + (1,) * (net.ndim - lo.ndim))
+    hi = hi.reshape(hi.shape + (1,) * (net.ndim - hi.ndim))
+    if np.any(lo > hi):
+        raise ValueError("tank_min_kg must not exceed tank_max_kg")
+    if net.shape[-1] == 0:
+        empty = np.zeros(net.shape)
+        return empty, empty.copy(), empty.copy()
+
+    # an initial stock outside the tank limits is brought inside before the first step
+    s0 = np.clip(s0, lo, hi)
+    a = np.cumsum(net, axis=-1)
+    free = s0 + a
+    if np.all((free >= lo) & (free <= hi)):
+        # limits never touched: plain running sum
+        stored = np.broadcast_to(free, net.shape).copy()
+    elif np.all(np.isposinf(hi)):
+        # s_t = a_t + max(s0, lo - min_{k<=t} a_k)
+        stored = a + np.maximum(s0, lo - np.minimum.accumulate(a, axis=-1))
+    elif np.all(np.isneginf(lo)):
+        stored = a + np.minimum(s0, hi - np.maximum.accumulate(a, axis=-1))
+    else:
+        stored = _clamped_path(net, s0, lo, hi)
+
+    prev = np.concatenate([np.broadcast_to(s0, lead + (1,)), stored[..., :-1]], axis=-1)
+    raw = prev + net
+    curtailed = np.maximum(raw - hi, 0.0)
+    unmet = np.maximum(lo - raw, 0.0)
+    return stored, curtailed, unmet
+
+
+def split_unmet(unmet_kg, *withdrawals_kg):
+    """Share unmet withdrawal between the demands pro rata to what each asked for."""
+    total = np.sum(withdrawals_kg, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(total > 0, unmet_kg / total, 0.0)
+    return tuple(share * np.asarray(w, dtype=float) for w in withdrawals_kg)
@@ -0,0 +1,310 @@
+# h2_store.py — persistent result store shared by every session and server process
+#
+# Simulated frames are written as Parquet files named by a content hash of (model, MODEL_VERSION,
+# profile hash, params hash); SQLite (WAL mode) holds one metadata row per result: size, last
+# access, and an optional scenario name + JSON meta for saved scenarios. Files are published with
+# os.replace inside a write transaction, so concurrent Streamlit processes never see a partial file.
+# When the store grows past its byte budget the least recently used unnamed results are deleted;
+# named (saved) scenarios are kept until deleted explicitly.
+#
+# Writes cost far more than an incremental recompute (a 25-year hourly frame is ~50 MB of
+# Parquet), so callers queue them with put_async(): one background thread per store writes them
+# off the request path. estimate_write_s() predicts a write from the throughput measured so far,
+# letting h2_engine skip results that are cheaper to recompute than to store.
+#
+# The store is a cache: any disk / database error is reported as a warning and treated as a miss.
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import warnings
+
+import pandas as pd
+
+STORE_DIR = os.environ.get("H2_STORE_DIR", ".h2store")
+MAX_BYTES = int(float(os.environ.get("H2_STORE_MAX_MB", "2048")) * (1 << 20))
+# seconds a writer waits for another process holding the database lock
+BUSY_TIMEOUT = 30.0
+# queued background writes; further results are dropped (the store is a cache)
+WRITE_QUEUE = 8
+# write cost model until measured: fixed seconds per result + bytes per second
+WRITE_OVERHEAD_S = 0.005
+WRITE_RATE = 64 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    profile_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    name TEXT,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS results_access ON results (last_access);
+"""
+
+
+def result_key(model, model_version, profile_key, params_key):
+    """Content address of one simulation result."""
+    blob = json.dumps([model, model_version, profile_key, params_key])
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResultStore:
+    """Parquet frames + SQLite metadata under one directory; safe to share across processes."""
+
+    def __init__(self, path=STORE_DIR, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.write_rate = WRITE_RATE
+        self._ready = False
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pending = set()
+
+    def _connect(self):
+        # one short-lived connection per call: sqlite3 connections must not cross threads
+        if not self._ready:
+            with self._lock:
+                os.makedirs(self.path, exist_ok=True)
+                con = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=BUSY_TIMEOUT)
+                con.execute("PRAGMA journal_mode=WAL")
+                con.executescript(_SCHEMA)
+                con.close()
+                self._ready = True
+        con = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=BUSY_TIMEOUT, isolation_level=None)
+        con.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+        return con
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + ".parquet")
+
+    def get(self, key):
+        """Stored frame for key, or None."""
+        try:
+            con = self._connect()
+            try:
+                found = con.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone()
+                if found is None:
+                    self.misses += 1
+                    return None
+                try:
+                    df = pd.read_parquet(self._file(key))
+                except FileNotFoundError:
+                    # evicted by another process between the lookup and the read
+                    con.execute("DELETE FROM results WHERE key = ? AND name IS NULL", (key,))
+                    self.misses += 1
+                    return None
+                con.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError, ValueError) as exc:
+            warnings.warn(f"result store read failed: {exc}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return df
+
+    def put(self, key, df, model, model_version, profile_key, params):
+        """Store a frame (replacing any previous one under key), then evict down to max_bytes.
+
+        A frame whose file alone exceeds max_bytes is not stored (it would evict everything unnamed,
+        then itself)."""
+        target = self._file(key)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        t0 = time.perf_counter()
+        try:
+            con = self._connect()
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                df.to_parquet(tmp)
+                size = os.path.getsize(tmp)
+                if size > self.max_bytes:
+                    warnings.warn(f"result store: {size / (1 << 20):,.1f} MB result exceeds the "
+                                  f"{self.max_bytes / (1 << 20):,.1f} MB budget; not stored")
+                    return
+                now = time.time()
+                blob = json.dumps(params, sort_keys=True, default=float)
+                # publish file and row under the database write lock so eviction cannot interleave
+                con.execute("BEGIN IMMEDIATE")
+                try:
+                    os.replace(tmp, target)
+                    con.execute(
+                        "INSERT INTO results (key, model, model_version, profile_key, params, rows, bytes, created, last_access) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                        "rows = excluded.rows, bytes = excluded.bytes, last_access = excluded.last_access",
+                        (key, model, model_version, profile_key, blob, len(df), size, now, now))
+                    self._evict(con)
+                    con.execute("COMMIT")
+                except BaseException:
+                    con.execute("ROLLBACK")
+                    raise
+            finally:
+                con.close()
+            # running estimate of the write throughput (frame bytes in memory per second)
+            seconds = max(time.perf_counter() - t0 - WRITE_OVERHEAD_S, 1e-4)
+            self.write_rate = 0.5 * self.write_rate + 0.5 * frame_bytes(df) / seconds
+        except (sqlite3.Error, OSError, ValueError, ImportError) as exc:
+            warnings.warn(f"result store write failed: {exc}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def put_async(self, key, df, model, model_version, profile_key, params):
+        """Queue put() on the store's writer thread; False if dropped (queue full or key already queued).
+
+        df must not be modified afterwards.
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            if self._queue is None:
+                self._queue = queue.Queue(WRITE_QUEUE)
+                threading.Thread(target=self._writer, name="h2_store writer", daemon=True).start()
+            try:
+                self._queue.put_nowait((key, df, model, model_version, profile_key, params))
+            except queue.Full:
+                return False
+            self._pending.add(key)
+        return True
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self.put(*item)
+            finally:
+                with self._lock:
+                    self._pending.discard(item[0])
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued write is on disk."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def estimate_write_s(self, df):
+        """Predicted seconds for put(df), from the throughput of earlier writes."""
+        return WRITE_OVERHEAD_S + frame_bytes(df) / self.write_rate
+
+    def has(self, key):
+        try:
+            con = self._connect()
+            try:
+                return con.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is not None
+            finally:
+                con.close()
+        except sqlite3.Error:
+            return False
+
+    def _evict(self, con):
+        # inside the caller's write transaction
+        total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in con.execute("SELECT key, bytes FROM results WHERE name IS NULL ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            con.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._remove_file(key)
+            total -= size
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def save(self, key, name, meta=None):
+        """Name a stored result so it is listed in saved() and never evicted; False if key is not stored."""
+        try:
+            con = self._connect()
+            try:
+                cur = con.execute("UPDATE results SET name = ?, meta = ?, last_access = ? WHERE key = ?",
+                                  (name, json.dumps(meta or {}, default=float), time.time(), key))
+                return cur.rowcount > 0
+            finally:
+                con.close()
+        except sqlite3.Error as exc:
+            warnings.warn(f"result store write failed: {exc}")
+            return False
+
+    def saved(self, model=None):
+        """Saved scenarios, newest first: key, name, model, model_version, rows, created, params, meta."""
+        cols = ["key", "name", "model", "model_version", "rows", "created", "params", "meta"]
+        sql = f"SELECT {', '.join(cols)} FROM results WHERE name IS NOT NULL"
+        args = ()
+        if model:
+            sql += " AND model = ?"
+            args = (model,)
+        try:
+            con = self._connect()
+            try:
+                rows = con.execute(sql + " ORDER BY created DESC", args).fetchall()
+            finally:
+                con.close()
+        except sqlite3.Error as exc:
+            warnings.warn(f"result store read failed: {exc}")
+            rows = []
+        out = pd.DataFrame(rows, columns=cols)
+        out["created"] = pd.to_datetime(out["created"], unit="s")
+        out["params"] = out["params"].map(json.loads)
+        out["meta"] = out["meta"].map(lambda m: json.loads(m) if m else {})
+        return out
+
+    def delete(self, key):
+        try:
+            con = self._connect()
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                con.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._remove_file(key)
+                con.execute("COMMIT")
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError) as exc:
+            warnings.warn(f"result store write failed: {exc}")
+
+    def usage(self):
+        """(number of results, total bytes, named results); zeros if the store cannot be read."""
+        try:
+            con = self._connect()
+            try:
+                return con.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0), COUNT(name) FROM results").fetchone()
+            finally:
+                con.close()
+        except (sqlite3.Error, OSError) as exc:
+            warnings.warn(f"result store read failed: {exc}")
+            return 0, 0, 0
+
+
+def frame_bytes(df):
+    """In-memory size of a result frame."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+_default = None
+
+
+def default_store():
+    """Process-wide store under STORE_DIR, or None when disabled with H2_STORE=0."""
+    global _default
+    if os.environ.get("H2_STORE", "1") == "0":
+        return None
+    if _default is None:
+        _default = ResultStore()
+        # queued writes finish before the interpreter exits
+        atexit.register(_default.flush)
+    return _default
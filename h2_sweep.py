@@ -0,0 +1,205 @@
+# h2_sweep.py — batched parameter sweeps over the H2app.py model
+#
+# Every swept parameter gets its own array axis and the annual KPIs are evaluated for the whole
+# grid in one broadcast expression. Only solar_frac_for_electrolysis changes the per-step energy
+# balance (capped by the electrolyzer rating), so the time series is reduced once per distinct
+# solar fraction; everything downstream is linear in the annual totals and costs O(grid size)
+# regardless of profile length. That linear shortcut is exact while the fuel cell is unrated and
+# the tank never reaches its limits (checked per grid point from the first and last step, since
+# cumulative production only grows); the remaining points are simulated step by step in blocks,
+# with the fuel-cell cap and h2_storage, as in h2_optimize.
+#
+# npv_usd is the project-lifetime NPV from h2_finance (diesel savings included); the finance
+# keys, CAPEX and OPEX are read from params and can be swept too. Other KPIs are the
+# whole-profile sums of the matching h2_engine.simulate columns; revenue counts only the H2 the
+# tank delivered, as simulate does. co2_avoided_kg is the net figure of h2_engine.co2_avoided_kg.
+
+import numpy as np
+import pandas as pd
+
+import h2_engine
+import h2_finance
+import h2_storage
+
+SWEEPABLE = [
+    "electrolyzer_eff", "fuelcell_eff", "fraction_h2_to_fuelcell", "fraction_h2_to_refuel",
+    "solar_frac_for_electrolysis", "h2_lhv_kwh_per_kg", "oxygen_price_tk_per_kg",
+    "h2_sale_price_tk_per_kg", "grid_price_tk_per_mwh", "grid_emission_kgCO2_per_mwh", "exchange_rate",
+    "capex_usd", "opex_usd_per_month", "diesel_price_tk_per_l", "discount_rate", "price_escalation_per_yr",
+]
+
+KPIS = ["h2_kg", "o2_kg", "fuelcell_elec_mwh", "h2_to_refuel_kg", "revenue_usd", "co2_avoided_kg", "npv_usd"]
+
+# per-step rows processed at once when reducing the profile for many solar fractions
+_ROW_BLOCK = 1 << 22
+
+
+def _energy_totals(solar, demand, solar_fracs, use_grid, cap):
+    # (sum_t, first step, grid share sum_t) of the capped electrolyzer energy for each solar fraction,
+    # in bounded-memory blocks
+    fracs = np.asarray(solar_fracs, dtype=float)
+    total, first, from_grid = np.empty(fracs.shape), np.empty(fracs.shape), np.empty(fracs.shape)
+    per_block = max(1, _ROW_BLOCK // max(len(solar), 1))
+    flat = fracs.ravel()
+    res, res0, res_grid = total.ravel(), first.ravel(), from_grid.ravel()
+    for i in range(0, flat.size, per_block):
+        f = flat[i:i + per_block, None]
+        energy = np.minimum(h2_engine.electrolyzer_energy(solar, demand, f, use_grid), cap)
+        res[i:i + per_block] = energy.sum(axis=-1)
+        res0[i:i + per_block] = energy[:, 0] if energy.shape[-1] else 0.0
+        res_grid[i:i + per_block] = np.maximum(energy - solar * f, 0).sum(axis=-1)
+    return total, first, from_grid
+
+
+def _step_totals(ctx, sf, eff, lhv_mwh, fc_eff, f_fc, f_ref):
+    # per-step model for the grid points the linear totals cannot represent (1-D arrays of points);
+    # returns delivered fuel-cell electricity (MWh) and delivered refuelling H2 (kg) per point
+    p, solar, demand, step_h = ctx["p"], ctx["solar"], ctx["demand"], ctx["step_h"]
+    fc_elec, refuel = np.empty(len(sf)), np.empty(len(sf))
+    rows = max(1, _ROW_BLOCK // max(len(solar), 1))
+    for i in range(0, len(sf), rows):
+        b = slice(i, i + rows)
+        energy = np.minimum(h2_engine.electrolyzer_energy(solar, demand, sf[b, None], p["use_grid_for_electrolysis"]),
+                            p["electrolyzer_mw"] * step_h)
+        h2 = energy * (eff[b] / lhv_mwh[b])[:, None]
+        h2_fc = np.minimum(h2 * f_fc[b, None], p["fuelcell_mw"] * step_h / (lhv_mwh[b] * fc_eff[b])[:, None])
+        h2_ref = h2 * f_ref[b, None]
+        _, _, unmet = h2_storage.storage_balance(h2, h2_fc + h2_ref, p["initial_h2_storage_kg"],
+                                                 p["tank_min_kg"], p["tank_max_kg"])
+        unmet_fc, unmet_ref = h2_storage.split_unmet(unmet, h2_fc, h2_ref)
+        fc_elec[b] = ((h2_fc - unmet_fc) * (lhv_mwh[b] * fc_eff[b])[:, None]).sum(axis=-1)
+        refuel[b] = (h2_ref - unmet_ref).sum(axis=-1)
+    return fc_elec, refuel
+
+
+def sweep(profile, params, ranges):
+    """Evaluate annual KPIs on the full grid of `ranges` ({param: values}); returns {"axes", "kpis"}."""
+    unknown = set(ranges) - set(SWEEPABLE)
+    if unknown:
+        raise ValueError("cannot sweep " + ", ".join(sorted(unknown)))
+    p = {**h2_engine.DEFAULT_PARAMS, **h2_finance.FINANCE_DEFAULTS, **(params or {})}
+    base = h2_engine.simulate(profile, {k: v for k, v in p.items() if k in h2_engine.DEFAULT_PARAMS})
+    solar = base["solar_mwh"].to_numpy(dtype=float)
+    demand = base["demand_mwh"].to_numpy(dtype=float)
+    step_h = h2_engine.step_hours(base)
+
+    names = list(ranges)
+    axes = {name: np.atleast_1d(np.asarray(ranges[name], dtype=float)) for name in names}
+    ndim = len(names)
+
+    def grid(name):
+        # swept parameters on their own axis, fixed ones as scalars
+        if name not in axes:
+            return float(p[name])
+        shape = [1] * ndim
+        shape[names.index(name)] = -1
+        return axes[name].reshape(shape)
+
+    energy, energy0, grid_to_el = _energy_totals(solar, demand, grid("solar_frac_for_electrolysis"),
+                                      p["use_grid_for_electrolysis"], p["electrolyzer_mw"] * step_h)
+    lhv_mwh = grid("h2_lhv_kwh_per_kg") / 1000.0
+    h2_per_mwh = grid("electrolyzer_eff") / lhv_mwh
+    h2 = energy * h2_per_mwh
+    h2_fc = h2 * grid("fraction_h2_to_fuelcell")
+    fc_elec = h2_fc * lhv_mwh * grid("fuelcell_eff")
+    h2_refuel = h2 * grid("fraction_h2_to_refuel")
+    refuel_delivered = h2_refuel
+
+    # the linear totals hold while the free tank trajectory s0 + k * cumsum(energy) stays in bounds
+    lo, hi = p["tank_min_kg"], p["tank_max_kg"]
+    s0 = min(max(p["initial_h2_storage_kg"], lo), hi)
+    slope = h2_per_mwh * (1.0 - grid("fraction_h2_to_fuelcell") - grid("fraction_h2_to_refuel"))
+    fits = True
+    for end in (s0 + slope * energy0, s0 + slope * energy):
+        fits = fits & (end >= lo) & (end <= hi)
+    stepwise = ~fits | np.isfinite(p["fuelcell_mw"])
+    if np.any(stepwise):
+        phys = [grid(n) for n in ["solar_frac_for_electrolysis", "electrolyzer_eff", "fuelcell_eff",
+                                  "fraction_h2_to_fuelcell", "fraction_h2_to_refuel"]]
+        shape = np.broadcast_shapes(np.shape(h2), *(np.shape(v) for v in phys + [lhv_mwh]))
+        sf, eff, fc_eff, f_fc, f_ref, lhv = (np.broadcast_to(v, shape) for v in phys + [lhv_mwh])
+        sel = np.broadcast_to(stepwise, shape)
+        ctx = {"p": p, "solar": solar, "demand": demand, "step_h": step_h}
+        fc_sel, ref_sel = _step_totals(ctx, sf[sel], eff[sel], lhv[sel], fc_eff[sel], f_fc[sel], f_ref[sel])
+        fc_elec = np.broadcast_to(fc_elec, shape).copy()
+        refuel_delivered = np.broadcast_to(refuel_delivered, shape).copy()
+        fc_elec[sel], refuel_delivered[sel] = fc_sel, ref_sel
+    o2 = h2 * 8.0
+    revenue_tk = (o2 * grid("oxygen_price_tk_per_kg") + refuel_delivered * grid("h2_sale_price_tk_per_kg")
+                  + fc_elec * grid("grid_price_tk_per_mwh"))
+    revenue_usd = revenue_tk / grid("exchange_rate")
+    co2_avoided = h2_engine.co2_avoided_kg(base["grid_export_mwh"].sum(), fc_elec, grid_to_el,
+                                           grid("grid_emission_kgCO2_per_mwh"), base["co2_avoided_from_diesel_kg"].sum())
+
+    # lifetime NPV from the per-year values; finance keys broadcast like the other parameters
+    a = h2_finance.annual_factor(base)
+    diesel_tk = p["diesel_l_per_month"] * 12.0 * grid("diesel_price_tk_per_l")
+    finance = {k: grid(k) for k in h2_finance.FINANCE_DEFAULTS if k != "lifetime_years"}
+    finance["lifetime_years"] = p["lifetime_years"]
+    npv, _ = h2_finance.npv_lcoh(h2 * a, revenue_tk * a, grid("capex_usd"), grid("opex_usd_per_month") * 12.0,
+                                 grid("exchange_rate"), diesel_tk, finance)
+
+    shape = tuple(len(axes[n]) for n in names)
+    kpis = {"h2_kg": h2, "o2_kg": o2, "fuelcell_elec_mwh": fc_elec, "h2_to_refuel_kg": h2_refuel,
+            "revenue_usd": revenue_usd, "co2_avoided_kg": co2_avoided, "npv_usd": npv}
+    return {"axes": axes, "kpis": {k: np.broadcast_to(v, shape) for k, v in kpis.items()}}
+
+
+def to_frame(result, index=None):
+    """Flatten a sweep result to one row per combination (optionally only the flat `index` rows)."""
+    axes = result["axes"]
+    shape = tuple(len(v) for v in axes.values())
+    if index is None:
+        flat = np.arange(int(np.prod(shape)))
+    else:
+        index = np.asarray(index)
+        flat = np.flatnonzero(index) if index.dtype == bool else index
+    coords = np.unravel_index(flat, shape)
+    data = {name: values[c] for (name, values), c in zip(axes.items(), coords)}
+    data.update({k: np.ravel(v)[flat] for k, v in result["kpis"].items()})
+    return pd.DataFrame(data)
+
+
+def tornado(profile, params, ranges, kpi="revenue_usd"):
+    """One-at-a-time swing of `kpi` between each parameter's low and high value, largest first."""
+    p = {**h2_engine.DEFAULT_PARAMS, **h2_finance.FINANCE_DEFAULTS, **(params or {})}
+    base_value = float(sweep(profile, p, {})["kpis"][kpi])
+    rows = []
+    for name, values in ranges.items():
+        lo, hi = float(np.min(values)), float(np.max(values))
+        low_high = sweep(profile, p, {name: [lo, hi]})["kpis"][kpi]
+        rows.append({"param": name, "low": lo, "high": hi, "kpi_low": float(low_high[0]),
+                     "kpi_high": float(low_high[1]), "base": base_value})
+    out = pd.DataFrame(rows, columns=["param", "low", "high", "kpi_low", "kpi_high", "base"])
+    out["swing"] = (out["kpi_high"] - out["kpi_low"]).abs()
+    return out.sort_values("swing", ascending=False, ignore_index=True)
+
+
+def slice_2d(result, kpi, x, y, at=None):
+    """2-D slice of a KPI over params x, y; other swept axes are fixed at the value nearest to `at`."""
+    names = list(result["axes"])
+    at = at or {}
+    index = []
+    for name in names:
+        if name in (x, y):
+            index.append(slice(None))
+        else:
+            values = result["axes"][name]
+            target = at.get(name, values[len(values) // 2])
+            index.append(int(np.abs(values - target).argmin()))
+    z = result["kpis"][kpi][tuple(index)]
+    if names.index(x) < names.index(y):
+        z = z.T  # rows follow y, columns follow x
+    return z
+
+
+def pareto_front(a, b, maximize=(True, True)):
+    """Mask of points not dominated in (a, b); O(n log n) via a sort and a running max."""
+    a = np.ravel(a) * (1 if maximize[0] else -1)
+    b = np.ravel(b) * (1 if maximize[1] else -1)
+    order = np.lexsort((-b, -a))  # a descending, ties broken by b descending
+    best_b = np.maximum.accumulate(b[order])
+    prev = np.concatenate([[-np.inf], best_b[:-1]])
+    mask = np.zeros(a.size, dtype=bool)
+    mask[order] = b[order] > prev
+    return mask
@@ -0,0 +1,143 @@
+# h2_trace.py — per-rerun stage timings for the dashboards' timing panel (no Streamlit)
+#
+# An app creates a Trace at the top of a rerun and activates it; split(name) then closes the
+# section that ran since the previous split, and stage(name) times a nested block. The engine,
+# graph nodes, result store and ingest call stage() themselves, so a simulate section breaks down
+# into cache lookups, individual derived columns and the storage scan. With no active trace every
+# call is a no-op. The trace lives in a contextvar, so concurrent Streamlit sessions never mix.
+#
+# Payload sizes (figure JSON, styled-table HTML, frame memory) are measured only when the summary
+# is built. chrome_trace() exports the Trace Event Format read by chrome://tracing and Perfetto.
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+_current = contextvars.ContextVar("h2_trace", default=None)
+
+
+def payload_bytes(obj):
+    """Approximate bytes sent to the browser for a figure, styled table, frame, array or string."""
+    if obj is None:
+        return 0
+    if hasattr(obj, "to_plotly_json"):
+        return len(obj.to_json())
+    if hasattr(obj, "to_html") and hasattr(obj, "data"):  # pandas Styler
+        return len(obj.to_html())
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep=True).sum()) if isinstance(obj, pd.DataFrame) else int(obj.memory_usage(deep=True))
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    return 0
+
+
+class _Event:
+    __slots__ = ("name", "start", "dur", "depth", "objs")
+
+    def __init__(self, name, start, depth):
+        self.name = name
+        self.start = start
+        self.dur = 0.0
+        self.depth = depth
+        self.objs = []
+
+    def add(self, *objs):
+        """Count objs towards this stage's payload."""
+        self.objs.extend(objs)
+
+
+class _NullEvent:
+    def add(self, *objs):
+        pass
+
+
+_NULL = _NullEvent()
+
+
+class Trace:
+    """Sections (split) and nested stages (stage) of one rerun, relative to its creation."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.events = []
+        self._mark = self.t0
+        self._depth = 0
+        self._tid = threading.get_ident()
+
+    def split(self, name, *objs):
+        """Close the section that ran since the previous split (or the start)."""
+        now = time.perf_counter()
+        ev = _Event(name, self._mark - self.t0, 0)
+        ev.dur = now - self._mark
+        ev.add(*objs)
+        self.events.append(ev)
+        self._mark = now
+
+    @contextmanager
+    def stage(self, name):
+        self._depth += 1
+        ev = _Event(name, time.perf_counter() - self.t0, self._depth)
+        try:
+            yield ev
+        finally:
+            ev.dur = time.perf_counter() - self.t0 - ev.start
+            self._depth -= 1
+            self.events.append(ev)
+
+    def total(self):
+        return time.perf_counter() - self.t0
+
+    def _ordered(self):
+        # parents before children: by start time, longer (enclosing) spans first
+        return sorted(self.events, key=lambda e: (e.start, -e.dur, e.depth))
+
+    def summary(self):
+        """DataFrame of stages in time order: stage (indented), depth (0 = section), ms, share of the rerun, payload kB."""
+        total = max(self.total(), 1e-12)
+        # nested stages are indented with non-breaking spaces (tables strip leading blanks)
+        rows = [{"stage": ("\u00a0\u00a0" * (e.depth - 1) + "└ " if e.depth else "") + e.name,
+                 "depth": e.depth, "ms": e.dur * 1000.0, "share_pct": 100.0 * e.dur / total,
+                 "payload_kb": sum(payload_bytes(o) for o in e.objs) / 1024.0} for e in self._ordered()]
+        return pd.DataFrame(rows, columns=["stage", "depth", "ms", "share_pct", "payload_kb"])
+
+    def chrome_trace(self):
+        """JSON string in the Chrome Trace Event Format (complete "X" events, microseconds)."""
+        pid = os.getpid()
+        events = [{"name": e.name, "ph": "X", "ts": round(e.start * 1e6, 3), "dur": round(e.dur * 1e6, 3),
+                   "pid": pid, "tid": self._tid, "cat": "section" if e.depth == 0 else "stage",
+                   "args": {"payload_bytes": sum(payload_bytes(o) for o in e.objs)}} for e in self._ordered()]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+def activate(trace):
+    """Make trace the current one for this thread / context (None switches tracing off)."""
+    _current.set(trace)
+    return trace
+
+
+def current():
+    return _current.get()
+
+
+def split(name, *objs):
+    trace = _current.get()
+    if trace is not None:
+        trace.split(name, *objs)
+
+
+@contextmanager
+def stage(name):
+    """Time a block under the current trace; yields an event whose add(obj) records payload."""
+    trace = _current.get()
+    if trace is None:
+        yield _NULL
+        return
+    with trace.stage(name) as ev:
+        yield ev
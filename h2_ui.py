@@ -0,0 +1,206 @@
+# h2_ui.py — Streamlit pieces shared by H2app.py and designA_hydrogen_dashboard.py
+#
+# Profile source and loading (upload, or a path inside H2_DATA_DIR; timestamped files go through the
+# ingest cache), the project-finance sidebar block, paged tables, the saved-scenarios section and the
+# timing panel. The apps pass their model name (an h2_batch.MODELS key); per-model settings live in
+# MODEL_UI.
+
+import io
+import pathlib
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+import h2_batch
+import h2_engine
+import h2_finance
+import h2_ingest
+import h2_render
+import h2_store
+import h2_trace
+
+# per model: energy unit, H2 column and the saved-scenario comparison KPIs (label -> (h2_batch KPI, scale))
+MODEL_UI = {
+    "h2app": {
+        "unit": "MWh",
+        "h2_column": "h2_kg",
+        "kpis": {
+            "H₂ (kg/yr)": ("h2_kg_per_yr", 1.0),
+            "Curtailed H₂ (kg/yr)": ("curtailed_h2_kg_per_yr", 1.0),
+            "Revenue (USD/yr)": ("revenue_usd_per_yr", 1.0),
+            "CO₂ avoided, net (t/yr)": ("co2_avoided_t_per_yr", 1.0),
+            "NPV (USD)": ("npv_usd", 1.0),
+            "IRR (%)": ("irr", 100.0),
+            "LCOH (USD/kg)": ("lcoh_usd_per_kg", 1.0),
+            "Payback (years)": ("payback_years", 1.0),
+        },
+    },
+    "design_a": {
+        "unit": "kWh",
+        "h2_column": "mH2_kg",
+        "kpis": {
+            "H₂ (kg/yr)": ("h2_kg_per_yr", 1.0),
+            "O₂ revenue (USD/yr)": ("o2_revenue_usd_per_yr", 1.0),
+            "Revenue (USD/yr)": ("revenue_usd_per_yr", 1.0),
+            "Grid import (kWh/yr)": ("grid_import_mwh_per_yr", 1000.0),
+            "NPV (USD)": ("npv_usd", 1.0),
+            "IRR (%)": ("irr", 100.0),
+            "LCOH (USD/kg)": ("lcoh_usd_per_kg", 1.0),
+            "Payback (years)": ("payback_years", 1.0),
+        },
+    },
+}
+
+
+@st.cache_data(show_spinner=False)
+def load_profile_csv(data):
+    return pd.read_csv(io.BytesIO(data))
+
+
+def profile_source(model):
+    """Sidebar profile inputs: (uploaded file or server path or None, resample frequency)."""
+    solar, demand = h2_batch.MODELS[model]["columns"]
+    unit = MODEL_UI[model]["unit"]
+    st.sidebar.markdown(f"Upload CSV (optional): columns 'month','{solar}','{demand}' (12 rows), "
+                        f"or 'timestamp','{solar}','{demand}' (hourly / 15-min {unit} per step)")
+    uploaded = st.sidebar.file_uploader("Profile CSV", type=["csv"])
+    # server-side files only from the configured data directory (H2_DATA_DIR); hidden otherwise
+    server_csv = (st.sidebar.text_input(f"…or CSV path in {h2_ingest.DATA_DIR} (large timestamped files are streamed and cached)",
+                                        value="") if h2_ingest.DATA_DIR else "")
+    freq = st.sidebar.selectbox("Time step for timestamped profiles", ["h", "15min"], index=0)
+    return server_csv.strip() or uploaded, freq
+
+
+def read_profile(source, model, freq):
+    """Profile frame from an uploaded file or server path (monthly CSV, or timestamped via the ingest cache)."""
+    columns = h2_batch.MODELS[model]["columns"]
+    if isinstance(source, str):
+        source = h2_ingest.resolve_data_path(source)
+    if "timestamp" in h2_ingest.read_header(source):
+        # streamed, validated and resampled into the float32 memmap cache; reopened zero-copy
+        with st.spinner("Ingesting profile…"):
+            return h2_ingest.ingest_csv(source, {c: c for c in columns}, freq=freq)
+    df = load_profile_csv(source.getvalue() if hasattr(source, "getvalue") else pathlib.Path(source).read_bytes())
+    if not set(["month"] + columns).issubset(df.columns):
+        raise ValueError(f"CSV must contain 'month' or 'timestamp', '{columns[0]}','{columns[1]}' columns.")
+    return df[["month"] + columns]
+
+
+def load_profile(source, model, freq):
+    """read_profile() for the sidebar source; ingest problems are warned about, errors stop the rerun."""
+    try:
+        profile = read_profile(source, model, freq)
+    except (OSError, ValueError) as exc:
+        st.error(str(exc))
+        st.stop()
+    meta = profile.attrs.get("ingest")
+    if meta and (meta["rows_dropped"] or meta["missing_steps"]):
+        st.sidebar.warning(f"{meta['rows_dropped']} invalid rows dropped, {meta['missing_steps']} missing steps filled with 0")
+    return profile
+
+
+def finance_sidebar():
+    """Project-finance inputs (h2_finance.FINANCE_DEFAULTS keys) from the sidebar."""
+    fin = h2_finance.FINANCE_DEFAULTS
+    return {
+        "lifetime_years": st.sidebar.slider("Project lifetime (years)", 20, 30, fin["lifetime_years"]),
+        "discount_rate": st.sidebar.number_input("Discount rate (%)", value=fin["discount_rate"] * 100, step=0.5) / 100.0,
+        "stack_degradation_per_yr": st.sidebar.number_input("Stack degradation (%/yr)", value=fin["stack_degradation_per_yr"] * 100, step=0.1) / 100.0,
+        "stack_life_years": st.sidebar.number_input("Stack replacement every (years)", min_value=1, value=fin["stack_life_years"], step=1),
+        "stack_replacement_usd": st.sidebar.number_input("Stack replacement cost (USD)", value=fin["stack_replacement_usd"], step=10000.0),
+        "solar_degradation_per_yr": st.sidebar.number_input("Solar degradation (%/yr)", value=fin["solar_degradation_per_yr"] * 100, step=0.1) / 100.0,
+        "price_escalation_per_yr": st.sidebar.number_input("Tk price escalation (%/yr)", value=fin["price_escalation_per_yr"] * 100, step=0.5) / 100.0,
+        "opex_escalation_per_yr": st.sidebar.number_input("OPEX escalation (%/yr)", value=fin["opex_escalation_per_yr"] * 100, step=0.5) / 100.0,
+        "fx_drift_per_yr": st.sidebar.number_input("BDT per USD drift (%/yr)", value=fin["fx_drift_per_yr"] * 100, step=0.5) / 100.0,
+    }
+
+
+def paged_table(frame, formats, key):
+    """Show one page of frame; only the visible rows go through the Styler."""
+    if len(frame) > h2_render.PAGE_SIZES[0]:
+        p1, p2 = st.columns((1, 3))
+        size = p1.selectbox("Rows per page", h2_render.PAGE_SIZES, index=1, key=f"{key}_page_size")
+        pages = h2_render.page_count(len(frame), size)
+        number = p2.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+        frame = h2_render.page(frame, number, size)
+    with h2_trace.stage(f"table: {key}") as ev:
+        styled = frame.style.format(formats)
+        st.dataframe(styled)
+        ev.add(styled)
+
+
+def scenario_kpis(model, frame, params):
+    """Comparison KPIs of a simulated frame (h2_batch.summarize; a stored frame needs no re-simulation)."""
+    k = h2_batch.summarize(model, frame, params)
+    return {label: k[name] * scale for label, (name, scale) in MODEL_UI[model]["kpis"].items()}
+
+
+def saved_scenarios(model, profile, params, frame, finance, source, extra=None):
+    """Save the current result under a name and compare saved scenarios of the same model.
+
+    extra holds project inputs outside params (e.g. CAPEX / OPEX); they are stored with the scenario."""
+    st.markdown("---")
+    st.subheader("Saved scenarios")
+    store = h2_store.default_store()
+    if store is None:
+        st.caption("The result store is disabled (H2_STORE=0).")
+        return
+    simulate = h2_batch.MODELS[model]["simulate"]
+    extra = dict(extra or {})
+    # saving writes the current result to the store (if it is not there yet) and names it, which keeps it from eviction
+    s1, s2 = st.columns((3, 1))
+    scenario_name = s1.text_input("Name for the current scenario", key="scenario_name").strip()
+    if s2.button("Save current scenario", disabled=not scenario_name):
+        meta = {"finance": finance, **extra, "profile": getattr(source, "name", source) or "demo"}
+        if store.save(simulate.persist(profile, params), scenario_name, meta):
+            st.success(f"Saved “{scenario_name}”.")
+        else:
+            st.warning("The result store could not save this scenario (see the server log).")
+    saved = store.saved(simulate.__name__)
+    labels = [f"{r['name']} — {r['created']:%Y-%m-%d %H:%M}" for _, r in saved.iterrows()]
+    picked = st.multiselect("Compare saved scenarios with the current one", labels, key="compare_saved")
+    if picked:
+        input_cols = {"Current": {**params, **finance, **extra}}
+        kpi_cols = {"Current": scenario_kpis(model, frame, input_cols["Current"])}
+        monthly = {"Current": h2_engine.rollup(frame)}
+        for label in picked:
+            row = saved.iloc[labels.index(label)]
+            stored = store.get(row["key"])
+            if stored is None:
+                st.warning(f"The stored result of “{row['name']}” is missing.")
+                continue
+            meta = row["meta"]
+            input_cols[label] = {**row["params"], **meta["finance"], **{k: meta[k] for k in extra if k in meta}}
+            kpi_cols[label] = scenario_kpis(model, stored, input_cols[label])
+            monthly[label] = h2_engine.rollup(stored)
+        st.dataframe(pd.DataFrame(kpi_cols).style.format("{:,.2f}", na_rep="n/a"))
+        inputs = pd.DataFrame(input_cols).astype(str)
+        st.markdown("Inputs that differ")
+        st.dataframe(inputs[inputs.nunique(axis=1) > 1])
+        h2_col = MODEL_UI[model]["h2_column"]
+        fig_cmp = go.Figure()
+        for label, m in monthly.items():
+            fig_cmp.add_trace(go.Bar(name=label, x=m["month"], y=m[h2_col]))
+        fig_cmp.update_layout(barmode="group", height=360, yaxis_title="H₂ (kg/month)")
+        st.plotly_chart(fig_cmp, use_container_width=True)
+    count, size, _ = store.usage()
+    st.caption(f"Result store: {count:,} results, {size / (1 << 20):,.1f} MB of {store.max_bytes / (1 << 20):,.0f} MB. "
+               "Saved scenarios reopen from disk without re-simulation; unnamed results are evicted oldest-first.")
+
+
+def timing_panel(trace, file_name):
+    """Per-stage wall time and payload of this rerun, plus the trace as a download."""
+    st.markdown("---")
+    st.subheader("Timing (this rerun)")
+    summary = trace.summary()
+    sections = summary[summary["depth"] == 0]
+    fig_t = go.Figure(go.Bar(x=sections["ms"], y=sections["stage"], orientation="h", marker_color="slategray"))
+    fig_t.update_layout(height=max(240, 28 * len(sections)), xaxis_title="ms", yaxis=dict(autorange="reversed"))
+    st.plotly_chart(fig_t, use_container_width=True)
+    st.dataframe(summary.drop(columns="depth").style.format({"ms": "{:,.1f}", "share_pct": "{:.1f}", "payload_kb": "{:,.1f}"}),
+                 hide_index=True)
+    st.download_button("Download trace (Chrome trace JSON)", trace.chrome_trace(), file_name=file_name,
+                       mime="application/json")
+    st.caption(f"Rerun total {trace.total() * 1000:,.0f} ms up to this panel. Payload = figure JSON, styled-table HTML. "
+               "Open the trace in chrome://tracing or ui.perfetto.dev.")
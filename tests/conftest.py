@@ -0,0 +1,7 @@
+# Tests import the top-level h2_* modules; run from the repository root with python -m pytest.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# keep test runs out of the shared on-disk result store
+os.environ.setdefault("H2_STORE", "0")
@@ -0,0 +1,148 @@
+import asyncio
+import contextlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import h2_api
+import h2_ingest
+
+
+def serving(client, workers=1):
+    # run client(port) against serve() on a free port, then stop the server
+    async def main():
+        started = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(h2_api.serve(port=0, workers=workers, ready=started.set_result))
+        await asyncio.wait([started, task], return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            task.result()
+        port = started.result().sockets[0].getsockname()[1]
+        try:
+            return await client(port)
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    return asyncio.run(main())
+
+
+async def request(port, method="GET", path="/health", body=None, raw=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    if raw is None:
+        data = b"" if body is None else json.dumps(body).encode()
+        raw = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(payload)
+
+
+def test_routes_and_bad_requests():
+    async def client(port):
+        status, health = await request(port)
+        assert status == 200 and health["status"] == "ok" and health["computed"] == 0
+        status, models = await request(port, path="/models")
+        assert status == 200 and set(models["models"]) == {"h2app", "design_a"} and "discount_rate" in models["finance"]
+        assert (await request(port, path="/nowhere"))[0] == 404
+        assert (await request(port, "POST", "/run", body=[]))[0] == 400
+        assert (await request(port, "POST", "/run", raw=b"POST /run HTTP/1.1\r\nContent-Length: 5\r\n\r\n{nope"))[0] == 400
+        assert (await request(port, raw=b"GARBAGE\r\n\r\n")) == (400, {"error": "malformed request line"})
+        assert (await request(port, raw=b"GET /health HTTP/1.1\r\nContent-Length: x\r\n\r\n"))[0] == 400
+        assert (await request(port, raw=b"GET /health HTTP/1.1\r\nContent-Length: -3\r\n\r\n"))[0] == 400
+        too_big = f"POST /run HTTP/1.1\r\nContent-Length: {h2_api.MAX_BODY_BYTES + 1}\r\n\r\n".encode()
+        assert (await request(port, raw=too_big))[0] == 413
+        # the server is still up after all of that
+        assert (await request(port))[0] == 200
+    serving(client)
+
+
+def test_run_dedups_identical_scenarios():
+    scenario = {"profile": "demo", "params": {"tank_max_kg": 5000.0}}
+
+    async def client(port):
+        status, body = await request(port, "POST", "/run", body=[{**scenario, "name": "a"}, {**scenario, "name": "b"},
+                                                                 {"name": "c", "profile": "demo"}])
+        assert status == 200
+        rows = body["results"]
+        assert [r["scenario"] for r in rows] == ["a", "b", "c"]
+        assert rows[0]["h2_kg_per_yr"] == rows[1]["h2_kg_per_yr"] > 0 and not rows[0].get("error")
+        health = (await request(port))[1]
+        assert health["scenarios"] == 3 and health["computed"] == 2
+    serving(client)
+
+
+def batch(groups, workers=2):
+    # submit every list in groups concurrently to one Batcher (with the calls fixture's _run_group)
+    async def main():
+        with ThreadPoolExecutor(workers) as executor:
+            batcher = h2_api.Batcher(executor, workers, window=0.2)
+            runner = asyncio.create_task(batcher.run())
+            try:
+                results = await asyncio.gather(*(batcher.submit(g) for g in groups))
+            finally:
+                runner.cancel()
+        return results, batcher.stats
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def run_group(items):
+        calls.append([s["name"] for s in items])
+        if any(s.get("params", {}).get("fail") for s in items):
+            raise RuntimeError("worker died")
+        return [{"scenario": s["name"], "profile": s["profile"], "model": s.get("model", "h2app")} for s in items]
+
+    monkeypatch.setattr(h2_api, "_run_group", run_group)
+    return calls
+
+
+def test_batcher_dedups_by_scenario_without_the_name(calls):
+    a = {"profile": "demo", "params": {"tank_max_kg": 1.0}}
+    results, stats = batch([[{**a, "name": "first"}], [{**a, "name": "second"}, {**a, "name": "third"}]])
+    assert [[r["scenario"] for r in rows] for rows in results] == [["first"], ["second", "third"]]
+    assert stats == {"requests": 2, "scenarios": 3, "computed": 1, "batches": 1}
+    assert calls == [["first"]]
+
+
+def test_batcher_groups_by_model_profile_and_freq(calls):
+    scenarios = [{"name": "a1", "profile": "a.csv"}, {"name": "b1", "profile": "b.csv"},
+                 {"name": "a2", "profile": "a.csv", "params": {"x": 1}},
+                 {"name": "a3", "profile": "a.csv", "freq": "15min"},
+                 {"name": "a4", "profile": "a.csv", "model": "design_a"}]
+    results, stats = batch([[s] for s in scenarios], workers=8)
+    assert [rows[0]["scenario"] for rows in results] == [s["name"] for s in scenarios]
+    assert stats["computed"] == 5 and stats["batches"] == 1
+    assert sorted(calls) == [["a1", "a2"], ["a3"], ["a4"], ["b1"]]
+
+
+def test_batcher_isolates_failed_chunks(calls):
+    scenarios = [{"name": "ok", "profile": "a.csv"}, {"name": "bad", "profile": "b.csv", "params": {"fail": 1}}]
+    results, _ = batch([scenarios])
+    ok, bad = results[0]
+    assert ok == {"scenario": "ok", "profile": "a.csv", "model": "h2app"}
+    assert bad["scenario"] == "bad" and bad["error"] == "RuntimeError: worker died"
+
+
+def test_scenario_paths_stay_inside_the_data_dir(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "site.csv").write_text("month,solar_mwh,demand_mwh\n")
+    (tmp_path / "outside.csv").write_text("month,solar_mwh,demand_mwh\n")
+    monkeypatch.setattr(h2_ingest, "DATA_DIR", "")
+    with pytest.raises(ValueError, match="disabled"):
+        h2_api._scenarios(b'{"profile": "site.csv"}')
+    monkeypatch.setattr(h2_ingest, "DATA_DIR", str(data))
+    s = h2_api._scenarios(b'[{"profile": "site.csv", "_base_dir": "/"}, {"profile": "demo"}]')
+    assert s[0]["profile"] == str((data / "site.csv").resolve()) and "_base_dir" not in s[0]
+    assert [x["name"] for x in s] == ["scenario_1", "scenario_2"] and s[1]["profile"] == "demo"
+    for bad in ["../outside.csv", str(tmp_path / "outside.csv")]:
+        with pytest.raises(ValueError, match="inside"):
+            h2_api._scenarios(json.dumps({"profile": bad}).encode())
+    with pytest.raises(ValueError, match="timeseries"):
+        h2_api._scenarios(b'{"profile": "demo", "timeseries": "yearly"}')
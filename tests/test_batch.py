@@ -0,0 +1,70 @@
+import json
+
+import pandas as pd
+import pytest
+
+import h2_batch
+import h2_engine
+import h2_finance
+
+
+def test_split_params_rejects_unknown_keys():
+    with pytest.raises(ValueError, match="tank_size"):
+        h2_batch.split_params("h2app", {"tank_size": 1.0})
+
+
+def test_split_params_keeps_finance_out_of_the_simulation():
+    sim, full = h2_batch.split_params("h2app", {"tank_max_kg": 5000.0, "discount_rate": 0.1})
+    assert sim == {"tank_max_kg": 5000.0}
+    assert full["discount_rate"] == 0.1 and full["exchange_rate"] == h2_batch.MODELS["h2app"]["defaults"]["exchange_rate"]
+
+
+def test_run_batch_writes_kpis_and_series(tmp_path):
+    path = tmp_path / "scenarios.json"
+    path.write_text(json.dumps([{"name": "base", "profile": "demo"},
+                                {"name": "design", "model": "design_a", "profile": "demo"}]))
+    scenarios = h2_batch.load_scenarios([str(path)])
+    kpis = h2_batch.run_batch(scenarios, str(tmp_path / "out"), fmt="csv", timeseries="monthly", workers=1)
+    assert list(kpis["scenario"]) == ["base", "design"]
+    assert (kpis["h2_kg_per_yr"] > 0).all()
+    assert len(pd.read_csv(tmp_path / "out" / "timeseries" / "base.csv")) == 12
+    assert (tmp_path / "out" / "kpis.csv").exists()
+
+
+@pytest.mark.parametrize("params", [
+    {"electrolyzer_eff": "x"},
+    {"electrolyzer_eff": None},
+    {"electrolyzer_eff": float("nan")},
+    {"tank_max_kg": True},
+    {"use_grid_for_electrolysis": "no"},
+    {"lifetime_years": 2.5},
+])
+def test_split_params_rejects_non_numbers(params):
+    with pytest.raises(ValueError):
+        h2_batch.split_params("h2app", params)
+
+
+def test_split_params_accepts_numbers():
+    sim, full = h2_batch.split_params("h2app", {"tank_max_kg": float("inf"), "electrolyzer_eff": 1,
+                                                "use_grid_for_electrolysis": False, "lifetime_years": 20.0})
+    assert sim == {"tank_max_kg": float("inf"), "electrolyzer_eff": 1, "use_grid_for_electrolysis": False}
+    assert full["lifetime_years"] == 20 and isinstance(full["lifetime_years"], int)
+
+
+def test_bad_scenario_does_not_stop_the_batch(tmp_path):
+    scenarios = [{"name": "bad", "profile": "demo", "params": {"electrolyzer_eff": "x"}},
+                 {"name": "good", "profile": "demo", "params": {"tank_max_kg": 5000}}]
+    kpis = h2_batch.run_batch(scenarios, str(tmp_path), fmt="csv", timeseries="none", workers=1)
+    assert list(kpis["scenario"]) == ["bad", "good"]
+    assert "electrolyzer_eff" in kpis.loc[0, "error"]
+    assert pd.isna(kpis.loc[1, "error"]) or kpis.loc[1, "error"] == ""
+    assert kpis.loc[1, "h2_kg_per_yr"] > 0
+    assert (tmp_path / "kpis.csv").exists()
+
+
+def test_summarize_reports_net_co2():
+    frame = h2_batch.MODELS["h2app"]["simulate"](h2_engine.demo_profile(), {"fuelcell_mw": 0.01})
+    net = (frame["co2_avoided_from_export_kg"] + frame["co2_avoided_from_diesel_kg"]
+           + frame["co2_avoided_from_fuelcell_kg"] - frame["co2_from_grid_electrolysis_kg"]).sum()
+    k = h2_batch.summarize("h2app", frame)
+    assert k["co2_avoided_t_per_yr"] == pytest.approx(net * h2_finance.annual_factor(frame) / 1000.0)
@@ -0,0 +1,25 @@
+import os
+
+import pandas as pd
+
+import h2_bench
+import h2_store
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    results = pd.DataFrame({"scale": ["s"] * 4, "case": ["fast", "slow", "noise", "memory"],
+                            "median_s": [0.9, 2.0, 0.0015, 1.0], "peak_mb": [10.0, 10.0, 0.1, 20.0]})
+    baseline = [{"scale": "s", "case": c, "median_s": t, "peak_mb": m}
+                for c, t, m in [("fast", 1.0, 10.0), ("slow", 1.0, 10.0), ("noise", 0.001, 0.1), ("memory", 1.0, 10.0)]]
+    out = h2_bench.compare(results, baseline, tolerance=0.25).set_index("case")
+    assert out["regression"].to_dict() == {"fast": False, "slow": True, "noise": False, "memory": True}
+    assert out.loc["slow", "time_ratio"] == 2.0 and pd.isna(out.loc["noise", "memory_ratio"])
+
+
+def test_run_suite_restores_the_store(monkeypatch):
+    monkeypatch.setenv("H2_STORE", "0")
+    before = h2_store._default
+    results = h2_bench.run_suite(["12-row"], repeat=1, match="rollup")
+    assert list(results["case"].str.contains("rollup", case=False)) == [True] * len(results) and len(results)
+    assert (results["steps"] == 12).all() and (results["median_s"] >= 0).all()
+    assert os.environ["H2_STORE"] == "0" and h2_store._default is before
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_engine
+import h2_ingest
+
+
+def test_memoized_hands_out_copies():
+    profile = h2_engine.demo_profile(90.0)
+    first = h2_engine.simulate(profile, {"oxygen_price_tk_per_kg": 12.0})
+    first["h2_kg"] = 0.0
+    again = h2_engine.simulate(profile, {"oxygen_price_tk_per_kg": 12.0})
+    assert again["h2_kg"].sum() > 0
+    dearer = h2_engine.simulate(profile, {"oxygen_price_tk_per_kg": 24.0})
+    np.testing.assert_allclose(dearer["o2_revenue_tk"], 2 * again["o2_revenue_tk"])
+
+
+def test_profile_key_follows_values():
+    a, b = h2_engine.demo_profile(80.0), h2_engine.demo_profile(80.0)
+    assert h2_engine.profile_key(a) == h2_engine.profile_key(b)
+    assert h2_engine.profile_key(a) != h2_engine.profile_key(h2_engine.demo_profile(81.0))
+
+
+def hourly_profile(path, hours=24 * 40):
+    ts = pd.date_range("2024-01-01", periods=hours, freq="h")
+    solar = np.maximum(0, np.sin((ts.hour.to_numpy() - 6) / 12 * np.pi)) * 0.5
+    pd.DataFrame({"timestamp": ts, "solar_mwh": solar, "demand_mwh": 0.15}).to_csv(path, index=False)
+
+
+def test_profile_key_ignores_stale_ingest_attrs(tmp_path):
+    hourly_profile(tmp_path / "p.csv")
+    prof = h2_ingest.ingest_csv(str(tmp_path / "p.csv"), {"solar_mwh": "solar_mwh", "demand_mwh": "demand_mwh"},
+                                cache_dir=str(tmp_path / "cache"))
+    key = h2_engine.profile_key(prof)
+    assert h2_engine.profile_key(prof.copy(deep=False)) == key
+    assert h2_engine.profile_key(h2_ingest.open_cache(str(tmp_path / "cache" / prof.attrs["ingest"]["key"] / "meta.json"))) == key
+    tripled = prof.assign(solar_mwh=prof["solar_mwh"] * 3)
+    assert tripled.attrs.get("ingest")  # pandas carries attrs along
+    assert h2_engine.profile_key(tripled) != key
+    assert h2_engine.simulate(tripled, {})["h2_kg"].sum() > h2_engine.simulate(prof, {})["h2_kg"].sum()
+    # a deep copy is hashed by value
+    copied = prof.copy()
+    assert h2_engine.profile_key(copied) == h2_engine.profile_key(copied.copy())
+    np.testing.assert_allclose(h2_engine.simulate(copied, {})["h2_kg"], h2_engine.simulate(prof, {})["h2_kg"])
+
+
+def test_cache_bounded_by_bytes():
+    cache = h2_engine.LRUCache(maxsize=100, max_bytes=250, sizeof=len)
+    for i in range(10):
+        cache.put(i, "x" * 100)
+    assert len(cache) == 2 and cache.nbytes == 200
+    cache.put("big", "x" * 1000)  # the newest entry is kept even above the budget
+    assert len(cache) == 1 and cache.get("big")
+
+
+def test_design_a_uses_only_delivered_h2():
+    # fuel cell and refuelling ask for more than the electrolyzer makes, so the tank runs dry
+    p = {"fraction_h2_to_fuelcell": 0.6, "fraction_h2_to_refuel": 0.7, "h2_sale_price_tk_per_kg": 300.0}
+    df = h2_engine.simulate_design_a(h2_engine.demo_profile_design_a(), p)
+    q = {**h2_engine.DESIGN_A_DEFAULTS, **p}
+    assert df["unmet_fuelcell_h2_kg"].sum() > 0 and df["unmet_refuel_h2_kg"].sum() > 0
+    np.testing.assert_allclose(df["fuelcell_elec_kwh"], (df["h2_for_fuelcell_kg"] - df["unmet_fuelcell_h2_kg"])
+                               * q["h2_LHV_kwh_per_kg"] * q["fuelcell_eff"])
+    np.testing.assert_allclose(df["h2_revenue_tk"], (df["h2_to_refuel_kg"] - df["unmet_refuel_h2_kg"]) * 300.0)
+    # delivered H2 is what the tank gave out
+    delivered = df["monthly_h2_output_kg"] - df["unmet_fuelcell_h2_kg"] - df["unmet_refuel_h2_kg"]
+    assert delivered.sum() == pytest.approx(q["initial_h2_storage_kg"] + df["mH2_kg"].sum() - df["stored_h2_kg"].iloc[-1])
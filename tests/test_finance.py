@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import h2_finance
+
+
+def test_irr_known_rates():
+    # -100 now and 110 in a year -> 10 %; 60 / 1.2 + 72 / 1.2**2 = 100 -> 20 %
+    flows = np.array([[-100.0, 110.0, 0.0], [-100.0, 60.0, 72.0]])
+    np.testing.assert_allclose(h2_finance.irr(flows), [0.10, 0.20], atol=1e-6)
+
+
+def test_irr_no_sign_change_is_nan():
+    assert np.isnan(h2_finance.irr(np.array([100.0, 10.0, 10.0])))
+    assert np.isnan(h2_finance.irr(np.array([-100.0, -10.0])))
+
+
+def test_irr_zeroes_npv():
+    rng = np.random.default_rng(1)
+    flows = np.concatenate([-rng.uniform(50, 150, (20, 1)), rng.uniform(5, 40, (20, 15))], axis=-1)
+    r = h2_finance.irr(flows)
+    t = np.arange(flows.shape[-1])
+    np.testing.assert_allclose((flows * (1 + r[:, None]) ** -t).sum(axis=-1), 0.0, atol=1e-6)
+
+
+@pytest.mark.parametrize("cumulative, years", [
+    ([-100.0, -50.0, 0.0, 50.0], 2.0),
+    ([-100.0, -50.0, 50.0], 1.5),
+    ([0.0, 10.0], 0.0),
+    ([-100.0, -60.0, -20.0], np.nan),
+])
+def test_payback(cumulative, years):
+    np.testing.assert_allclose(h2_finance.payback(np.array(cumulative)), years)
+
+
+def test_lifetime_matches_scalar_npv():
+    life = h2_finance.lifetime(1000.0, 2_000_000.0, 100_000.0, 1000.0, 114.0)
+    npv, _ = h2_finance.npv_lcoh(1000.0, 2_000_000.0, 100_000.0, 1000.0, 114.0)
+    np.testing.assert_allclose(life["npv_usd"], npv)
+    assert life["cashflow_usd"][0] == -100_000.0
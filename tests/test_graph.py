@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_engine
+import h2_graph
+
+
+def session(profile):
+    # a fresh session, as h2_engine.simulate_session builds it
+    df, month_share = h2_engine.base_frame(profile, ["solar_mwh", "demand_mwh"])
+    sources = {"solar_mwh": df["solar_mwh"].to_numpy(dtype=float), "demand_mwh": df["demand_mwh"].to_numpy(dtype=float),
+               "_step_h": h2_engine.step_hours(df), "_month_share": month_share}
+    return h2_graph.Session(h2_engine.SIMULATE_GRAPH, df, sources)
+
+
+def hourly():
+    ts = pd.date_range("2024-01-01", periods=24 * 20, freq="h")
+    solar = np.maximum(0, np.sin((ts.hour.to_numpy() - 6) / 12 * np.pi)) * 0.5
+    return pd.DataFrame({"timestamp": ts, "solar_mwh": solar, "demand_mwh": 0.15})
+
+
+@pytest.mark.parametrize("profile", [h2_engine.demo_profile(), hourly()], ids=["monthly", "hourly"])
+def test_updates_match_a_fresh_session(profile):
+    steps = [{}, {"oxygen_price_tk_per_kg": 12.0}, {"oxygen_price_tk_per_kg": 12.0, "tank_max_kg": 200.0},
+             {"tank_max_kg": 200.0, "fuelcell_mw": 0.02}, {"solar_frac_for_electrolysis": 0.5}, {}]
+    s = session(profile)
+    for extra in steps:
+        params = {**h2_engine.DEFAULT_PARAMS, **extra}
+        pd.testing.assert_frame_equal(s.frame(params), session(profile).frame(params))
+        pd.testing.assert_frame_equal(s.frame(params), h2_engine.simulate(profile, extra), check_exact=False)
+
+
+def test_only_downstream_nodes_recompute():
+    s = session(h2_engine.demo_profile())
+    s.update(h2_engine.DEFAULT_PARAMS)
+    assert s.update(h2_engine.DEFAULT_PARAMS) == []
+    done = s.update({**h2_engine.DEFAULT_PARAMS, "oxygen_price_tk_per_kg": 12.0})
+    assert done == ["o2_revenue_tk", "monthly_revenue_tk", "monthly_revenue_usd"]
+    done = s.update({**h2_engine.DEFAULT_PARAMS, "oxygen_price_tk_per_kg": 12.0, "tank_max_kg": 500.0})
+    assert "stored_h2_kg" in done and "fuelcell_elec_mwh" in done and "co2_avoided_from_fuelcell_kg" in done
+    assert "h2_kg" not in done and "o2_revenue_tk" not in done and "co2_from_grid_import_kg" not in done
+
+
+def test_same():
+    assert h2_graph._same(1.0, 1.0) and h2_graph._same(float("nan"), float("nan"))
+    assert not h2_graph._same(1.0, 2.0) and not h2_graph._same(1.0, float("nan"))
+    assert h2_graph._same(np.array([1.0, np.nan]), np.array([1.0, np.nan]))
+    assert not h2_graph._same(np.array([1.0, 2.0]), np.array([1.0, 3.0]))
+    assert not h2_graph._same(np.array([1.0, 1.0]), np.array([1.0]))
+    assert not h2_graph._same(np.array([1.0]), 1.0) and not h2_graph._same(1.0, np.array([1.0]))
+    assert h2_graph._same(True, True) and not h2_graph._same(True, False)
+
+
+def test_graph_rejects_bad_declarations():
+    g = h2_graph.Graph()
+    g.add("b", ["a"], lambda a: a + 1)
+    with pytest.raises(ValueError, match="declared twice"):
+        g.add("b", ["a"], lambda a: a)
+    with pytest.raises(ValueError, match="before the node"):
+        g.add("a", ["x"], lambda x: x)
+    g.add(("c", "d"), ["b"], lambda b: (b, -b))
+    assert g.leaves == {"a"} and g.outputs == ["b", "c", "d"]
+    assert g.downstream(["b"]) == [1]
@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_ingest
+
+
+def readings(n=500, seed=0):
+    # irregular sub-hourly readings with a gap of several hours
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp("2024-03-01") + pd.to_timedelta(np.cumsum(rng.integers(1, 20, n)), unit="min")
+    ts = ts.where(ts < pd.Timestamp("2024-03-02 06:00"), ts + pd.Timedelta(hours=5))
+    return pd.DataFrame({"timestamp": ts, "pv": rng.random(n), "load": rng.random(n)})
+
+
+def expected(df, freq="h"):
+    return df.set_index("timestamp")[["pv", "load"]].resample(freq).sum()
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 10_000])
+def test_resampler_across_chunks(chunk):
+    df = readings()
+    r = h2_ingest._Resampler("h", ["pv", "load"])
+    parts = [r.feed(pd.DatetimeIndex(c["timestamp"]), c[["pv", "load"]].to_numpy())
+             for _, c in df.groupby(np.arange(len(df)) // chunk)]
+    got = np.vstack(parts + [r.close()])
+    want = expected(df)
+    assert r.start == want.index[0]
+    np.testing.assert_allclose(got, want.to_numpy(), atol=1e-12)
+    # hours without any reading are emitted as zeros and counted
+    assert r.missing_steps == len(want.index.difference(df["timestamp"].dt.floor("h")))
+    assert r.missing_steps >= 4
+
+
+def test_resampler_rejects_unsorted():
+    r = h2_ingest._Resampler("h", ["x"])
+    r.feed(pd.DatetimeIndex(["2024-01-01 02:00"]), np.ones((1, 1)))
+    with pytest.raises(ValueError):
+        r.feed(pd.DatetimeIndex(["2024-01-01 01:00"]), np.ones((1, 1)))
+
+
+def test_ingest_csv_matches_pandas(tmp_path):
+    df = readings(2000, seed=3)
+    path = tmp_path / "site.csv"
+    df.to_csv(path, index=False)
+    prof = h2_ingest.ingest_csv(str(path), {"solar_mwh": "pv", "demand_mwh": ["load", "pv"]},
+                                cache_dir=str(tmp_path / "cache"), chunksize=97)
+    want = expected(df)
+    assert (prof["timestamp"].to_numpy() == want.index.to_numpy()).all()
+    np.testing.assert_allclose(prof["solar_mwh"], want["pv"], rtol=1e-6)
+    np.testing.assert_allclose(prof["demand_mwh"], want["load"] + want["pv"], rtol=1e-6)
+    # second call reopens the cache
+    again = h2_ingest.ingest_csv(str(path), {"solar_mwh": "pv", "demand_mwh": ["load", "pv"]},
+                                 cache_dir=str(tmp_path / "cache"))
+    assert again.attrs["ingest"]["key"] == prof.attrs["ingest"]["key"]
+
+
+def test_concurrent_ingests_keep_one_complete_cache(tmp_path, monkeypatch):
+    df = readings(300, seed=5)
+    path = tmp_path / "site.csv"
+    df.to_csv(path, index=False)
+    # both ingests are past the "already cached?" check before either publishes
+    barrier, write = threading.Barrier(2, timeout=30), h2_ingest._write
+    waited = set()
+
+    def synced_write(files, rows):
+        if threading.get_ident() not in waited:
+            waited.add(threading.get_ident())
+            barrier.wait()
+        write(files, rows)
+
+    monkeypatch.setattr(h2_ingest, "_write", synced_write)
+    results, errors = [], []
+
+    def run():
+        try:
+            prof = h2_ingest.ingest_csv(str(path), {"solar_mwh": "pv", "demand_mwh": "load"}, cache_dir=str(tmp_path / "cache"))
+            results.append(np.asarray(prof["solar_mwh"]).copy())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and len(results) == 2
+    np.testing.assert_array_equal(results[0], results[1])
+    # one published cache directory; the loser's temporary copy is gone
+    assert len(list((tmp_path / "cache").iterdir())) == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_engine
+import h2_montecarlo
+
+
+def hourly():
+    ts = pd.date_range("2024-01-01", periods=24 * 60, freq="h")
+    solar = np.maximum(0, np.sin((ts.hour.to_numpy() - 6) / 12 * np.pi)) * 0.5
+    return pd.DataFrame({"timestamp": ts, "solar_mwh": solar, "demand_mwh": 0.15})
+
+
+def net_co2(frame):
+    # export + diesel + fuel cell, less grid power drawn for electrolysis, from simulate's own columns
+    return (frame["co2_avoided_from_export_kg"] + frame["co2_avoided_from_diesel_kg"]
+            + frame["co2_avoided_from_fuelcell_kg"] - frame["co2_from_grid_electrolysis_kg"]).sum()
+
+
+@pytest.mark.parametrize("profile", [h2_engine.demo_profile(), hourly()], ids=["monthly", "hourly"])
+@pytest.mark.parametrize("extra", [
+    {},
+    {"electrolyzer_mw": 0.05, "tank_max_kg": 50.0},
+    {"fuelcell_mw": 0.01, "tank_min_kg": 100.0, "fraction_h2_to_refuel": 0.9},
+])
+def test_zero_uncertainty_matches_simulate(profile, extra):
+    result = h2_montecarlo.run_monte_carlo(profile, extra, n=3, uncertainty={}, workers=1)
+    frame = h2_engine.simulate(profile, extra)
+    np.testing.assert_allclose(result["h2_kg"], frame["h2_kg"].sum())
+    np.testing.assert_allclose(result["revenue_usd"], frame["monthly_revenue_usd"].sum())
+    np.testing.assert_allclose(result["co2_avoided_kg"], net_co2(frame))
+
+
+def test_seeded_runs_are_reproducible():
+    a = h2_montecarlo.run_monte_carlo(h2_engine.demo_profile(), n=500, seed=4, workers=1)
+    b = h2_montecarlo.run_monte_carlo(h2_engine.demo_profile(), n=500, seed=4, workers=1)
+    np.testing.assert_array_equal(a["h2_kg"], b["h2_kg"])
+    np.testing.assert_array_equal(a["revenue_usd"], b["revenue_usd"])
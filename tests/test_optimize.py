@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_batch
+import h2_engine
+import h2_optimize
+
+
+def hourly():
+    ts = pd.date_range("2024-01-01", periods=24 * 30, freq="h")
+    solar = np.maximum(0, np.sin((ts.hour.to_numpy() - 6) / 12 * np.pi)) * 0.5
+    return pd.DataFrame({"timestamp": ts, "solar_mwh": solar, "demand_mwh": 0.15})
+
+
+def test_evaluate_matches_simulate():
+    profile = hourly()
+    ctx = h2_optimize._context(profile, None, None)
+    design = [0.2, 300.0, 0.05, 0.6]
+    k = {name: v[0] for name, v in h2_optimize.evaluate(ctx, [design]).items()}
+    frame = h2_engine.simulate(profile, {"electrolyzer_mw": 0.2, "tank_max_kg": 300.0, "fuelcell_mw": 0.05,
+                                         "solar_frac_for_electrolysis": 0.6})
+    want = h2_batch.summarize("h2app", frame)
+    assert k["h2_kg_per_yr"] == pytest.approx(want["h2_kg_per_yr"])
+    assert k["h2_unmet_kg_per_yr"] == pytest.approx(want["unmet_h2_kg_per_yr"])
+    assert k["revenue_usd_per_yr"] == pytest.approx(want["revenue_usd_per_yr"])
+    assert k["co2_avoided_t_per_yr"] == pytest.approx(want["co2_avoided_t_per_yr"])
+
+
+@pytest.mark.parametrize("objective", ["npv", "lcoh"])
+def test_optimize_beats_its_screen_inside_the_bounds(objective):
+    profile = hourly()
+    bounds = {"electrolyzer_mw": (0.05, 0.3), "tank_kg": (10.0, 500.0)}
+    floor = 400.0  # between the CO2 of the unconstrained optimum and the best reachable
+    res = h2_optimize.optimize(profile, objective=objective, min_co2_avoided_t=floor, bounds=bounds,
+                               n_screen=64, n_starts=2, seed=1)
+    box = {**h2_optimize.default_bounds(profile), **bounds}
+    for v in h2_optimize.VARIABLES:
+        assert box[v][0] - 1e-9 <= res["design"][v] <= box[v][1] + 1e-9
+    assert res["feasible"] and res["kpis"]["co2_avoided_t_per_yr"] >= floor - 1e-6
+    kpis = {k: np.array([v]) for k, v in res["kpis"].items()}
+    best = h2_optimize._score(kpis, objective, floor)[0]
+    screened = h2_optimize._score({k: res["screened"][k].to_numpy() for k in res["kpis"]}, objective, floor)
+    assert best <= screened.min()
+    # same seed, same answer
+    again = h2_optimize.optimize(profile, objective=objective, min_co2_avoided_t=floor, bounds=bounds,
+                                 n_screen=64, n_starts=2, seed=1)
+    assert again["design"] == res["design"]
+
+
+def test_binding_constraints():
+    box = {"electrolyzer_mw": (0.1, 1.0), "tank_kg": (0.0, 100.0), "fuelcell_mw": (0.0, 1.0),
+           "solar_frac_for_electrolysis": (0.0, 1.0)}
+    design = {"electrolyzer_mw": 0.1, "tank_kg": 50.0, "fuelcell_mw": 1.0, "solar_frac_for_electrolysis": 0.5}
+    kpis = {"co2_avoided_t_per_yr": 100.0, "h2_curtailed_kg_per_yr": 1.0, "h2_unmet_kg_per_yr": 0.0}
+    out = h2_optimize.binding_constraints(design, box, kpis, min_co2_avoided_t=100.0)
+    assert out == ["electrolyzer_mw at lower bound (0.1)", "fuelcell_mw at upper bound (1)",
+                   "CO₂ avoided ≥ 100 t/yr", "tank full: H₂ curtailed"]
+    assert "not reachable" in h2_optimize.binding_constraints(design, box, kpis, min_co2_avoided_t=200.0)[2]
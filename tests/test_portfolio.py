@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_batch
+import h2_engine
+import h2_portfolio
+
+
+def hourly(scale):
+    ts = pd.date_range("2024-01-01", periods=24 * 20, freq="h")
+    solar = np.maximum(0, np.sin((ts.hour.to_numpy() - 6) / 12 * np.pi)) * scale
+    return pd.DataFrame({"timestamp": ts, "solar_mwh": solar, "demand_mwh": 0.15})
+
+
+SITES = [
+    {"name": "a", "profile": h2_engine.demo_profile(), "params": {}},
+    {"name": "b", "profile": h2_engine.demo_profile(120.0), "params": {"tank_max_kg": 800.0, "lifetime_years": 25}},
+    {"name": "c", "profile": hourly(0.5), "params": {"tank_max_kg": 50.0, "fuelcell_mw": 0.02}},
+    {"name": "d", "profile": hourly(0.8), "params": {"tank_min_kg": 100.0, "fraction_h2_to_refuel": 0.9,
+                                                     "grid_emission_kgCO2_per_mwh": 500.0}},
+    {"name": "e", "profile": hourly(0.3), "params": {"electrolyzer_mw": 0.1, "discount_rate": 0.05}},
+]
+
+
+@pytest.mark.parametrize("chunk_sites", [1, 2, None])
+def test_stacked_sites_match_simulate(chunk_sites):
+    kpis = h2_portfolio.run_portfolio(SITES, workers=1, chunk_sites=chunk_sites)
+    assert list(kpis["site"]) == [s["name"] for s in SITES]
+    for site, (_, row) in zip(SITES, kpis.iterrows()):
+        sim = {k: v for k, v in site["params"].items() if k in h2_engine.DEFAULT_PARAMS}
+        frame = h2_engine.simulate(site["profile"], sim)
+        want = h2_batch.summarize("h2app", frame, site["params"])
+        assert row["h2_kg"] == pytest.approx(want["h2_kg_per_yr"])
+        assert row["revenue_usd"] == pytest.approx(want["revenue_usd_per_yr"])
+        assert row["o2_revenue_usd"] == pytest.approx(want["o2_revenue_usd_per_yr"])
+        assert row["fuelcell_elec_mwh"] == pytest.approx(want["fuelcell_elec_mwh_per_yr"])
+        assert row["curtailed_h2_kg"] == pytest.approx(want["curtailed_h2_kg_per_yr"])
+        assert row["unmet_h2_kg"] == pytest.approx(want["unmet_h2_kg_per_yr"])
+        assert row["co2_avoided_kg"] == pytest.approx(want["co2_avoided_t_per_yr"] * 1000.0)
+        assert row["npv_usd"] == pytest.approx(want["npv_usd"])
+    # the tank limits bite
+    assert kpis.loc[2, "curtailed_h2_kg"] > 0 and kpis.loc[3, "unmet_h2_kg"] > 0
+
+
+def test_totals_and_empty():
+    kpis = h2_portfolio.run_portfolio(SITES, workers=1)
+    assert h2_portfolio.totals(kpis)["h2_kg"] == pytest.approx(kpis["h2_kg"].sum())
+    assert h2_portfolio.run_portfolio([]).empty
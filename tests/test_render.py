@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+import h2_render
+
+
+def test_lttb_short_series_unchanged():
+    np.testing.assert_array_equal(h2_render.lttb(np.arange(10), np.arange(10.0), 50), np.arange(10))
+
+
+def test_lttb_selection():
+    rng = np.random.default_rng(0)
+    n = 50_000
+    y = rng.normal(size=n)
+    y[12_345] = 40.0   # a single spike must survive
+    y[40_000] = -40.0
+    idx = h2_render.lttb(np.arange(n), y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert (np.diff(idx) > 0).all()
+    assert 12_345 in idx and 40_000 in idx
+
+
+def test_lttb_datetime_x():
+    ts = pd.date_range("2024-01-01", periods=10_000, freq="h").to_numpy()
+    idx = h2_render.lttb(ts, np.sin(np.arange(10_000) / 100.0), 300)
+    assert len(idx) == 300 and (np.diff(idx) > 0).all()
+
+
+def test_page():
+    df = pd.DataFrame({"x": range(60)})
+    assert h2_render.page_count(60, 25) == 3
+    assert h2_render.page(df, 3, 25)["x"].tolist() == list(range(50, 60))
+    assert h2_render.page(df, 99, 25)["x"].iloc[0] == 50
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import h2_storage
+
+
+def reference(h2_in, h2_out, initial, lo, hi):
+    # the original per-step loop
+    s = min(max(initial, lo), hi)
+    stored, curtailed, unmet = [], [], []
+    for i, o in zip(h2_in, h2_out):
+        raw = s + i - o
+        curtailed.append(max(raw - hi, 0.0))
+        unmet.append(max(lo - raw, 0.0))
+        s = min(max(raw, lo), hi)
+        stored.append(s)
+    return np.array(stored), np.array(curtailed), np.array(unmet)
+
+
+def flows(n, seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 10, n), rng.uniform(0, 10, n)
+
+
+LENGTHS = [1, 2, 63, 64, 65, 127, 128, 129, 1000, 64 * 64, 64 * 64 + 1]
+TANKS = {"two-sided": (5.0, 40.0), "max only": (-np.inf, 40.0), "min only": (5.0, np.inf),
+         "unbounded": (-np.inf, np.inf), "narrow": (10.0, 12.0)}
+
+
+@pytest.mark.parametrize("n", LENGTHS)
+@pytest.mark.parametrize("tank", list(TANKS))
+def test_matches_loop_1d(n, tank):
+    lo, hi = TANKS[tank]
+    h2_in, h2_out = flows(n, n)
+    got = h2_storage.storage_balance(h2_in, h2_out, 20.0, lo, hi)
+    for g, r in zip(got, reference(h2_in, h2_out, 20.0, lo, hi)):
+        np.testing.assert_allclose(g, r, atol=1e-9)
+
+
+@pytest.mark.parametrize("n", [12, 64, 65, 129, 2000])
+def test_matches_loop_stacked(n):
+    # per-row initial stock and limits, including an initial stock outside the tank
+    h2_in = np.stack([flows(n, s)[0] for s in range(4)])
+    h2_out = np.stack([flows(n, s + 10)[1] for s in range(4)])
+    initial = np.array([0.0, 50.0, 20.0, 100.0])
+    lo = np.array([0.0, 5.0, -np.inf, 10.0])
+    hi = np.array([30.0, np.inf, 25.0, 60.0])
+    got = h2_storage.storage_balance(h2_in, h2_out, initial, lo, hi)
+    for row in range(4):
+        ref = reference(h2_in[row], h2_out[row], initial[row], lo[row], hi[row])
+        for g, r in zip(got, ref):
+            np.testing.assert_allclose(g[row], r, atol=1e-9)
+
+
+@pytest.mark.parametrize("n", [5, 64, 65, 200])
+@pytest.mark.parametrize("block", [1, 4, 64])
+def test_clamped_path_blocks(n, block):
+    h2_in, h2_out = flows(n, 7)
+    lo, hi = np.array([5.0]), np.array([40.0])
+    got = h2_storage._clamped_path((h2_in - h2_out)[None, :], np.array([[20.0]]), lo[:, None], hi[:, None], block)
+    np.testing.assert_allclose(got[0], reference(h2_in, h2_out, 20.0, 5.0, 40.0)[0], atol=1e-9)
+
+
+def test_empty_and_invalid():
+    stored, curtailed, unmet = h2_storage.storage_balance([], [], 10.0, 0.0, 50.0)
+    assert stored.shape == curtailed.shape == unmet.shape == (0,)
+    with pytest.raises(ValueError):
+        h2_storage.storage_balance([1.0], [0.0], 0.0, 10.0, 5.0)
+
+
+def test_split_unmet():
+    fc, ref = h2_storage.split_unmet(np.array([3.0, 0.0]), np.array([1.0, 2.0]), np.array([2.0, 0.0]))
+    np.testing.assert_allclose(fc, [1.0, 0.0])
+    np.testing.assert_allclose(ref, [2.0, 0.0])
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import h2_engine
+import h2_store
+
+
+def frame(n=100):
+    return pd.DataFrame({"x": np.arange(n, dtype=float), "y": np.ones(n)})
+
+
+def test_put_get_save(tmp_path):
+    store = h2_store.ResultStore(str(tmp_path), max_bytes=1 << 30)
+    store.put("k", frame(), "simulate", "v", "p", {"a": 1.0})
+    pd.testing.assert_frame_equal(store.get("k"), frame())
+    assert store.get("missing") is None
+    assert store.save("k", "base", {"note": "x"}) and not store.save("missing", "other")
+    saved = store.saved("simulate")
+    assert saved["name"].tolist() == ["base"] and saved["params"][0] == {"a": 1.0}
+    assert store.saved("simulate_design_a").empty
+
+
+def test_eviction_spares_saved_results(tmp_path):
+    store = h2_store.ResultStore(str(tmp_path), max_bytes=1 << 30)
+    store.put("saved", frame(), "simulate", "v", "p", {})
+    store.save("saved", "keep")
+    size = store.usage()[1]
+    store.max_bytes = 3 * size
+    for i in range(6):
+        store.put(f"k{i}", frame(), "simulate", "v", "p", {})
+    count, total, named = store.usage()
+    assert total <= store.max_bytes and named == 1
+    assert store.get("saved") is not None and store.get("k5") is not None and store.get("k0") is None
+
+
+def test_put_async_then_flush(tmp_path):
+    store = h2_store.ResultStore(str(tmp_path), max_bytes=1 << 30)
+    assert store.put_async("k", frame(), "simulate", "v", "p", {})
+    store.flush()
+    assert store.has("k")
+    pd.testing.assert_frame_equal(store.get("k"), frame())
+    assert store.estimate_write_s(frame(10_000)) > store.estimate_write_s(frame(10))
+
+
+def test_memoized_skips_cheap_writes_and_persists_on_demand(tmp_path, monkeypatch):
+    monkeypatch.setenv("H2_STORE", "1")
+    monkeypatch.setattr(h2_store, "_default", h2_store.ResultStore(str(tmp_path), max_bytes=1 << 30))
+    # writes look expensive: nothing computed in this test is worth storing
+    monkeypatch.setattr(h2_store.ResultStore, "estimate_write_s", lambda self, df: 60.0)
+    profile = h2_engine.demo_profile(77.0)
+    h2_engine.simulate(profile, {"oxygen_price_tk_per_kg": 9.5})
+    store = h2_store.default_store()
+    store.flush()
+    assert store.usage()[0] == 0
+    key = h2_engine.simulate.persist(profile, {"oxygen_price_tk_per_kg": 9.5})
+    assert store.has(key) and store.save(key, "saved")
+    assert store.saved("simulate")["name"].tolist() == ["saved"]
+
+
+def test_result_over_budget_is_not_stored(tmp_path):
+    store = h2_store.ResultStore(str(tmp_path), max_bytes=1 << 30)
+    store.put("small", frame(), "simulate", "v", "p", {})
+    store.max_bytes = store.usage()[1] * 2
+    with pytest.warns(UserWarning, match="budget"):
+        store.put("big", frame(100_000), "simulate", "v", "p", {})
+    assert not store.has("big") and store.get("small") is not None
+    assert not any(f.suffix == ".tmp" for f in tmp_path.rglob("*"))
+
+
+def test_unreadable_store_is_a_warning(tmp_path):
+    path = tmp_path / "store"
+    path.write_text("not a directory")
+    store = h2_store.ResultStore(str(path))
+    with pytest.warns(UserWarning):
+        assert store.usage() == (0, 0, 0)
+    with pytest.warns(UserWarning):
+        store.delete("k")
@@ -0,0 +1,34 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import h2_engine
+import h2_sweep
+
+RANGES = {"electrolyzer_eff": [0.6, 0.8], "fraction_h2_to_fuelcell": [0.1, 0.5],
+          "solar_frac_for_electrolysis": [0.3, 1.0], "oxygen_price_tk_per_kg": [5.0, 12.0]}
+
+
+def net_co2(frame):
+    # export + diesel + fuel cell, less grid power drawn for electrolysis, from simulate's own columns
+    return (frame["co2_avoided_from_export_kg"] + frame["co2_avoided_from_diesel_kg"]
+            + frame["co2_avoided_from_fuelcell_kg"] - frame["co2_from_grid_electrolysis_kg"]).sum()
+
+
+@pytest.mark.parametrize("extra", [
+    {},
+    {"electrolyzer_mw": 0.05, "tank_max_kg": 50.0},
+    {"fuelcell_mw": 0.01},
+    {"tank_min_kg": 100.0, "fraction_h2_to_refuel": 0.9},
+])
+def test_sweep_matches_simulate(extra):
+    profile = h2_engine.demo_profile()
+    params = {**h2_engine.DEFAULT_PARAMS, **extra}
+    result = h2_sweep.sweep(profile, params, RANGES)
+    for idx in itertools.product(*(range(len(v)) for v in RANGES.values())):
+        frame = h2_engine.simulate(profile, dict(params, **{n: RANGES[n][i] for n, i in zip(RANGES, idx)}))
+        np.testing.assert_allclose(result["kpis"]["h2_kg"][idx], frame["h2_kg"].sum())
+        np.testing.assert_allclose(result["kpis"]["fuelcell_elec_mwh"][idx], frame["fuelcell_elec_mwh"].sum())
+        np.testing.assert_allclose(result["kpis"]["revenue_usd"][idx], frame["monthly_revenue_usd"].sum())
+        np.testing.assert_allclose(result["kpis"]["co2_avoided_kg"][idx], net_co2(frame))
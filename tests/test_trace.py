@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import h2_trace
+
+
+def test_stages_nest_under_sections():
+    trace = h2_trace.activate(h2_trace.Trace())
+    try:
+        with h2_trace.stage("outer") as ev:
+            ev.add(np.zeros(256))
+            with h2_trace.stage("inner"):
+                time.sleep(0.01)
+        h2_trace.split("section", "x" * 2048)
+    finally:
+        h2_trace.activate(None)
+    s = trace.summary()
+    assert list(s["depth"]) == [0, 1, 2]
+    assert s["stage"][0] == "section" and s["stage"][1].endswith("└ outer") and s["stage"][2].endswith("└ inner")
+    assert s["stage"][2].startswith("\u00a0\u00a0")  # indented with non-breaking spaces
+    # the section spans its stages, and shares are of the whole rerun
+    assert s["ms"][0] >= s["ms"][1] >= s["ms"][2] >= 10.0
+    assert 0 < s["share_pct"][2] <= s["share_pct"][0] <= 100.0
+    assert s["payload_kb"].tolist() == [2.0, 2.0, 0.0]
+
+
+def test_chrome_trace_shape():
+    trace = h2_trace.Trace()
+    with trace.stage("a"):
+        pass
+    trace.split("s", pd.DataFrame({"x": [1.0]}))
+    doc = json.loads(trace.chrome_trace())
+    assert doc["displayTimeUnit"] == "ms"
+    events = doc["traceEvents"]
+    assert [e["name"] for e in events] == ["s", "a"] and [e["cat"] for e in events] == ["section", "stage"]
+    for e in events:
+        assert e["ph"] == "X" and e["ts"] >= 0 and e["dur"] >= 0 and e["tid"] == threading.get_ident()
+    assert events[0]["args"]["payload_bytes"] > 0
+
+
+def test_inactive_trace_is_a_no_op():
+    assert h2_trace.current() is None
+    with h2_trace.stage("nothing") as ev:
+        ev.add(np.zeros(10))
+    h2_trace.split("nothing")
+
+
+def test_threads_keep_their_own_trace():
+    barrier = threading.Barrier(2, timeout=10)
+    traces = {}
+
+    def rerun(name):
+        trace = h2_trace.activate(h2_trace.Trace())
+        barrier.wait()  # both traces are active at the same time
+        with h2_trace.stage(name):
+            barrier.wait()
+        h2_trace.split(f"{name} done")
+        traces[name] = trace
+
+    threads = [threading.Thread(target=rerun, args=(n,)) for n in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [e.name for e in traces["a"]._ordered()] == ["a done", "a"]
+    assert [e.name for e in traces["b"]._ordered()] == ["b done", "b"]
+    assert h2_trace.current() is None